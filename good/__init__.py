@@ -19,9 +19,10 @@ The rationale for a remake was to make it modular with a tiny core and everythin
 ensure that all error messages are user-friendly out of the box, and tweak the performance.
 """
 
-# Init gettext translations, and do not litter the root scope
-import gettext as _gettext, six as _six
-_gettext.install('good', **({'unicode': True} if _six.PY2 else {}))
+# Init translations, and do not litter the root scope: the catalogs are looked up on first use
+import sys as _sys
+from . import i18n as _i18n
+_i18n.install()
 
 
 # Core
@@ -30,6 +31,10 @@ from .schema.errors import SchemaError, Invalid, MultipleInvalid
 from .schema.util import register_type_name
 
 from .schema import Schema
+from .schema.refs import Ref
+from .schema.limits import Limits
+from .schema.registry import SchemaRegistry
+from .schema.metrics import Metrics
 
 from .schema import markers
 from .schema.markers import *
@@ -37,5 +42,24 @@ from .schema.markers import *
 # Helpers
 from .helpers import *
 
-# Validators
-from .validators import *
+# Pre-fork warmup
+from .schema.warmup import warmup
+
+# Validators: imported on first use on Python 3.7+
+from . import validators as _validators
+
+if _sys.version_info >= (3, 7):
+    def __getattr__(name):
+        """ Get a validator: `good.validators` imports its module on first access """
+        if name not in _validators.__all__:
+            raise AttributeError('module {!r} has no attribute {!r}'.format(__name__, name))
+        value = getattr(_validators, name)
+        globals()[name] = value
+        return value
+
+    def __dir__():
+        return sorted(set(globals()) | set(_validators.__all__))
+else:
+    from .validators import *
+
+__all__ = tuple(sorted(set(name for name in globals() if not name.startswith('_')) | set(_validators.__all__)))
@@ -5,6 +5,9 @@ import collections
 from functools import update_wrapper
 
 from .schema.util import const, get_literal_name, get_callable_name
+from .schema import markers, signals
+from .schema.compiler import Identity
+from .schema.batch import BatchScope
 from . import Schema, SchemaError, Invalid
 from .validators.base import ValidatorBase
 from .validators.boolean import Check
@@ -73,6 +76,146 @@ class SlotsObjectProxy(ObjectProxy):
             raise
 
 
+def literal_fields(compiled):
+    """ Get the fields of a mapping schema that only has literal keys.
+
+    Such schemas can be validated without the generic mapping machinery: there's a fixed set of fields.
+
+    :param compiled: Compiled schema
+    :type compiled: CompiledSchema
+    :return: List of fields: (key, value-schema, is-required), or `None` if the schema does not qualify:
+        it must be a mapping with string keys marked as `Required` or `Optional`, and `Extra`.
+    :rtype: list[(unicode, CompiledSchema, bool)]|None
+    """
+    if compiled.compiled_type != const.COMPILED_TYPE.MAPPING:
+        return None
+
+    fields = []
+    for key_schema, value_schema, is_literal, is_identity in compiled.mapping_schemas:
+        marker = key_schema.compiled
+        if type(marker) is markers.Extra and marker.key is Identity:
+            continue
+        if not is_literal or type(marker) not in (markers.Required, markers.Optional) \
+                or not isinstance(marker.key, six.string_types):
+            return None
+        fields.append((marker.key, value_schema, type(marker) is markers.Required))
+    return fields
+
+
+class ObjectPlan(object):
+    """ Compiled attribute access for `Object()`: validates objects of a specific class without `ObjectProxy`.
+
+    It follows the `ObjectProxy` semantics: a field is present when it's in the instance `__dict__`,
+    or in `__slots__` (`_fields` for named tuples); any other attribute is an extra key.
+    Fields are read and written with direct `__dict__` access when the class does not define an attribute
+    with the same name, and with `getattr()`/`setattr()` otherwise.
+
+    The plan only handles valid objects that need no special treatment:
+    when a required field is missing, there are extra attributes, or a value is invalid,
+    it gives up and the object is validated with `ObjectProxy`, which reports errors.
+
+    :param cls: The class of objects
+    :type cls: type
+    :param fields: The fields: see `literal_fields()`
+    :type fields: list[(unicode, CompiledSchema, bool)]
+    """
+
+    def __init__(self, cls, fields):
+        names = {key for key, value_schema, required in fields}
+
+        # Named tuple: fields by index, immutable
+        if issubclass(cls, tuple) and hasattr(cls, '_fields'):
+            indexes = {name: i for i, name in enumerate(cls._fields)}
+            self.validate = self._compile_tuple(
+                [(indexes[key], value_schema) for key, value_schema, required in fields if key in indexes]) \
+                if self._static_ok(cls._fields, names, fields) else None
+        # Slots: static set of attributes
+        elif hasattr(cls, '__slots__'):
+            self.validate = self._compile_slots(
+                [(key, value_schema) for key, value_schema, required in fields if key in cls.__slots__]) \
+                if self._static_ok(cls.__slots__, names, fields) else None
+        # __dict__
+        elif getattr(cls, '__dictoffset__', 0):
+            self.validate = self._compile_dict(
+                [(key, value_schema, required, hasattr(cls, key)) for key, value_schema, required in fields])
+        # Something else
+        else:
+            self.validate = None
+
+    @staticmethod
+    def _static_ok(attributes, names, fields):
+        """ Test whether objects of a class with a static set of attributes can be validated with a plan """
+        attributes = set(attributes)
+        return attributes <= names \
+               and all(key in attributes for key, value_schema, required in fields if required)
+
+    @staticmethod
+    def _compile_tuple(fields):
+        def validate_tuple(obj):
+            for i, value_schema in fields:
+                v = obj[i]
+                try:
+                    sanitized = value_schema(v)
+                except (Invalid, signals.RemoveValue):
+                    return False
+                # Named tuples are immutable: only the values that did not change are fine
+                if sanitized is not v and sanitized != v:
+                    return False
+            return True
+        return validate_tuple
+
+    @staticmethod
+    def _compile_slots(fields):
+        def validate_slots(obj):
+            updates = []
+            for key, value_schema in fields:
+                try:
+                    v = getattr(obj, key)
+                    sanitized = value_schema(v)
+                except (AttributeError, Invalid, signals.RemoveValue):
+                    return False
+                if sanitized is not v:
+                    updates.append((key, sanitized))
+
+            for key, sanitized in updates:
+                setattr(obj, key, sanitized)
+            return True
+        return validate_slots
+
+    @staticmethod
+    def _compile_dict(fields):
+        def validate_dict(obj):
+            d = obj.__dict__
+            found = 0
+            updates = []
+            for key, value_schema, required, has_descriptor in fields:
+                if key not in d:
+                    if required:
+                        return False
+                    continue
+                found += 1
+
+                v = getattr(obj, key) if has_descriptor else d[key]
+                try:
+                    sanitized = value_schema(v)
+                except (Invalid, signals.RemoveValue):
+                    return False
+                if sanitized is not v:
+                    updates.append((key, sanitized, has_descriptor))
+
+            # Extra attributes
+            if len(d) != found:
+                return False
+
+            for key, sanitized, has_descriptor in updates:
+                if has_descriptor:
+                    setattr(obj, key, sanitized)
+                else:
+                    d[key] = sanitized
+            return True
+        return validate_dict
+
+
 class Object(ValidatorBase):
     """ Specify that the provided mapping should validate an object.
 
@@ -105,6 +248,11 @@ class Object(ValidatorBase):
     Validation is performed with the help of a wrapper class which proxies object attributes as mapping keys,
     and then Schema validates it as a mapping.
 
+    When the schema only has string keys with [`Required()`](#required) or [`Optional()`](#optional) markers,
+    attribute access is compiled for each class of objects: `__dict__`, `__slots__`, named tuples,
+    and dataclasses are read directly, which is much faster.
+    The proxy is still used for objects that fail validation, so errors are the same.
+
     This inherits the default required/extra keys behavior of the Schema.
     To override, use [`Optional()`](#optional) and [`Extra`](#extra) markers.
 
@@ -122,6 +270,28 @@ class Object(ValidatorBase):
         # Compile schema
         self.compiled = Schema(schema)
 
+        # Compiled attribute access: { class: ObjectPlan.validate | None }
+        self.fields = literal_fields(self.compiled.compiled)
+        self.plans = {}
+
+    def _get_plan(self, cls):
+        """ Get the compiled attribute access function for the class
+
+        :rtype: callable|None
+        """
+        try:
+            return self.plans[cls]
+        except KeyError:
+            plan = self.plans[cls] = ObjectPlan(cls, self.fields).validate
+            return plan
+
+    def warmup(self):
+        """ Make the attribute access plans for the required classes """
+        if self.fields is not None:
+            for cls in (self.cls if isinstance(self.cls, tuple) else (self.cls,)):
+                if cls is not object:
+                    self._get_plan(cls)
+
     @staticmethod
     def _format_cls_name(c):
         return _(u'Object({cls})').format(cls=c.__name__ if c else u'*')
@@ -134,10 +304,136 @@ class Object(ValidatorBase):
         if not isinstance(v, self.cls):
             raise Invalid(_(u'Wrong value type'), provided=self._format_value_type(v))
 
+        # Batched validation: objects are modified in-place, the 2nd pass needs them as they were
+        scope = BatchScope.current()
+        if scope is not None:
+            v = scope.original(v)
+
+        # Compiled attribute access
+        if self.fields is not None:
+            plan = self._get_plan(type(v))
+            if plan is not None and plan(v):
+                return v
+
         # Validate using ObjectProxy and unwrap
         return self.compiled(ObjectProxy(v)).obj
 
 
+class Record(ValidatorBase):
+    """ Validate a mapping into a compact record: a named tuple, a dataclass, or a `__slots__` class.
+
+    A mapping schema produces a `dict`, which costs a lot of memory when there are millions of records.
+    `Record` validates the input mapping straight into a record object, without an intermediate `dict`:
+
+    ```python
+    from collections import namedtuple
+    from good import Schema, Record, Optional
+
+    Point = namedtuple('Point', ('x', 'y', 'label'))
+
+    schema = Schema(Record({
+        'x': int,
+        'y': int,
+        Optional('label'): str,
+    }, Point))
+
+    schema({'x': 1, 'y': 2})  #-> Point(x=1, y=2, label=None)
+    schema({'x': 1})
+    #-> Invalid: Required key not provided @ ['y']: expected y, got -none-
+    ```
+
+    The schema must be a mapping with string keys, marked as [`Required`](#required) or [`Optional`](#optional).
+    Field positions are resolved when the validator is created.
+    Errors are the same as with the plain mapping schema.
+
+    Missing optional fields get their default values: from the named tuple (Python 3.7+), or from the class constructor.
+    Otherwise, they are `None`.
+    Extra keys are handled as usual (see [`Extra`](#extra)), but never make it to the record.
+
+    :param schema: Record schema, given as a mapping
+    :type schema: Mapping
+    :param into: Record type:
+
+        * `None`: a named tuple generated from the schema keys, with the fields in the order of the sorted keys
+        * A named tuple: created with positional arguments
+        * Any other class (a dataclass, a `__slots__` class): created with keyword arguments
+
+    :type into: type|None
+    :raises SchemaError: The schema is not a mapping with literal keys, or the named tuple does not have a field
+    """
+
+    def __init__(self, schema, into=None):
+        self.compiled = Schema(schema)
+
+        # Fields
+        fields = literal_fields(self.compiled.compiled)
+        if fields is None:
+            raise SchemaError(_(u'Record() schema must be a mapping with literal string keys'))
+        fields.sort(key=lambda field: field[0])  # a defined order: mappings have none on Python 2
+
+        # Record type
+        generated = into is None
+        if generated:
+            into = collections.namedtuple('Record', [key for key, value_schema, required in fields], rename=True)
+        self.into = into
+        self.name = _(u'Record({cls})').format(cls=into.__name__)
+
+        # Named tuple: positional
+        if issubclass(into, tuple) and hasattr(into, '_fields'):
+            try:
+                # Generated: keys that are not valid identifiers were renamed, hence use positions
+                indexes = list(range(len(fields))) if generated else \
+                          [into._fields.index(key) for key, value_schema, required in fields]
+            except ValueError as e:
+                raise SchemaError(_(u'{cls} does not have a field for every key: {e}').format(cls=into.__name__, e=e))
+            defaults = getattr(into, '_field_defaults', {})
+            self.defaults = [defaults.get(name) for name in into._fields]
+        # Any other class: keyword
+        else:
+            indexes = [key for key, value_schema, required in fields]
+            self.defaults = None
+        self.fields = [(key, value_schema, required, index)
+                       for (key, value_schema, required), index in zip(fields, indexes)]
+
+    def _build(self, d):
+        """ Build a record from a validated mapping """
+        if self.defaults is None:
+            return self.into(**{key: d[key] for key, value_schema, required, index in self.fields if key in d})
+        values = list(self.defaults)
+        for key, value_schema, required, index in self.fields:
+            if key in d:
+                values[index] = d[key]
+        return tuple.__new__(self.into, values)
+
+    def __call__(self, d):
+        # Validate directly into the record.
+        # Only plain dicts: subclasses may change lookups, e.g. `defaultdict` would insert the missing keys
+        if type(d) is dict:
+            positional = self.defaults is not None
+            values = list(self.defaults) if positional else {}
+            found = 0
+            for key, value_schema, required, index in self.fields:
+                try:
+                    v = d[key]
+                except KeyError:
+                    if required:
+                        break
+                    continue
+                found += 1
+
+                try:
+                    values[index] = value_schema(v)
+                except (Invalid, signals.RemoveValue):
+                    break
+            else:
+                # No extra keys
+                if len(d) == found:
+                    return tuple.__new__(self.into, values) if positional else self.into(**values)
+
+        # Validate as a mapping: reports errors, handles defaults and extra keys
+        return self._build(self.compiled(d))
+
+
 class Msg(ValidatorBase):
     """ Override the error message reported by the wrapped schema in case of validation errors.
 
@@ -319,4 +615,4 @@ def truth(message, expected=None):
         return update_wrapper(Check(func, message, expected), func)
     return decorator
 
-__all__ = ('Object', 'Msg', 'Test', 'message', 'name', 'truth')
+__all__ = ('Object', 'Record', 'Msg', 'Test', 'message', 'name', 'truth')
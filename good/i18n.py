@@ -0,0 +1,265 @@
+""" Translations: the `_()` builtin all messages go through.
+
+`_()` makes a [`Message`](#message): a lazy translatable string. It's translated when it's rendered,
+in the current locale (see [`locale()`](#locale)), so one compiled schema serves all locales.
+
+The catalogs are looked up on first use, once per locale: `import good` does not load `gettext`.
+"""
+
+import six
+import threading
+from contextlib import contextmanager
+from six.moves import builtins
+
+try:
+    from contextvars import ContextVar  # Python 3.7+: follows asyncio tasks
+except ImportError:
+    ContextVar = None
+
+#: gettext domain
+DOMAIN = 'good'
+
+#: The directory with the catalogs: `<localedir>/<locale>/LC_MESSAGES/good.mo`. `None`: the system default
+_localedir = None
+
+#: The translations of every locale, looked up on first use: { locale: gettext.NullTranslations }.
+#: `None` is the locale of the environment: `$LANGUAGE`, `$LC_ALL`, `$LC_MESSAGES`, `$LANG`
+_translations = {}
+_translations_lock = threading.Lock()
+
+
+class Message(six.text_type):
+    """ A translatable message: translated when it's rendered, in the current locale.
+
+    It's a string with the untranslated text: it compares and hashes as one.
+    It's rendered by `str()` (`unicode()` in Python 2), `format()`, and `%`: these translate it.
+    `.format()`, `.join()` and `+` make messages too: their arguments are translated along with it.
+
+    ```python
+    from good import Schema, Invalid
+    from good.i18n import locale
+
+    schema = Schema(int)
+    try:
+        schema(u'1')
+    except Invalid as e:
+        e.message == u'Wrong type'  #-> True: the untranslated text
+        with locale('de'):
+            print(e)  # in German, with the `de` catalog
+    ```
+
+    :param msgid: The untranslated message
+    :type msgid: unicode
+    """
+
+    __slots__ = ('msgid', 'args', 'kwargs', 'items')
+
+    def __new__(cls, msgid, args=None, kwargs=None, items=None):
+        msgid = _raw(msgid)
+        if items is not None:
+            raw = msgid.join(_raw(item) for item in items)
+        elif args is not None:
+            raw = msgid.format(*[_raw(a) for a in args], **dict((k, _raw(v)) for k, v in kwargs.items()))
+        else:
+            raw = msgid
+        self = super(Message, cls).__new__(cls, raw)
+        self.msgid = msgid
+        self.args = args
+        self.kwargs = kwargs
+        self.items = items
+        return self
+
+    def __reduce__(self):
+        return Message, (self.msgid, self.args, self.kwargs, self.items)
+
+    def format(self, *args, **kwargs):
+        """ Format the message: lazily """
+        if self.args is not None or self.items is not None:
+            return self.translate().format(*args, **kwargs)
+        return Message(self.msgid, args, kwargs)
+
+    def join(self, iterable):
+        """ Join strings with the message: lazily """
+        if self.args is not None or self.items is not None:
+            return self.translate().join(iterable)
+        return Message(self.msgid, items=tuple(iterable))
+
+    def __add__(self, other):
+        if not isinstance(other, six.string_types):
+            return NotImplemented
+        return Message(u'', items=(self, other))
+
+    def __radd__(self, other):
+        if not isinstance(other, six.string_types):
+            return NotImplemented
+        return Message(u'', items=(other, self))
+
+    def translate(self, locale=None):
+        """ Render the message in a locale
+
+        :param locale: The locale. Default: the current one
+        :type locale: str|None
+        :rtype: unicode
+        """
+        return self._render(translation(locale))
+
+    def _render(self, t):
+        if not self.msgid:
+            text = self.msgid  # gettext('') is the catalog header
+        else:
+            text = t.ugettext(self.msgid) if six.PY2 else t.gettext(self.msgid)
+        if self.items is not None:
+            return text.join(_render(item, t) for item in self.items)
+        if self.args is not None:
+            return text.format(*[_render(a, t) for a in self.args],
+                               **dict((k, _render(v, t)) for k, v in self.kwargs.items()))
+        return text
+
+    def __format__(self, format_spec):
+        return format(self.translate(), format_spec)
+
+    if six.PY2:
+        def __unicode__(self):
+            return self.translate()
+
+        def __str__(self):
+            return self.translate().encode('utf8')
+    else:
+        def __str__(self):
+            return self.translate()
+
+
+def _raw(value):
+    """ The untranslated text of a message. Other values are left as they are """
+    return six.text_type.__getitem__(value, slice(None)) if isinstance(value, Message) else value
+
+
+def _render(value, t):
+    """ Render a message with the translations. Other values are left as they are """
+    return value._render(t) if isinstance(value, Message) else value
+
+
+def translate(value, locale=None):
+    """ Render a value in a locale: translates a `Message`, leaves other values as they are
+
+    :param locale: The locale. Default: the current one
+    :type locale: str|None
+    """
+    return value.translate(locale) if isinstance(value, Message) else value
+
+
+#region Locale
+
+if ContextVar is not None:
+    _locale = ContextVar('good.i18n.locale', default=None)
+
+    def get_locale():
+        """ Get the current locale
+
+        :rtype: str|None
+        """
+        return _locale.get()
+
+    def set_locale(locale):
+        """ Set the current locale: for the current thread, or asyncio task (Python 3.7+)
+
+        :param locale: Locale name: 'de', 'pt_BR', ... `None`: the locale of the environment
+        :type locale: str|None
+        """
+        _locale.set(locale)
+else:
+    _locale = threading.local()
+
+    def get_locale():
+        return getattr(_locale, 'name', None)
+
+    def set_locale(locale):
+        _locale.name = locale
+
+
+@contextmanager
+def locale(name):
+    """ Render messages in a locale within the block
+
+    ```python
+    from good.i18n import locale
+
+    with locale('de'):
+        print(error)
+    ```
+
+    :param name: Locale name: 'de', 'pt_BR', ... `None`: the locale of the environment
+    :type name: str|None
+    """
+    previous = get_locale()
+    set_locale(name)
+    try:
+        yield
+    finally:
+        set_locale(previous)
+
+#endregion
+
+
+#region Catalogs
+
+def translation(locale=None):
+    """ Get the translations of a locale: looked up on first use, then cached
+
+    :param locale: The locale. Default: the current one
+    :type locale: str|None
+    :rtype: gettext.NullTranslations
+    """
+    if locale is None:
+        locale = get_locale()
+    try:
+        return _translations[locale]
+    except KeyError:
+        pass
+
+    import gettext
+    with _translations_lock:
+        if locale not in _translations:
+            _translations[locale] = gettext.translation(DOMAIN, _localedir, languages=[locale] if locale else None,
+                                                        fallback=True)
+        return _translations[locale]
+
+
+def set_localedir(localedir):
+    """ Use catalogs from a directory: `<localedir>/<locale>/LC_MESSAGES/good.mo`
+
+    :param localedir: The directory. `None`: the system default
+    :type localedir: str|None
+    """
+    global _localedir
+    with _translations_lock:
+        _localedir = localedir
+        _translations.clear()
+
+
+#: Messages by their text: `_()` is called with literals, often on every error
+_messages = {}
+
+
+def message(msgid):
+    """ Get a translatable message: `_()`
+
+    Messages are immutable: the same text gives the same message.
+
+    :type msgid: unicode
+    :rtype: Message
+    """
+    try:
+        return _messages[msgid]
+    except KeyError:
+        return _messages.setdefault(msgid, Message(msgid))
+
+
+def install():
+    """ Install `_()` into builtins: it makes lazy messages """
+    builtins.__dict__['_'] = message
+
+#endregion
+
+
+__all__ = ('Message', 'message', 'translate', 'locale', 'get_locale', 'set_locale', 'translation', 'set_localedir')
@@ -1,6 +1,9 @@
 import six
+from copy import copy
+from functools import partial
 
 from .compiler import CompiledSchema
+from .batch import BatchScope
 from . import markers
 
 
@@ -254,7 +257,7 @@ class Schema(object):
 
     compiled_schema_cls = CompiledSchema
 
-    def __init__(self, schema, default_keys=None, extra_keys=None):
+    def __init__(self, schema, default_keys=None, extra_keys=None, lean=False, refs=None, limits=None, metrics=None):
         """ Creates a compiled `Schema` object from the given schema definition.
 
         Under the hood, it uses `SchemaCompiler`: see the [source](good/schema/compiler.py) if interested.
@@ -272,14 +275,87 @@ class Schema(object):
             Defaults to `markers.Reject`
 
         :type extra_keys: *
+        :param lean: Memory-lean output, for the cases when validated values are kept in memory for long.
+
+            Validated mappings are rebuilt: literal keys use the schema's own key objects instead of the ones
+            that came with the input, other string keys are interned, and keys are inserted in a consistent order.
+            Hence, millions of validated mappings share their key strings.
+
+            Note that the output mappings are new `dict` objects, and that nested `Schema` objects
+            (e.g. the ones created by validators like [`All()`](#all)) have their own setting.
+
+        :type lean: bool
+        :param refs: Named schemas that [`Ref(name)`](#ref) can refer to: { name: schema }.
+
+            They are compiled with the same settings as the `schema` itself.
+
+        :type refs: dict|None
+        :param limits: Limits on the size of the input, checked before the validation starts. See [`Limits`](#limits).
+        :type limits: Limits|None
+        :param metrics: Metrics hook: a callable `hook(validate, value)` that returns `validate(value)`,
+            and is used for every call. See [`Metrics`](#metrics).
+        :type metrics: callable|None
         :raises SchemaError: Schema compilation error
         """
         self.compiled = self.compiled_schema_cls(
             schema, [],
             default_keys,
-            extra_keys)
+            extra_keys,
+            lean=lean)
         self.name = self.compiled.name
 
+        #: Named schemas for references: { name: CompiledSchema }
+        self.refs = {name: self.compiled_schema_cls(ref_schema, [], default_keys, extra_keys, lean=lean)
+                     for name, ref_schema in (refs or {}).items()}
+        self.compiled.resolve_refs(self.refs)
+
+        #: Input limits
+        self.limits = limits
+
+        #: Metrics hook
+        self.metrics = metrics
+
+        #: Does the schema contain batched validators? See [`BatchCheck`](#batchcheck)
+        self.batched = self.compiled.batched
+
+        self._dispatch()
+
+    def _dispatch(self):
+        """ Pick the validation path for __call__(), once: the compiled schema,
+        wrapped only with the features that are in use (limits, batching, metrics)
+        """
+        validate = self.compiled
+        if self.batched:
+            validate = partial(BatchScope.validate, validate)
+        if self.limits is not None:
+            validate = self.limits.wrap(validate)
+        if self.metrics is not None:
+            wrap = getattr(self.metrics, 'wrap', None)
+            validate = wrap(validate) if wrap is not None else partial(self.metrics, validate)
+        self._call = validate
+
+    def _derive(self, compiled, fresh=None):
+        """ Make a `Schema` with the same settings for another compiled schema
+
+        :type compiled: CompiledSchema
+        :param fresh: Sub-schemas compiled for the new schema: their references are bound to it.
+            `Schema`s used within them keep their own references.
+        :type fresh: list[CompiledSchema]|None
+        :rtype: Schema
+        """
+        if fresh:
+            compiled.resolve_refs(self.refs, roots=fresh)
+
+        schema = copy(self)
+        schema.__dict__.pop('async_compilers', None)
+        schema.__dict__.pop('iterative_compilers', None)
+        schema.compiled = compiled
+        schema.name = compiled.name
+        # Removed sub-schemas are not accounted for: needless batching only costs a scope
+        schema.batched = self.batched or any(node.batched for node in fresh or [])
+        schema._dispatch()
+        return schema
+
     def __repr__(self):
         return repr(self.compiled)
 
@@ -299,4 +375,461 @@ class Schema(object):
         :raises good.Invalid: Validation error on a single value. See [`Invalid`](#invalid).
         :raises good.MultipleInvalid: Validation error on multiple values. See [`MultipleInvalid`](#multipleinvalid).
         """
-        return self.compiled(value)
+        return self._call(value)
+
+    def validate_async(self, value, concurrency=None, chunk_size=None):
+        """ Validate the input asynchronously (Python 3.5+).
+
+        Coroutine functions are accepted anywhere a callable is: as a schema,
+        within [`Check()`](#check), [`All()`](#all) and the other validators that wrap schemas.
+
+        ```python
+        async def unique_login(login):
+            if await db.users.exists(login=login):
+                raise Invalid(u'Login is taken')
+            return login
+
+        schema = Schema({
+            'login': All(str, unique_login),
+            'groups': [Check(group_exists, u'Unknown group')],
+        })
+
+        user = await schema.validate_async(data, concurrency=10)
+        ```
+
+        Values of a mapping, and members of a list, are validated concurrently.
+        Sub-schemas that have no coroutine validators are executed synchronously, like [`Schema.__call__()`](#validating) does.
+
+        Note that coroutine validators are not supported as mapping keys, and can't provide defaults for missing keys.
+
+        Even without coroutine validators, validating a huge input blocks the event loop for a long time.
+        With `chunk_size`, mappings and iterables are validated in chunks of N items, and the loop gets control
+        back between chunks: `await asyncio.sleep(0)`. The result is the same as with the synchronous call:
+
+        ```python
+        async def handler(request):
+            data = await schema.validate_async(await request.json(), chunk_size=1000)
+        ```
+
+        :param value: Input value to validate
+        :param concurrency: The maximum number of coroutine validators awaited at the same time. `None` for no limit.
+        :type concurrency: int|None
+        :param chunk_size: Yield to the event loop every N items. `None` to never yield.
+        :type chunk_size: int|None
+        :return: Coroutine that returns the sanitized value
+        :raises good.Invalid: Validation error on a single value. See [`Invalid`](#invalid).
+        :raises good.MultipleInvalid: Validation error on multiple values. See [`MultipleInvalid`](#multipleinvalid).
+        :raises SchemaError: A validator wraps a coroutine validator, but does not support them
+        """
+        from . import aio
+        return aio.validate(self, value, concurrency, chunk_size)
+
+    def validate_iterative(self, value, max_depth=None):
+        """ Validate the input without recursion.
+
+        [`Schema.__call__()`](#validating) validates nested values recursively, and every level of nesting
+        costs a few Python frames: deeply nested input ends up with `RecursionError`.
+
+        This method validates the input with an explicit stack of its own: nested mappings and iterables,
+        [`Ref()`](#recursive-schemas)s, and validators that wrap schemas ([`All()`](#all), [`Any()`](#any),
+        [`Maybe()`](#maybe), [`Neither()`](#neither), [`Msg()`](#msg), [`Object()`](#object), `Schema`)
+        do not use the Python stack. The result and the errors are the same as with [`Schema.__call__()`](#validating).
+
+        ```python
+        schema = Schema({'value': int, Optional('next'): Maybe(Ref())})
+
+        schema.validate_iterative(linked_list_of_10000_items)
+        schema.validate_iterative(value, max_depth=100)
+        #-> Invalid: Too deeply nested @ ['next', 'next', ...]: expected 100 levels of nesting
+        ```
+
+        Other validators run their sub-schemas recursively, and their nested containers are not counted by `max_depth`.
+
+        :param value: Input value to validate
+        :param max_depth: The maximum nesting depth of mappings and iterables. `None` for no limit.
+        :type max_depth: int|None
+        :return: Sanitized value
+        :raises good.Invalid: Validation error on a single value. See [`Invalid`](#invalid).
+        :raises good.MultipleInvalid: Validation error on multiple values. See [`MultipleInvalid`](#multipleinvalid).
+        """
+        from . import iterative
+        if self.limits is not None:
+            self.limits.check(value)
+        if self.batched:
+            return BatchScope.validate(lambda v: iterative.validate(self, v, max_depth), value)
+        return iterative.validate(self, value, max_depth)
+
+    def revalidate(self, value, changes):
+        """ Re-validate the changed parts of a validated value only.
+
+        When a large document is edited a bit at a time, validating all of it after every edit is a waste.
+        This method takes a value that has already been validated by this schema, and a list of changes,
+        and only re-validates the changed sub-trees:
+
+        ```python
+        schema = Schema({
+            'title': str,
+            'items': [{'name': str, 'price': int}],
+        })
+
+        doc = schema(doc)
+        doc['items'][5]['price'] = 10
+        doc = schema.revalidate(doc, [['items', 5, 'price']])
+        ```
+
+        The changes are either a list of paths, or a [JSON Patch](https://tools.ietf.org/html/rfc6902)-like diff
+        with `add`, `remove` and `replace` operations, which is applied to the value first:
+
+        ```python
+        doc = schema.revalidate(doc, [
+            {'op': 'replace', 'path': '/items/5/price', 'value': 10},
+            {'op': 'remove', 'path': '/items/0'},
+        ])
+        ```
+
+        The mappings and the iterables on the way to a changed path are not validated again: only the changed keys
+        and items are, plus the [`Entire`](#entire) markers of the mappings, since these depend on all of the keys.
+        A removed key is checked with its marker, e.g. [`Required`](#required).
+        The results are spliced into the value, which is modified in place: just like `Schema.__call__()` does.
+        A diff, though, is applied to a copy of the value: only the containers on the way to the changed paths are copied,
+        and the value itself is left as it is, even if the patched value fails validation.
+
+        Validators that wrap schemas, such as [`Any()`](#any) or [`Maybe()`](#maybe), can't be split:
+        a change below such a validator re-validates its whole sub-tree.
+        The same goes for a removed key matched by a non-literal key schema, e.g. `{Required(str): int}`:
+        the whole mapping is re-validated.
+
+        Note that the unchanged parts are not validated again, so the schema should not depend on values
+        it doesn't see: e.g. a validator that computes a total of a list.
+
+        :param value: The value validated by this schema
+        :param changes: Changed paths: `[['items', 5, 'price'], ...]`, or a JSON-Patch-like diff
+        :type changes: list[list]|list[dict]
+        :return: Sanitized value
+        :raises good.Invalid: Validation error on a single value. See [`Invalid`](#invalid).
+        :raises good.MultipleInvalid: Validation error on multiple values. See [`MultipleInvalid`](#multipleinvalid).
+        """
+        from . import incremental
+        value, paths, tree = incremental.prepare(value, changes)
+        if self.limits is not None:
+            incremental.check_limits(self.limits, value, paths)
+        if self.batched:
+            return BatchScope.validate(lambda v: incremental.revalidate(self.compiled, v, tree), value)
+        return incremental.revalidate(self.compiled, value, tree)
+
+    def project(self, fields, required=False, entire=False, drop=False):
+        """ Derive a schema that only validates the given fields of a mapping.
+
+        When a consumer only reads a few fields of a wide payload, validating all of it is a waste.
+        The projected schema validates the selected fields, and leaves the other keys alone:
+
+        ```python
+        schema = Schema({
+            'id': int,
+            'title': str,
+            'author': {'name': str, 'email': Email()},
+            # ... 300 more keys
+        })
+
+        light = schema.project(['id', ('author', 'name')])
+        light({'id': 1, 'author': {'name': 'a', 'email': 'not-validated'}, 'whatever': 1})
+        #-> {'id': 1, 'author': {'name': 'a', 'email': 'not-validated'}, 'whatever': 1}
+        ```
+
+        A field is a key of the mapping, or a path to a nested one. Paths go through nested mappings,
+        [`Ref()`](#recursive-schemas)s and nested `Schema`s, and through the items of iterables:
+        with `{'tags': [{'name': str, 'color': str}]}`, the field `('tags', 'name')` is the name of every tag.
+
+        The projected schema reuses the compiled sub-schemas of this one: nothing is compiled again
+        but for a catch-all [`Extra`](#extra) of every projected mapping.
+        Note that references still refer to the original schema.
+
+        :param fields: Keys, or paths to nested keys: `['id', ('author', 'name')]`
+        :type fields: collections.Iterable
+        :param required: Keep the [`Required`](#required) checks of the other keys: these must still be present,
+            but their values are not validated.
+        :type required: bool
+        :param entire: Keep the [`Entire`](#entire) markers.
+            Note that these get the values of the other keys as they came with the input.
+        :type entire: bool
+        :param drop: Drop the other keys from the output, instead of passing them through
+        :type drop: bool
+        :rtype: Schema
+        :raises SchemaError: A field is not in the schema, or the schema is not a mapping
+        """
+        from . import derive
+        return self._derive(derive.project(self.compiled, fields, required, entire, drop))
+
+    def extend(self, schema):
+        """ Derive a schema with more mapping keys, or with other schemas for the existing ones.
+
+        `Schema(dict(base, key=int))` compiles the whole of the `base` mapping again.
+        This method only compiles the given keys, and reuses the compiled schemas of the others:
+
+        ```python
+        base = Schema({
+            'id': int,
+            'name': str,
+            # ... 300 more keys
+        })
+
+        tenant = base.extend({
+            'name': All(str, Length(max=10)),  # replaced
+            Optional('color'): str,  # added
+        })
+        ```
+
+        The new keys replace the existing keys they're equal to, just like with `dict.update()`:
+        `'name'` replaces `Required('name')`, and `Extra` replaces the implicit `Extra` of the mapping.
+
+        The derived schema has the same settings as this one.
+        [`Ref()`](#recursive-schemas) in the new keys refers to the derived schema,
+        while the references of the other keys still refer to this one.
+
+        :param schema: Mapping schema: { key: schema }
+        :type schema: dict
+        :rtype: Schema
+        :raises SchemaError: The schema is not a mapping, or the new keys can't be compiled
+        """
+        from . import derive
+        fresh = []
+        return self._derive(derive.extend(self.compiled, schema, fresh), fresh)
+
+    def without(self, keys):
+        """ Derive a schema without some mapping keys.
+
+        The compiled schemas of the other keys are reused:
+
+        ```python
+        public = user_schema.without(['password', 'email'])
+        ```
+
+        Removing `Extra` brings back the default one: see `extra_keys`.
+
+        :param keys: The keys to remove. Markers are removed by their keys: `'a'` removes `Optional('a')`.
+        :type keys: collections.Iterable
+        :rtype: Schema
+        :raises SchemaError: The schema is not a mapping, or a key is not in the schema
+        """
+        from . import derive
+        fresh = []
+        return self._derive(derive.without(self.compiled, keys, fresh), fresh)
+
+    def replace(self, path, schema):
+        """ Derive a schema with another sub-schema at the path.
+
+        Only the new sub-schema is compiled, and the mappings and iterables on the way to it are rebuilt:
+        the compiled schemas of everything else are reused.
+
+        ```python
+        base = Schema({
+            'author': {'name': str, 'email': Email()},
+            'tags': [{'name': str}],
+        })
+
+        lax = base.replace(['author', 'email'], Maybe(str))
+        lax = lax.replace(['tags', 0, 'name'], Any(str, int))  # the 1st member of the list
+        ```
+
+        The path goes through mapping keys, and through the indexes of the iterable members.
+        It also goes into [`Ref()`](#recursive-schemas)s and nested `Schema`s:
+        the derived schema gets a modified copy of these, while the references themselves are left alone.
+
+        :param path: Path to the sub-schema: mapping keys, and indexes of iterable members
+        :type path: list
+        :param schema: The new sub-schema
+        :rtype: Schema
+        :raises SchemaError: Wrong path, or the sub-schema can't be compiled
+        """
+        from . import derive
+        fresh = []
+        return self._derive(derive.replace(self.compiled, list(path), schema, fresh), fresh)
+
+    def profile(self):
+        """ Profile the validation: the time spent in every sub-schema.
+
+        `cProfile` sees nothing but anonymous `validate_mapping` closures.
+        The profiler records every compiled sub-schema by its path within the schema, and by its name:
+        calls, cumulative time, self time, and failures:
+
+        ```python
+        with schema.profile() as profiler:
+            for value in values:
+                schema(value)
+
+        print(profiler.report(limit=10))
+        #->      calls  total, ms   self, ms   failures  path: name
+        #->      10000    220.011     98.312          0  /items/[]/price: Any(Integer number|Fraction)
+        #->      ...
+
+        with open('validation.folded', 'w') as f:
+            f.write(profiler.collapsed())  # for flame graphs
+        ```
+
+        Profiling is on within the `with` block, or between `profiler.start()` and `profiler.stop()`.
+        When it's off, the original validators are back in place: no overhead.
+
+        Paths use `/` to separate mapping keys, and `[]` for the members of iterables:
+        `[0]`, `[1]`, ... when there are several of them.
+        Sub-schemas of validators (e.g. `All(int, Range(0, 10))`) have the path of the validator itself.
+        A sub-schema that is used in many places (e.g. with [`Ref()`](#recursive-schemas)) is reported once,
+        at the first path it's found at.
+
+        Note that the profiler measures itself as well: self times of tiny validators are inflated.
+        Only [`Schema.__call__()`](#validating) is profiled.
+
+        The profiler instruments the compiled sub-schemas in place, and these may be shared with other schemas.
+        A schema made with [`extend()`](#deriving-schemas) and its source share the sub-schemas they have in common.
+        While profiling is on, the other schemas that share them are slowed down as well, and their calls are counted.
+        So are the calls from other threads.
+        Other `Schema`s used within this one are not instrumented: each is measured as a single sub-schema,
+        and they can be profiled on their own.
+        Start and stop profilers from a single thread, and don't let profilers of schemas that share sub-schemas overlap.
+
+        :rtype: good.schema.profiler.Profiler
+        """
+        from .profiler import Profiler
+        return Profiler(self)
+
+    def profile_allocations(self):
+        """ Profile the memory the validation allocates: bytes per sub-schema (Python 3.4+: uses `tracemalloc`).
+
+        Works like [`Schema.profile()`](#profiling), but measures the traced memory instead of time:
+        the net size of the allocations a sub-schema makes and keeps, e.g. the sanitized values it builds:
+
+        ```python
+        with schema.profile_allocations() as profiler:
+            schema(value)
+
+        print(profiler.report(limit=10))
+        #->      calls total, bytes  self, bytes  self/call   failures  path: name
+        #->          3          984          984        328          0  /items/[]: {name, price}
+        #->      ...
+        ```
+
+        Temporary objects allocated and freed within a call are not counted.
+        `tracemalloc` is started if it's not running, and stopped when profiling is done.
+
+        :rtype: good.schema.memory.AllocationProfiler
+        :raises RuntimeError: `tracemalloc` is not available
+        """
+        from .memory import AllocationProfiler
+        return AllocationProfiler(self)
+
+    def memory_report(self):
+        """ Measure the memory the compiled schema retains: bytes per sub-schema.
+
+        Attributes every compiled sub-schema with its own memory: the node, the validator closure,
+        the values it keeps (names, markers, error messages, sub-schema lists, the definition),
+        and the mapping keys within their mapping:
+
+        ```python
+        report = schema.memory_report()
+        report.total  #-> 51234
+
+        print(report.report(limit=10))
+        #->      bytes  path: name
+        #->       3120  /: {id, items, kids}
+        #->       ...
+        #->      51234  total
+        ```
+
+        Every object is counted once, by the first sub-schema that keeps it.
+        The objects that are shared by all schemas -- types, modules, code, module-level functions -- aren't counted.
+        This is an estimate: the memory allocator overhead is not included.
+
+        :rtype: good.schema.memory.MemoryReport
+        """
+        from .memory import memory_report
+        return memory_report(self)
+
+    def explain(self):
+        """ Explain the compiled schema: the execution plan, its estimated cost, and the patterns that are slow.
+
+        Every compiled sub-schema is a step of the plan, with its path, name, kind, and a rough cost estimate:
+        relative to a type check, and assuming that every literal key is present.
+        Mapping keys are listed in the order they're matched, and tell how they're matched:
+
+        * `literal`: a single lookup
+        * `identity`: a catch-all that takes all of the remaining keys at once
+        * `scan`: a loop over the remaining input keys that calls the key matcher for every one of them
+
+        ```python
+        print(Schema({'id': int, 'tags': [str], str: Any(int, float, bool, None)}).explain().report())
+        #-> Dictionary[id,tags,String,*]  (mapping, cost 71; 4 keys: 2 literal, 0 identity, 2 scan; O(n) matcher loop for String)
+        #->   Required(id) [literal] -> Integer number  (type, cost 1)
+        #->   Required(tags) [literal] -> List[String]  (iterable, cost 3; per item: 1)
+        #->     String  (type, cost 1)
+        #->   Required(String) [scan] -> Any(Integer number|Fractional number|Boolean|None)  (callable, cost 46; ...)
+        #->     ...
+        #->   Extra(*) [scan] -> *  (marker, cost 1)
+        #->
+        #-> Warnings:
+        #->   /String: [any-branches] Any(Integer number|Fractional number|Boolean|None): 4 branches, ...
+        ```
+
+        The warnings point out the patterns that are slow:
+
+        * `scan-keys`: many non-literal mapping keys: every input key goes through each of their matchers
+        * `callable-key`: a callable mapping key: it raises an error for every key it does not match
+        * `any-branches`: [`Any()`](#any) with many branches: every failed branch raises an error
+        * `deep-any`: `Any()` nested in `Any()`: errors are raised and caught at every level
+        * `in-list`: [`In()`](#in) with unhashable values: a linear search
+        * `object-proxy`, `object-slots`: [`Object()`](#object) that can't use compiled attribute access
+
+        In a test, `assert not schema.explain().warnings` stops slow schemas before they ship.
+
+        :rtype: good.schema.explain.Explanation
+        """
+        from .explain import explain
+        return explain(self)
+
+    def sampler(self, seed=None, providers=None, **kwargs):
+        """ Get a sample generator: makes valid values for the schema, and invalid ones with known error paths.
+
+        It walks the compiled schema and makes realistic values: required keys and some of the optional ones,
+        lists of a few items, values of types, and values that validators accept:
+        `Range()`, `Length()`, `In()`, `Map()`, `Match()` (simple patterns), `Email()`, `Url()`,
+        `DateTime()` formats, `Maybe()`, `Any()`, `All()`, `Object()`, `Record()`, ...
+
+        ```python
+        from good import Schema, Optional, Range, In, DateTime, Maybe
+
+        schema = Schema({
+            'id': int,
+            'age': Range(18, 99),
+            'role': In(['admin', 'user']),
+            'created': DateTime('%Y-%m-%d'),
+            Optional('referrer'): Maybe(str),
+        })
+        sampler = schema.sampler(seed=1)
+
+        sampler.valid()
+        #-> {'id': 137, 'age': 34, 'role': 'user', 'created': '2011-05-20'}
+        sampler.invalid()
+        #-> Sample(value={'id': 137, 'age': None, ...}, path=['age'])
+
+        for value, path in sampler.samples(10000, invalid=0.05):
+            ...  # `path` is `None` for valid values
+        ```
+
+        Every value is validated before it's returned: a valid value passes the schema,
+        and an invalid one has a single error, which the schema reports at `path`:
+        a wrong value, or a missing required key.
+        The same seed makes the same values.
+
+        For custom validators that it can't make values for, it tries some simple values,
+        and fails with a `SchemaError` if none of them pass.
+        Give it the values with `providers`: `{validator-or-class: lambda random: value}`.
+
+        :param seed: Random seed
+        :param providers: Values for custom validators: { callable|type: provider(random) }
+        :type providers: dict|None
+        :param kwargs: More options: `max_items`, `max_depth`, `attempts`
+        :rtype: good.schema.samples.SampleGenerator
+        """
+        from .samples import SampleGenerator
+        return SampleGenerator(self, seed, providers, **kwargs)
+
+
+CompiledSchema.schema_cls = Schema
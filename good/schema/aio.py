@@ -0,0 +1,606 @@
+""" Asynchronous validation: coroutine validators, awaited concurrently.
+
+This module requires Python 3.5+ and is imported by [`Schema.validate_async()`](#validating-asynchronously) on demand.
+
+The synchronous validators are compiled into closures by `CompiledSchema`.
+`AsyncCompiler` compiles another set of closures on top of them, but only for the nodes that contain
+coroutine validators: every other sub-schema is called synchronously, without awaiting at all.
+
+In the chunked mode, containers are compiled as well, even if they're synchronous:
+they yield to the event loop every N items, so validating a huge input does not block it.
+"""
+
+import asyncio
+
+import six
+
+from . import markers, signals
+from .errors import SchemaError, Invalid, MultipleInvalid
+from .util import get_literal_name, get_provided_name, get_type_name, const
+from . import Schema
+from .. import helpers
+from ..validators import predicates, boolean
+
+
+def is_coroutine_callable(f):
+    """ Test whether the callable is a coroutine function, or an object with a coroutine `__call__()`
+
+    :rtype: bool
+    """
+    return asyncio.iscoroutinefunction(f) or asyncio.iscoroutinefunction(getattr(f, '__call__', None))
+
+
+class AsyncContext(object):
+    """ Runtime state of a single asynchronous validation
+
+    :param concurrency: The maximum number of coroutine validators awaited at the same time, or `None` for no limit
+    :type concurrency: int|None
+    :param chunk_size: Yield to the event loop every N items, or `None` to never yield
+    :type chunk_size: int|None
+    """
+
+    def __init__(self, concurrency=None, chunk_size=None):
+        self.semaphore = asyncio.Semaphore(concurrency) if concurrency else None
+        self.chunk_size = chunk_size
+        #: The number of items validated since the last yield
+        self.counter = 0
+
+    def tick(self, n=1):
+        """ Count validated items
+
+        :param n: The number of items
+        :return: Whether it's time to yield to the event loop: `await asyncio.sleep(0)`
+        :rtype: bool
+        """
+        self.counter += n
+        if self.counter >= self.chunk_size:
+            self.counter = 0
+            return True
+        return False
+
+    async def call(self, f, v):
+        """ Await a coroutine validator, respecting the concurrency limit """
+        if self.semaphore is None:
+            return await f(v)
+        async with self.semaphore:
+            return await f(v)
+
+    async def gather(self, coros):
+        """ Await coroutines concurrently.
+
+        If any of them fails, the rest are cancelled.
+
+        :rtype: list
+        """
+        tasks = [asyncio.ensure_future(c) for c in coros]
+        try:
+            return await asyncio.gather(*tasks)
+        except BaseException:
+            for task in tasks:
+                task.cancel()
+            raise
+
+
+async def settle(coro):
+    """ Await a validation coroutine and capture the outcome
+
+    :return: (True, sanitized-value) | (False, Invalid|RemoveValue)
+    :rtype: tuple
+    """
+    try:
+        return True, await coro
+    except (Invalid, signals.RemoveValue) as e:
+        return False, e
+
+
+class AsyncCompiler(object):
+    """ Compiles `CompiledSchema` nodes into asynchronous validators.
+
+    `compile(node)` returns a coroutine function `f(value, context)`, or `None` when the node is synchronous:
+    then, the node is just called.
+
+    :param chunked: Compile containers for the chunked mode
+    :type chunked: bool
+
+    Validators that wrap other schemas (e.g. `All()`) need an async implementation in order to await their sub-schemas:
+    these are registered in `adapters`: { validator class: method name }.
+    The method receives the validator and a function to run a compiled sub-schema, and returns an async validator.
+    """
+
+    adapters = {
+        Schema: '_adapt_schema',
+        predicates.All: '_adapt_all',
+        predicates.Any: '_adapt_any',
+        predicates.Neither: '_adapt_neither',
+        predicates.Maybe: '_adapt_maybe',
+        helpers.Msg: '_adapt_msg',
+        helpers.Object: '_adapt_object',
+        helpers.Test: '_adapt_test',
+        boolean.Check: '_adapt_check',
+    }
+
+    def __init__(self, chunked=False):
+        self.chunked = chunked
+        #: Cache: { id(node): (node, compiled, concurrent) }
+        self._compiled = {}
+
+    def compile(self, node):
+        """ Compile a node
+
+        :type node: CompiledSchema
+        :return: Async validator, or `None` if the node is synchronous
+        :rtype: callable|None
+        :raises SchemaError: A validator does not support async sub-schemas
+        """
+        return self._get(node)[1]
+
+    def concurrent(self, node):
+        """ Test whether the node has coroutine validators.
+
+        In the chunked mode, synchronous containers are compiled as well: their items are validated sequentially.
+
+        :type node: CompiledSchema
+        :rtype: bool
+        """
+        return self._get(node)[2]
+
+    def _get(self, node):
+        try:
+            return self._compiled[id(node)]
+        except KeyError:
+            compiled, concurrent = self._compile(node)
+            self._compiled[id(node)] = entry = (node, compiled, concurrent)
+            return entry
+
+    def runner(self, node):
+        """ Get a coroutine function that validates a value with the node, whether it's async or not
+
+        :type node: CompiledSchema
+        :rtype: callable
+        """
+        compiled = self.compile(node)
+        if compiled is not None:
+            return compiled
+
+        async def run_sync(v, context):
+            return node(v)
+        return run_sync
+
+    def _compile(self, node):
+        """ Compile a node
+
+        :return: (compiled, concurrent)
+        :rtype: (callable|None, bool)
+        """
+        if node.compiled_type == const.COMPILED_TYPE.SCHEMA:
+            return self._get(node.schema)[1:]
+        elif node.compiled_type == const.COMPILED_TYPE.CALLABLE:
+            return self._compile_callable(node)
+        elif node.compiled_type == const.COMPILED_TYPE.ITERABLE:
+            return self._compile_iterable(node)
+        elif node.compiled_type == const.COMPILED_TYPE.MAPPING:
+            return self._compile_mapping(node)
+        elif node.compiled_type == const.COMPILED_TYPE.REF:
+            return self._compile_ref(node)
+        else:
+            return None, False
+
+    def _compile_callable(self, node):
+        schema = node.schema
+
+        # Coroutine validator
+        if is_coroutine_callable(schema):
+            async def validate_coroutine(v, context):
+                return await context.call(schema, v)
+            validate = validate_coroutine
+            concurrent = True
+        # Validator with sub-schemas
+        else:
+            subs = node.sub_schemas
+            concurrent = self._has_coroutines(schema) or any(self.concurrent(sub) for sub in subs)
+            if not concurrent and all(self.compile(sub) is None for sub in subs):
+                return None, False
+            try:
+                adapter = getattr(self, self.adapters[type(schema)])
+            except KeyError:
+                if not concurrent:
+                    return None, False  # Chunked mode: can't get inside, so it just runs synchronously
+                raise SchemaError(_(u'{name} does not support coroutine validators').format(name=node.name))
+            validate = adapter(schema)
+
+        # Error utils: same as CompiledSchema._compile_callable()
+        enrich_exception = lambda e, value: e.enrich(
+            expected=node.name,
+            provided=get_provided_name(e, value),
+            path=node.path,
+            validator=schema)
+
+        async def validate_with_callable(v, context):
+            try:
+                return await validate(v, context)
+            except Invalid as e:
+                enrich_exception(e, v)
+                raise
+            except const.transformed_exceptions as e:
+                message = _(u'{message}').format(
+                    Exception=type(e).__name__,
+                    message=six.text_type(e))
+                e = Invalid(message)
+                raise enrich_exception(e, v)
+        return validate_with_callable, concurrent
+
+    def _compile_ref(self, node):
+        # The target contains this very node: it can't be compiled yet.
+        # Hence, look for coroutine validators over the whole target tree, and compile it on the first call.
+        target = node.target
+        if target is None:
+            return None, False  # unresolved: fails synchronously
+
+        concurrent = any(sub.compiled_type == const.COMPILED_TYPE.CALLABLE and
+                         (is_coroutine_callable(sub.schema) or self._has_coroutines(sub.schema))
+                         for sub in target.walk())
+        if not concurrent and not self.chunked:
+            return None, False
+
+        async def validate_ref(v, context):
+            return await self.runner(target)(v, context)
+        return validate_ref, concurrent
+
+    def _has_coroutines(self, schema):
+        """ Test whether a validator wraps coroutine functions directly (not through sub-schemas) """
+        if isinstance(schema, boolean.Check):
+            return is_coroutine_callable(schema.bvalidator)
+        if isinstance(schema, helpers.Test):
+            return is_coroutine_callable(schema.fun)
+        return False
+
+    def _compile_iterable(self, node):
+        members = [(member, self.compile(member)) for member in node.iterable_schemas]
+        concurrent = any(self.concurrent(member) for member in node.iterable_schemas)
+        flat = all(compiled is None for member, compiled in members)
+        if flat and not self.chunked:
+            return None, False
+
+        schema_type = type(node.schema)
+        error_passthrough = len(members) == 1
+        err_value = node.Invalid(_(u'Invalid value'), node.name)
+
+        def validate_value_sync(value_index, value):
+            # Same as CompiledSchema._compile_iterable()
+            for member, compiled in members:
+                try:
+                    return True, member(value)
+                except signals.RemoveValue as e:
+                    return False, e
+                except Invalid as e:
+                    if error_passthrough:
+                        return False, e.enrich(path=[value_index])
+            return False, err_value(get_literal_name(value), path=[value_index])
+
+        async def validate_value(value_index, value, context):
+            # Same as CompiledSchema._compile_iterable(), but awaits async members
+            for member, compiled in members:
+                try:
+                    return True, (member(value) if compiled is None else await compiled(value, context))
+                except signals.RemoveValue as e:
+                    return False, e
+                except Invalid as e:
+                    if error_passthrough:
+                        return False, e.enrich(path=[value_index])
+            return False, err_value(get_literal_name(value), path=[value_index])
+
+        async def validate_iterable(l, context):
+            # Type errors are reported by the synchronous validator
+            if not isinstance(l, schema_type):
+                return node(l)
+
+            # Concurrently
+            if concurrent:
+                outcomes = await context.gather(validate_value(value_index, value, context)
+                                                for value_index, value in enumerate(list(l)))
+            # Chunked: small flat iterables are validated at once
+            elif flat and context.counter + len(l) <= context.chunk_size:
+                if context.tick(len(l)):
+                    await asyncio.sleep(0)
+                return node(l)
+            # Chunked: sequentially.
+            # Only leaf values are counted: containers count their own items.
+            elif flat:
+                outcomes = []
+                for value_index, value in enumerate(list(l)):
+                    outcomes.append(validate_value_sync(value_index, value))
+                    if context.tick():
+                        await asyncio.sleep(0)
+            else:
+                outcomes = [await validate_value(value_index, value, context)
+                            for value_index, value in enumerate(list(l))]
+
+            errors = []
+            values = []
+            for okay, result in outcomes:
+                if okay:
+                    values.append(result)
+                elif isinstance(result, Invalid):
+                    errors.append(result)
+
+            if errors:
+                raise MultipleInvalid.if_multiple(errors)
+            return schema_type(values)
+        return validate_iterable, concurrent
+
+    def _compile_mapping(self, node):
+        for key_schema, value_schema, is_literal, is_identity in node.mapping_schemas:
+            if self.compile(key_schema.compiled.key_schema) is not None:
+                raise SchemaError(_(u'Mapping keys do not support coroutine validators: {name}').format(name=key_schema.name))
+        compiled = [(key_schema, value_schema, is_literal, is_identity, self.compile(value_schema))
+                    for key_schema, value_schema, is_literal, is_identity in node.mapping_schemas]
+        concurrent = any(self.concurrent(value_schema) for key_schema, value_schema, is_literal, is_identity in node.mapping_schemas)
+        flat = all(value_compiled is None for key_schema, value_schema, is_literal, is_identity, value_compiled in compiled)
+        if flat and not self.chunked:
+            return None, False
+
+        async def validate_mapping(d, context):
+            # The compiler rebuilds mapping schemas into a `dict`, so that's the type it checks.
+            # Type errors are reported by the synchronous validator.
+            if not isinstance(d, dict):
+                return node(d)
+
+            # Chunked: small flat mappings are validated at once
+            if flat and context.counter + len(d) <= context.chunk_size:
+                if context.tick(len(d)):
+                    await asyncio.sleep(0)
+                return node(d)
+
+            # Same as CompiledSchema._compile_mapping(), except that values are not written immediately.
+            # Every match is queued: [(key, sanitized-key, value, value-schema, outcome)],
+            # where `outcome` is a coroutine, or the (okay, result) tuple of a synchronous value-schema.
+            # In the chunked mode, values are awaited sequentially, and the queue only contains tuples.
+            # Marker errors are queued as well, so the errors are reported in the same order.
+            # The queue is flushed when all async values have been awaited.
+
+            errors = []
+            queue = []
+            d_keys = set(d.keys())
+
+            async def flush():
+                coros = [entry[4] for entry in queue if not isinstance(entry, Invalid) and not isinstance(entry[4], tuple)]
+                settled = iter(await context.gather(map(settle, coros)) if coros else ())
+
+                for entry in queue:
+                    if isinstance(entry, Invalid):
+                        errors.append(entry)
+                        continue
+
+                    k, sanitized_k, v, value_schema, outcome = entry
+                    okay, result = outcome if isinstance(outcome, tuple) else next(settled)
+                    if okay:
+                        d[sanitized_k] = result
+                        if k != sanitized_k:
+                            del d[k]
+                    elif isinstance(result, signals.RemoveValue):
+                        del d[k]
+                    else:
+                        errors.append(result.enrich(
+                            expected=value_schema.name,
+                            provided=get_provided_name(result, v),
+                            path=node.path + [k],
+                            validator=value_schema
+                        ))
+                del queue[:]
+
+            for key_schema, value_schema, is_literal, is_identity, value_compiled in compiled:
+                # Matches
+                matches = []
+                if is_literal:
+                    k = key_schema.schema.key
+                    if k in d_keys:
+                        matches.append((k, k, d[k]))
+                        d_keys.remove(k)
+                elif is_identity:
+                    matches.extend((k, k, d[k]) for k in d_keys)
+                    d_keys = None
+                elif d_keys:
+                    for k in tuple(d_keys):
+                        okay, sanitized_k = key_schema(k)
+                        if okay:
+                            matches.append((k, sanitized_k, d[k]))
+                            d_keys.remove(k)
+
+                # Marker
+                if key_schema.compiled_type == const.COMPILED_TYPE.MARKER:
+                    marker = key_schema.compiled
+                    try:
+                        if isinstance(marker, markers.Entire):
+                            # Entire validates the mapping: values have to be ready
+                            await flush()
+                            if value_compiled is not None:
+                                await self._execute_entire(marker, value_compiled, d, context)
+                                continue
+                        matches = marker.execute(d, matches)
+                    except Invalid as e:
+                        queue.append(e.enrich(
+                            expected=key_schema.name,
+                            provided=None,
+                            path=node.path,
+                            validator=marker
+                        ))
+                        continue
+
+                # Values
+                for k, sanitized_k, v in matches:
+                    if value_compiled is None:
+                        try:
+                            outcome = True, value_schema(v)
+                        except (Invalid, signals.RemoveValue) as e:
+                            outcome = False, e
+                    elif concurrent:
+                        outcome = value_compiled(v, context)
+                    else:
+                        outcome = await settle(value_compiled(v, context))
+                    queue.append((k, sanitized_k, v, value_schema, outcome))
+
+                    # Chunked: only leaf values are counted, containers count their own items
+                    if value_compiled is None and self.chunked and context.tick():
+                        await asyncio.sleep(0)
+
+            await flush()
+
+            if errors:
+                raise MultipleInvalid.if_multiple(errors)
+            return node.rebuild_lean(d) if node.lean else d
+        return validate_mapping, concurrent
+
+    async def _execute_entire(self, marker, value_compiled, d, context):
+        """ Same as `Entire.execute()`, but awaits the value schema """
+        try:
+            await value_compiled(d, context)
+        except Invalid as e:
+            e.enrich(
+                expected=marker.value_schema.name,
+                provided=get_type_name(type(d)),
+                validator=marker.value_schema.schema
+            )
+            raise
+
+    #region Adapters
+
+    def _adapt_schema(self, schema):
+        return self.runner(schema.compiled)
+
+    def _adapt_all(self, validator):
+        runners = [self.runner(schema.compiled) for schema in validator.compiled]
+
+        async def validate_all(v, context):
+            for run in runners:
+                v = await run(v, context)
+            return v
+        return validate_all
+
+    def _adapt_any(self, validator):
+        runners = [self.runner(schema.compiled) for schema in validator.compiled]
+
+        async def validate_any(v, context):
+            for run in runners:
+                try:
+                    return await run(v, context)
+                except Invalid:
+                    pass
+            raise Invalid(_(u'Invalid value'))
+        return validate_any
+
+    def _adapt_neither(self, validator):
+        runners = [(schema, self.runner(schema.compiled)) for schema in validator.compiled]
+
+        async def validate_neither(v, context):
+            for schema, run in runners:
+                try:
+                    await run(v, context)
+                except Invalid:
+                    pass
+                else:
+                    raise Invalid(_(u'Value not allowed'), _(u'Not({})').format(schema.name), validator=schema.compiled.schema)
+            return v
+        return validate_neither
+
+    def _adapt_maybe(self, validator):
+        run = self.runner(validator.schema.compiled)
+
+        async def validate_maybe(v, context):
+            if v == validator.none or v is const.UNDEFINED:
+                return validator.none
+            try:
+                return await run(v, context)
+            except Invalid as ee:
+                for e in ee:
+                    e.expected += _(u'?')
+                raise
+        return validate_maybe
+
+    def _adapt_msg(self, validator):
+        run = self.runner(validator.compiled)
+
+        async def validate_msg(v, context):
+            try:
+                return await run(v, context)
+            except Invalid as ee:
+                for e in ee:
+                    e.message = validator.message
+                raise
+            except const.transformed_exceptions:
+                raise Invalid(validator.message or _(u'Invalid value'))
+        return validate_msg
+
+    def _adapt_object(self, validator):
+        run = self.runner(validator.compiled.compiled)
+
+        async def validate_object(v, context):
+            if not isinstance(v, validator.cls):
+                raise Invalid(_(u'Wrong value type'), provided=validator._format_value_type(v))
+            return (await run(helpers.ObjectProxy(v), context)).obj
+        return validate_object
+
+    def _adapt_test(self, validator):
+        async def validate_test(v, context):
+            try:
+                await context.call(validator.fun, v)
+            except Invalid:
+                raise
+            except Exception:
+                raise Invalid(_(u'Invalid value'))
+            else:
+                return v
+        return validate_test
+
+    def _adapt_check(self, validator):
+        async def validate_check(v, context):
+            if await context.call(validator.bvalidator, v):
+                return v
+            raise Invalid(validator.message, validator.expected)
+        return validate_check
+
+    #endregion
+
+
+
+def get_compiler(schema, chunked=False):
+    """ Get the async compiler of a `Schema`: there's one per Schema, and per mode
+
+    :type schema: Schema
+    :param chunked: Yield to the event loop in chunks?
+    :type chunked: bool
+    :rtype: AsyncCompiler
+    """
+    try:
+        compilers = schema.async_compilers
+    except AttributeError:
+        compilers = schema.async_compilers = {}
+    try:
+        return compilers[chunked]
+    except KeyError:
+        compiler = compilers[chunked] = AsyncCompiler(chunked)
+        return compiler
+
+
+async def validate(schema, value, concurrency=None, chunk_size=None):
+    """ Validate the value with a `Schema` asynchronously
+
+    :type schema: Schema
+    :param value: The value to validate
+    :param concurrency: The maximum number of coroutine validators awaited at the same time
+    :type concurrency: int|None
+    :param chunk_size: Yield to the event loop every N items
+    :type chunk_size: int|None
+    :return: Sanitized value
+    """
+    if schema.limits is not None:
+        schema.limits.check(value)
+
+    chunked = bool(chunk_size)
+
+    compiled = get_compiler(schema, chunked).compile(schema.compiled)
+
+    # Synchronous schema
+    if compiled is None:
+        return schema(value)
+
+    return await compiled(value, AsyncContext(concurrency, chunk_size))
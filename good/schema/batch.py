@@ -0,0 +1,201 @@
+""" Batched validation: validators that check all the values of a document at once """
+
+import threading
+from copy import copy, Error
+
+from .errors import Invalid
+from .util import get_type_name
+
+
+class BatchScope(object):
+    """ Batch validation scope: covers a single top-level `Schema` call.
+
+    A batched validator is a callable with the `batched = True` attribute, and a `load(values)` method
+    that checks a set of values at once, and returns a container of the valid ones.
+    See [`BatchCheck`](#batchcheck).
+
+    When a `Schema` contains batched validators, every call is validated within a scope, in two passes:
+
+    1. Batched validators only collect the values into the scope, and let them pass.
+    2. When the validation is over, every batched validator loads all the values it has collected, at once.
+
+        If every value is valid -- the result of the first pass is used.
+        Otherwise, the input is validated once again, and this time batched validators report errors
+        right on the spot, so they get correct paths like any other error.
+        Since validation modifies mappings in-place, the second pass uses a copy of the original input:
+        see `copy_containers()`.
+        Objects validated with [`Object()`](#object) are modified in-place as well: on the first pass,
+        `Object()` takes a copy of every object it gets, and validates that copy on the second pass. See `original()`.
+
+    The scope is thread-local: [`Schema.validate_async()`](#validating-asynchronously) does not use it,
+    since concurrent coroutines would share it. There, batched validators check every value on its own.
+    """
+
+    _local = threading.local()
+
+    def __init__(self):
+        #: Collecting values (1st pass), or reporting errors (2nd pass)?
+        self.collecting = True
+        #: Collected values: { validator: set(values) }
+        self.collected = {}
+        #: Loaded values: { validator: container }
+        self.loaded = {}
+        #: Objects, as they were before the 1st pass: { id(object): (object, copy) }
+        self.objects = {}
+
+    @classmethod
+    def current(cls):
+        """ Get the current scope
+
+        :rtype: BatchScope|None
+        """
+        return getattr(cls._local, 'scope', None)
+
+    @classmethod
+    def validate(cls, validate, value):
+        """ Validate the value within a scope.
+
+        If a scope is already there (e.g. with nested `Schema`s) -- it's used.
+
+        :param validate: The validation callable
+        :type validate: callable
+        :param value: The value to validate
+        :return: Sanitized value
+        :raises Invalid: Validation errors
+        """
+        if cls.current() is not None:
+            return validate(value)
+        return cls().run(validate, value)
+
+    def run(self, validate, value):
+        """ Validate the value within this scope
+
+        :param validate: The validation callable
+        :type validate: callable
+        :param value: The value to validate
+        :return: Sanitized value
+        :raises Invalid: Validation errors
+        """
+        original = copy_containers(value)
+
+        self._local.scope = self
+        try:
+            # 1st pass: collect
+            error = None
+            try:
+                value = validate(value)
+            except Invalid as e:
+                error = e
+
+            # Load the collected values
+            failed = False
+            for validator, values in self.collected.items():
+                loaded = self.loaded[validator] = validator.load(values)
+                failed = failed or any(v not in loaded for v in values)
+
+            # Everything's fine with batched validators
+            if not failed:
+                if error is not None:
+                    raise error
+                return value
+
+            # 2nd pass: report
+            self.collecting = False
+            return validate(original)
+        finally:
+            self._local.scope = None
+
+    def original(self, obj):
+        """ Get the object to validate in-place, e.g. with `Object()`.
+
+        On the 1st pass, a copy of the object is taken, and the object itself is returned.
+        On the 2nd pass, the copy is returned: the object has been modified by the 1st pass already.
+
+        :param obj: The object
+        :return: The object to validate
+        """
+        if self.collecting:
+            if id(obj) not in self.objects:
+                self.objects[id(obj)] = (obj, copy_object(obj))
+            return obj
+        return self.objects.get(id(obj), (obj, obj))[1]
+
+    def collect(self, validator, v):
+        """ Collect a value for a batched validator
+
+        :param validator: The batched validator
+        :param v: The value
+        :raises Invalid: The value is not hashable
+        """
+        try:
+            values = self.collected[validator]
+        except KeyError:
+            values = self.collected[validator] = set()
+
+        try:
+            values.add(v)
+        except TypeError:
+            raise unhashable(v)
+
+    def check(self, validator, v):
+        """ Check a value with the loaded values
+
+        :param validator: The batched validator
+        :param v: The value
+        :rtype: bool
+        """
+        # Values that were not collected on the 1st pass are loaded individually
+        try:
+            collected = v in self.collected.get(validator, ())
+        except TypeError:
+            raise unhashable(v)
+        if not collected:
+            return v in validator.load({v})
+        return v in self.loaded[validator]
+
+
+def unhashable(v):
+    """ Make the error for a value that can't be batched: batches are sets
+
+    :rtype: Invalid
+    """
+    return Invalid(_(u'Unhashable value'), _(u'hashable value'), get_type_name(type(v)))
+
+
+def copy_containers(value):
+    """ Copy the containers that validation modifies in-place: mappings, and the lists and tuples they're nested in.
+
+    Other values are not copied: they are shared with the original.
+    That's much cheaper than a deep copy, and works with values that can't be copied, like locks or sockets.
+    Objects are shared as well: [`Object()`](#object) takes copies of its own, see `BatchScope.original()`.
+
+    :param value: The value to copy
+    :return: The copy
+    """
+    if isinstance(value, dict):
+        d = copy(value)
+        for k, v in value.items():
+            d[k] = copy_containers(v)
+        return d
+    if type(value) in (list, tuple):
+        return type(value)(copy_containers(v) for v in value)
+    return value
+
+
+def copy_object(obj):
+    """ Copy an object that validation modifies in-place: a shallow copy, with the containers in its `__dict__` copied.
+
+    Objects that can't be copied are shared with the original.
+
+    :param obj: The object to copy
+    :return: The copy
+    """
+    try:
+        obj = copy(obj)
+    except (TypeError, Error):
+        return obj
+    d = getattr(obj, '__dict__', None)
+    if isinstance(d, dict):
+        for k, v in list(d.items()):
+            d[k] = copy_containers(v)
+    return obj
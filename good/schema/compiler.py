@@ -1,8 +1,12 @@
 import six
+from copy import copy
+from six.moves import intern
 
 from . import markers, signals
+from .refs import Ref
 from .errors import SchemaError, Invalid, MultipleInvalid
-from .util import get_type_name, get_literal_name, get_callable_name,  const, primitive_type
+from .util import get_type_name, get_literal_name, get_provided_name, get_callable_name,  const, primitive_type, \
+    cached_property
 
 
 def Identity(v):
@@ -12,7 +16,7 @@ def Identity(v):
     Is primarily used for the `Extra` marker, as well as all other markers specified as classes.
     """
     return v
-Identity.name = _(u'*')  # Set a name on it (for repr())
+Identity.name = u'*'  # Set a name on it (for repr()). A wildcard: not translated
 
 
 class CompiledSchema(object):
@@ -29,9 +33,16 @@ class CompiledSchema(object):
             This is used with mapping validation: a "matcher" is a lightweight alternative to CompiledSchema which economizes exceptions in favor of just returning booleans.
 
             Note that some values cannot be matchers: e.g. callables, which can typecast dictionary keys.
+    :param lean: Memory-lean output: mappings are rebuilt with shared key objects
     """
 
-    def __init__(self, schema, path, default_keys=None, extra_keys=None, matcher=False):
+    #: The `Schema` class: set by `good.schema`, which is loaded after the compiler
+    schema_cls = None
+
+    #: Compiled types that have sub-schemas: see _collect()
+    _collected_types = frozenset((const.COMPILED_TYPE.MAPPING, const.COMPILED_TYPE.ITERABLE, const.COMPILED_TYPE.MARKER))
+
+    def __init__(self, schema, path, default_keys=None, extra_keys=None, matcher=False, lean=False):
         assert default_keys is None or issubclass(default_keys, markers.Marker), '`default_keys` value must be a Marker or None'
 
         self.path = path
@@ -39,6 +50,7 @@ class CompiledSchema(object):
         self.default_keys = default_keys or markers.Required
         self.extra_keys = extra_keys or markers.Reject
         self.matcher = matcher
+        self.lean = lean
 
         # Compile
         self.name = None
@@ -48,6 +60,8 @@ class CompiledSchema(object):
         assert self.compiled_type is not None, 'Compiler did not set a schema `compiled_type`'
         assert isinstance(self.name, six.text_type), 'Compiler did not set a valid schema name: {!r} (must be unicode)'.format(self.name)
 
+        self._collect()
+
     def __call__(self, value):
         """ Validate value against the compiled schema
 
@@ -81,7 +95,7 @@ class CompiledSchema(object):
     if six.PY3:
         __str__ = __unicode__
 
-    @property
+    @cached_property
     def supports_undefined(self):
         """ Test whether this schema supports Undefined.
 
@@ -104,14 +118,175 @@ class CompiledSchema(object):
         """
         # Test
         try:
-            yes = self(const.UNDEFINED) is not const.UNDEFINED
+            v = self(const.UNDEFINED)
+            yes = v is not const.UNDEFINED
         except (Invalid, SchemaError):
             yes = False
-
-        # Remember (lame @cached_property)
-        self.__dict__['supports_undefined'] = yes
+        else:
+            # Coroutine validators can't provide defaults
+            if hasattr(v, '__await__'):
+                getattr(v, 'close', lambda: None)()
+                yes = False
         return yes
 
+    @property
+    def sub_schemas(self):
+        """ Get the compiled sub-schemas this schema is using.
+
+        This includes mapping keys & values, iterable members, marker keys,
+        and schemas used by validators (e.g. the schemas of `Any()`).
+
+        :rtype: list[CompiledSchema]
+        """
+        # Another schema
+        if isinstance(self.schema, CompiledSchema):
+            return [self.schema]
+
+        if self.compiled_type == const.COMPILED_TYPE.MAPPING:
+            return [s for key_schema, value_schema, is_literal, is_identity in self.mapping_schemas
+                    for s in (key_schema, value_schema)]
+        elif self.compiled_type == const.COMPILED_TYPE.ITERABLE:
+            return list(self.iterable_schemas)
+        elif self.compiled_type == const.COMPILED_TYPE.MARKER:
+            return [self.compiled.key_schema]
+        elif self.compiled_type == const.COMPILED_TYPE.REF:
+            return [self.target] if self.target is not None else []
+        elif self.compiled_type == const.COMPILED_TYPE.CALLABLE:
+            # Validators keep their schemas in `compiled` or `schema`: a Schema, a CompiledSchema, or a tuple of them.
+            # `Schema` itself is a callable with `compiled`, which makes it fit as well.
+            subs = []
+            for attr in ('compiled', 'schema'):
+                value = getattr(self.schema, attr, None)
+                for v in (value if isinstance(value, (tuple, list)) else (value,)):
+                    if isinstance(v, CompiledSchema):
+                        subs.append(v)
+                    elif isinstance(getattr(v, 'compiled', None), CompiledSchema):
+                        subs.append(v.compiled)
+            return subs
+        else:
+            return []
+
+    #: Is it another `Schema`, used within this one?
+    #: Its sub-schemas belong to that `Schema`, which may be used elsewhere as well: they are not to be modified.
+    is_nested_schema = False
+
+    #: References within this schema, to bind: not within nested `Schema`s. See resolve_refs()
+    ref_nodes = ()
+
+    #: Does the schema contain batched validators? See [`BatchCheck`](#batchcheck)
+    batched = False
+
+    def _collect(self):
+        """ Collect what the schema needs to know about its sub-schemas: once, when it's compiled.
+
+        Sub-schemas are compiled first, hence every one of them has collected its own already.
+        Only the values that differ from the class defaults are stored.
+        """
+        compiled_type = self.compiled_type
+        if compiled_type == const.COMPILED_TYPE.REF:
+            self.ref_nodes = (self,)
+            return
+        elif compiled_type == const.COMPILED_TYPE.CALLABLE:
+            if isinstance(self.schema, self.schema_cls):
+                self.is_nested_schema = True
+            if getattr(self.schema, 'batched', False) is True:
+                self.batched = True
+        elif compiled_type not in self._collected_types and not isinstance(self.schema, CompiledSchema):
+            return  # no sub-schemas
+
+        ref_nodes = ()
+        for sub in self.sub_schemas:
+            if sub.ref_nodes and not self.is_nested_schema:
+                ref_nodes += sub.ref_nodes
+            if sub.batched:
+                self.batched = True
+        if ref_nodes:
+            self.ref_nodes = ref_nodes
+
+    def walk(self, own=False):
+        """ Iterate over this schema and all of its sub-schemas, recursively.
+
+        Every compiled schema is yielded once, even if it's used in multiple places.
+
+        :param own: Only the sub-schemas this schema owns: don't enter other `Schema`s used within it
+        :type own: bool
+        :rtype: collections.Iterable[CompiledSchema]
+        """
+        seen = set()
+        stack = [self]
+        while stack:
+            node = stack.pop()
+            if id(node) in seen:
+                continue
+            seen.add(id(node))
+            yield node
+            if not (own and node.is_nested_schema):
+                stack.extend(reversed(node.sub_schemas))
+
+    def resolve_refs(self, refs=None, roots=None):
+        """ Bind the references within this schema to their targets.
+
+        `Ref()` is bound to this schema, and `Ref(name)` -- to `refs[name]`.
+        References to unknown names are left as they are: an outer schema may know them.
+
+        Other `Schema`s used within this one have resolved their references already: they are left as they are.
+
+        :param refs: Named schemas: { name: CompiledSchema }
+        :type refs: dict|None
+        :param roots: Sub-schemas to look for references in. Defaults to this schema and the named schemas.
+        :type roots: list[CompiledSchema]|None
+        """
+        refs = refs or {}
+
+        nodes = [node
+                 for root in ([self] + list(refs.values()) if roots is None else roots)
+                 for node in root.ref_nodes]
+
+        for node in nodes:
+            name = node.schema.ref
+            if name is None:
+                node.target = self
+            elif name in refs:
+                node.target = refs[name]
+
+        # Call the targets directly (skipping references to references)
+        for node in nodes:
+            target, seen = node.target, set()
+            while target is not None and target.compiled_type == const.COMPILED_TYPE.REF and id(target) not in seen:
+                seen.add(id(target))
+                target = target.target
+            if target is not None and target.compiled_type != const.COMPILED_TYPE.REF:
+                node.compiled = target.compiled
+
+    def derive(self, schemas):
+        """ Derive a mapping or an iterable schema with other sub-schemas.
+
+        The given sub-schemas are used as they are: nothing is compiled again,
+        only the validator of the new schema is built.
+
+        :param schemas: Compiled sub-schemas.
+            For mappings: { key-schema: value-schema }, with markers notified already.
+            For iterables: a tuple of member schemas.
+        :type schemas: dict[CompiledSchema, CompiledSchema]|tuple[CompiledSchema]
+        :rtype: CompiledSchema
+        """
+        node = copy(self)
+        node.__dict__.pop('supports_undefined', None)
+        node.__dict__.pop('rebuild_lean', None)
+
+        if self.compiled_type == const.COMPILED_TYPE.MAPPING:
+            node.schema = {key_schema.schema: value_schema.schema for key_schema, value_schema in schemas.items()}
+            node.compiled = node._compile_mapping_schemas(schemas)
+        elif self.compiled_type == const.COMPILED_TYPE.ITERABLE:
+            node.schema = type(self.schema)(member.schema for member in schemas)
+            node.compiled = node._compile_iterable_schemas(type(self.schema), tuple(schemas))
+        else:
+            raise SchemaError(_(u'Only mappings and iterables can be derived: {name}').format(name=self.name))
+        for attr in ('ref_nodes', 'batched'):
+            node.__dict__.pop(attr, None)
+        node._collect()
+        return node
+
     #region Compilation Utils
 
     @classmethod
@@ -133,6 +308,9 @@ class CompiledSchema(object):
         # CompiledSchema
         elif isinstance(schema, CompiledSchema):
             return const.COMPILED_TYPE.SCHEMA
+        # Reference
+        elif isinstance(schema, Ref):
+            return const.COMPILED_TYPE.REF
         else:
             return primitive_type(schema)
 
@@ -186,7 +364,8 @@ class CompiledSchema(object):
             self.path + (path or []),
             None,
             None,
-            matcher
+            matcher,
+            self.lean
         )
 
     def Invalid(self, message, expected):
@@ -245,6 +424,7 @@ class CompiledSchema(object):
             const.COMPILED_TYPE.ITERABLE: self._compile_iterable,
             const.COMPILED_TYPE.MAPPING: self._compile_mapping,
             const.COMPILED_TYPE.MARKER: self._compile_marker,
+            const.COMPILED_TYPE.REF: self._compile_ref,
         }
 
         return compilers[schema_type]
@@ -365,7 +545,7 @@ class CompiledSchema(object):
         # Error utils
         enrich_exception = lambda e, value: e.enrich(
             expected=self.name,
-            provided=get_literal_name(value),
+            provided=get_provided_name(e, value),
             path=self.path,
             validator=schema)
 
@@ -399,9 +579,16 @@ class CompiledSchema(object):
     def _compile_iterable(self, schema):
         """ Compile iterable: iterable of schemas treated as allowed values """
         # Compile each member as a schema
-        schema_type = type(schema)
-        schema_subs = tuple(map(self.sub_compile, schema))
+        return self._compile_iterable_schemas(type(schema), tuple(map(self.sub_compile, schema)))
 
+    def _compile_iterable_schemas(self, schema_type, schema_subs):
+        """ Compile iterable from the compiled members
+
+        :param schema_type: Iterable type
+        :type schema_type: type
+        :param schema_subs: Compiled members
+        :type schema_subs: tuple[CompiledSchema]
+        """
         # When the schema is an iterable with a single item (e.g. [dict(...)]),
         # Invalid errors from schema members should be immediately used.
         # This allows to report sane errors with `Schema([{'age': int}])`
@@ -409,6 +596,7 @@ class CompiledSchema(object):
 
         # Prepare self
         self.compiled_type = const.COMPILED_TYPE.ITERABLE
+        self.iterable_schemas = schema_subs
         self.name = _(u'{iterable_cls}[{iterable_options}]').format(
             iterable_cls=get_type_name(schema_type),
             iterable_options=_(u'|').join(x.name for x in schema_subs)
@@ -480,6 +668,21 @@ class CompiledSchema(object):
         self.name = schema.name
         return schema
 
+    def _compile_ref(self, schema):
+        """ Compile reference: a placeholder, bound to the target schema by resolve_refs() """
+        if self.matcher:
+            raise SchemaError(_(u'References cannot be used as mapping keys'))
+
+        # Prepare self
+        self.compiled_type = const.COMPILED_TYPE.REF
+        self.name = schema.name
+        self.target = None
+
+        # Validator: until resolved
+        def validate_unresolved_ref(v):
+            raise SchemaError(_(u'Unresolved reference: {name}').format(name=self.name))
+        return validate_unresolved_ref
+
     def _compile_mapping(self, schema):
         """ Compile mapping: key-value matching """
         assert not self.matcher, 'Mappings cannot be matchers'
@@ -508,6 +711,17 @@ class CompiledSchema(object):
             if key_schema.compiled_type == const.COMPILED_TYPE.MARKER:
                 key_schema.compiled.on_compiled(value_schema=value_schema, as_mapping_key=True)
 
+        return self._compile_mapping_schemas(compiled)
+
+    def _compile_mapping_schemas(self, compiled):
+        """ Compile mapping from the compiled keys & values
+
+        :param compiled: { key-schema: value-schema }. Markers must have been notified already.
+        :type compiled: dict[CompiledSchema, CompiledSchema]
+        """
+        # The definition is always rebuilt as a `dict`: see _compile_mapping()
+        schema_type = dict
+
         # Sort key schemas for matching.
 
         # Since various schema types have different priority, we need to sort these accordingly.
@@ -518,7 +732,9 @@ class CompiledSchema(object):
         # In addition, since mapping keys are mostly literals, we want direct matching instead of the costly function calls.
         # Hence, remember which of them are literals or 'catch-all' markers.
         is_literal  = lambda key_schema: key_schema.compiled.key_schema.compiled_type == const.COMPILED_TYPE.LITERAL
-        is_identity = lambda identity: key_schema.compiled.key_schema is Identity
+        # Note that `is_identity` is never true: the marker's `key_schema` is the compiled `Identity`, not `Identity` itself.
+        # Catch-all markers go through the matcher loop, which gives the same matches.
+        is_identity = lambda key_schema: key_schema.compiled.key_schema is Identity
 
         compiled = [ (key_schema, compiled[key_schema], is_literal(key_schema), is_identity(key_schema))
                      for key_schema in self.sort_schemas(compiled.keys())]
@@ -528,13 +744,13 @@ class CompiledSchema(object):
 
         # Prepare self
         self.compiled_type = const.COMPILED_TYPE.MAPPING
+        self.mapping_schemas = compiled
         self.name = _(u'{mapping_cls}[{mapping_keys}]').format(
-            mapping_cls=get_type_name(type(schema)),
+            mapping_cls=get_type_name(schema_type),
             mapping_keys=_(u',').join(key_schema.name for key_schema, value_schema, is_literal, is_identity in compiled)
         )
 
         # Error partials
-        schema_type = type(schema)
         err_type = self.Invalid(_(u'Wrong value type'), get_type_name(schema_type))
 
         # Validator
@@ -639,7 +855,7 @@ class CompiledSchema(object):
                         # enrich() adds more info on the collected errors.
                         errors.append(e.enrich(
                             expected=value_schema.name,
-                            provided=get_literal_name(v),
+                            provided=get_provided_name(e, v),
                             path=self.path + [k],
                             validator=value_schema
                         ))
@@ -655,6 +871,30 @@ class CompiledSchema(object):
             # Finish
             return d
 
+        # Lean output
+        if self.lean:
+            # Literal keys, in a consistent order
+            literal_keys = [key_schema.schema.key for key_schema, value_schema, is_literal, is_identity in compiled
+                            if is_literal]
+
+            def rebuild_lean(d):
+                # Rebuild the mapping: literal keys use the schema's own key objects, other string keys are interned.
+                # A fresh dict is also more compact than one that has been modified.
+                lean = {}
+                for k in literal_keys:
+                    if k in d:
+                        lean[k] = d[k]
+                if len(lean) != len(d):
+                    for k, v in d.items():
+                        if k not in lean:
+                            lean[intern(k) if type(k) is str else k] = v
+                return lean
+            self.rebuild_lean = rebuild_lean
+
+            def validate_lean_mapping(d):
+                return rebuild_lean(validate_mapping(d))
+            return validate_lean_mapping
+
         return validate_mapping
 
     #endregion
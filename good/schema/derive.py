@@ -0,0 +1,237 @@
+""" Derived schemas: built from the compiled parts of other schemas """
+
+import six
+from copy import copy
+
+from . import markers
+from .compiler import Identity
+from .errors import SchemaError
+from .util import get_literal_name, const
+from .incremental import build_tree, WHOLE
+from . import Schema
+
+
+def unwrap(node):
+    """ Get the schema that a compiled schema wraps: another schema, a reference, or a nested `Schema`
+
+    :type node: CompiledSchema
+    :rtype: CompiledSchema
+    """
+    while True:
+        if node.compiled_type == const.COMPILED_TYPE.SCHEMA:
+            node = node.schema
+        elif node.compiled_type == const.COMPILED_TYPE.REF and node.target is not None:
+            node = node.target
+        elif node.compiled_type == const.COMPILED_TYPE.CALLABLE and isinstance(node.schema, Schema):
+            node = node.schema.compiled
+        else:
+            return node
+
+
+def compile_entry(node, key, value, fresh=None):
+    """ Compile a mapping entry the way CompiledSchema._compile_mapping() does
+
+    :type node: CompiledSchema
+    :param key: Key schema
+    :param value: Value schema
+    :param fresh: A list to add the compiled value schema to
+    :type fresh: list|None
+    :return: (key-schema, value-schema)
+    :rtype: (CompiledSchema, CompiledSchema)
+    """
+    if isinstance(key, markers.Marker):
+        # A marker keeps the schemas it's compiled with: use a fresh copy
+        key = copy(key)
+        key.name = key.key_schema = key.value_schema = None
+        key.as_mapping_key = False
+    elif node.get_schema_type(key) != const.COMPILED_TYPE.MARKER:
+        key = node.default_keys(key)
+
+    key_schema = node.sub_compile(key, matcher=True)
+    value_schema = node.sub_compile(value)
+    if key_schema.compiled_type == const.COMPILED_TYPE.MARKER:
+        key_schema.compiled.on_compiled(value_schema=value_schema, as_mapping_key=True)
+    if fresh is not None:
+        fresh.append(value_schema)
+    return key_schema, value_schema
+
+
+def find_entries(node, key):
+    """ Find the entries of a mapping schema that have the given key
+
+    Markers compare equal to their keys, and to their classes: `Required('a') == 'a'`, `Extra() == Extra`.
+
+    :type node: CompiledSchema
+    :param key: Key definition
+    :return: [(key-schema, value-schema), ...]
+    :rtype: list
+    """
+    return [(key_schema, value_schema) for key_schema, value_schema, is_literal, is_identity in node.mapping_schemas
+            if key_schema.compiled == key]
+
+
+def mapping_node(node):
+    """ Get the mapping a compiled schema wraps
+
+    :type node: CompiledSchema
+    :rtype: CompiledSchema
+    :raises SchemaError: Not a mapping
+    """
+    node = unwrap(node)
+    if node.compiled_type != const.COMPILED_TYPE.MAPPING:
+        raise SchemaError(_(u'Not a mapping: {name}').format(name=node.name))
+    return node
+
+
+def project(node, fields, required=False, entire=False, drop=False):
+    """ Derive a schema that only validates the given fields
+
+    :type node: CompiledSchema
+    :param fields: Keys, or paths: `['id', ('author', 'name')]`
+    :param required: Keep the `Required` checks of the other keys
+    :param entire: Keep the `Entire` markers
+    :param drop: Drop the other keys, instead of passing them through
+    :rtype: CompiledSchema
+    :raises SchemaError: A field is not in the schema
+    """
+    tree = build_tree(field if isinstance(field, (list, tuple)) else [field] for field in fields)
+    return _project(node, tree, required, entire, drop)
+
+
+def _project(node, tree, required, entire, drop):
+    """ Project a compiled schema on a tree of fields """
+    if tree is WHOLE:
+        return node
+
+    node = unwrap(node)
+    if node.compiled_type == const.COMPILED_TYPE.ITERABLE:
+        # Project the members of an iterable: the fields are in every item
+        return node.derive(tuple(
+            _project(member, tree, required, entire, drop) if unwrap(member).compiled_type in (
+                const.COMPILED_TYPE.MAPPING, const.COMPILED_TYPE.ITERABLE) else member
+            for member in node.iterable_schemas
+        ))
+    node = mapping_node(node)
+
+    schemas = {}
+    passthrough = None
+    for key_schema, value_schema, is_literal, is_identity in node.mapping_schemas:
+        marker = key_schema.compiled
+        if is_literal and marker.key in tree:
+            # Selected field
+            schemas[key_schema] = _project(value_schema, tree[marker.key], required, entire, drop)
+        elif isinstance(marker, markers.Entire):
+            if entire:
+                schemas[key_schema] = value_schema
+        elif isinstance(marker, markers.Remove):
+            # Removal does not validate anything
+            schemas[key_schema] = value_schema
+        elif isinstance(marker, markers.Required) and required:
+            # The key is still required, but its value is not validated
+            if passthrough is None:
+                passthrough = node.sub_compile(Identity)
+            schemas[key_schema] = passthrough
+
+    # Unknown fields
+    literal_keys = set(key_schema.compiled.key for key_schema, value_schema, is_literal, is_identity in node.mapping_schemas
+                       if is_literal)
+    for key in tree:
+        if key not in literal_keys:
+            raise SchemaError(_(u'Field is not in the schema: {key}').format(key=six.text_type(key)))
+
+    # The other keys: passed through, or dropped
+    key_schema, value_schema = compile_entry(node, markers.Extra, markers.Remove if drop else markers.Allow)
+    schemas[key_schema] = value_schema
+
+    return node.derive(schemas)
+
+
+
+def extend(node, schema, fresh):
+    """ Derive a mapping schema with more keys
+
+    :type node: CompiledSchema
+    :param schema: Mapping schema: { key: value }. Replaces the existing keys.
+    :type schema: dict
+    :param fresh: A list to add the compiled value schemas to
+    :type fresh: list
+    :rtype: CompiledSchema
+    """
+    node = mapping_node(node)
+    schemas = {key_schema: value_schema for key_schema, value_schema, is_literal, is_identity in node.mapping_schemas
+               if not any(key_schema.compiled == key for key in schema)}
+    for key, value in schema.items():
+        key_schema, value_schema = compile_entry(node, key, value, fresh)
+        schemas[key_schema] = value_schema
+    return node.derive(schemas)
+
+
+def without(node, keys, fresh):
+    """ Derive a mapping schema without some keys
+
+    :type node: CompiledSchema
+    :param keys: Keys to remove
+    :param fresh: A list to add the compiled value schemas to
+    :type fresh: list
+    :rtype: CompiledSchema
+    :raises SchemaError: A key is not in the schema
+    """
+    node = mapping_node(node)
+    schemas = {key_schema: value_schema for key_schema, value_schema, is_literal, is_identity in node.mapping_schemas}
+    for key in keys:
+        entries = find_entries(node, key)
+        if not entries:
+            raise SchemaError(_(u'Key is not in the schema: {key}').format(key=get_literal_name(key)))
+        for key_schema, value_schema in entries:
+            schemas.pop(key_schema, None)
+
+    # Every mapping has an `Extra`
+    if not any(isinstance(key_schema.compiled, markers.Extra) for key_schema in schemas):
+        key_schema, value_schema = compile_entry(node, markers.Extra, node.extra_keys, fresh)
+        schemas[key_schema] = value_schema
+    return node.derive(schemas)
+
+
+def replace(node, path, sub, fresh):
+    """ Derive a schema with another sub-schema at the path
+
+    :type node: CompiledSchema
+    :param path: Path to the sub-schema: mapping keys, and indexes of iterable members
+    :type path: list
+    :param sub: The new sub-schema
+    :param fresh: A list to add the compiled sub-schema to
+    :type fresh: list
+    :rtype: CompiledSchema
+    :raises SchemaError: Wrong path
+    """
+    if not path:
+        raise SchemaError(_(u'The path is empty'))
+    node = unwrap(node)
+    key, path = path[0], path[1:]
+
+    if node.compiled_type == const.COMPILED_TYPE.MAPPING:
+        entries = find_entries(node, key)
+        if len(entries) != 1:
+            raise SchemaError(_(u'Key is not in the schema: {key}').format(key=get_literal_name(key)))
+        (key_schema, value_schema), = entries
+
+        schemas = {k: v for k, v, is_literal, is_identity in node.mapping_schemas if k is not key_schema}
+        if path:
+            value_schema = replace(value_schema, path, sub, fresh)
+            key_schema, value_schema = compile_entry(node, key_schema.schema, value_schema)
+        else:
+            key_schema, value_schema = compile_entry(node, key_schema.schema, sub, fresh)
+        schemas[key_schema] = value_schema
+        return node.derive(schemas)
+    elif node.compiled_type == const.COMPILED_TYPE.ITERABLE:
+        members = list(node.iterable_schemas)
+        if not isinstance(key, six.integer_types) or not 0 <= key < len(members):
+            raise SchemaError(_(u'No such iterable member: {key}').format(key=get_literal_name(key)))
+        if path:
+            members[key] = replace(members[key], path, sub, fresh)
+        else:
+            members[key] = node.sub_compile(sub)
+            fresh.append(members[key])
+        return node.derive(tuple(members))
+    else:
+        raise SchemaError(_(u'Not a mapping or an iterable: {name}').format(name=node.name))
@@ -0,0 +1,264 @@
+""" Execution plan of a compiled schema, and the patterns that are slow """
+
+import collections
+
+from .compiler import CompiledSchema, Identity
+from .util import const
+from ..helpers import Object, ObjectPlan
+from ..validators import Any, In
+
+
+#: A step of the plan: a compiled sub-schema
+#: `key` is the mapping key it's the value of, and `match` is how the key is matched: 'literal', 'identity', 'scan'
+PlanNode = collections.namedtuple('PlanNode', ('path', 'depth', 'key', 'match', 'name', 'kind', 'cost', 'notes'))
+
+#: A slow pattern found in the schema
+PlanWarning = collections.namedtuple('PlanWarning', ('path', 'code', 'message'))
+
+
+class Explanation(object):
+    """ The execution plan of a compiled schema: see [`Schema.explain()`](#explaining)
+
+    :param nodes: Plan steps, depth-first
+    :type nodes: list[PlanNode]
+    :param warnings: Slow patterns
+    :type warnings: list[PlanWarning]
+    """
+
+    #: Relative costs: a type check is 1
+    COST_CALL = 1
+    #: Raising and catching `Invalid`
+    COST_RAISE = 10
+
+    #: Warn when a mapping has more non-literal keys
+    MAX_SCAN_KEYS = 2
+    #: Warn when `Any()` has more branches that fail with exceptions
+    MAX_ANY_BRANCHES = 3
+    #: Warn when `Any()` is nested deeper
+    MAX_ANY_DEPTH = 1
+
+    def __init__(self, nodes, warnings):
+        #: Plan steps: [PlanNode]
+        self.nodes = nodes
+        #: Slow patterns: [PlanWarning]
+        self.warnings = warnings
+
+    def __repr__(self):
+        return '{cls}(nodes={0}, warnings={1})'.format(len(self.nodes), len(self.warnings), cls=type(self).__name__)
+
+    @property
+    def cost(self):
+        """ The estimated cost of the schema: relative to a type check
+
+        :rtype: int
+        """
+        return self.nodes[0].cost if self.nodes else 0
+
+    def report(self):
+        """ Format a text report: the plan as a tree, then the warnings
+
+        :rtype: unicode
+        """
+        lines = []
+        for n in self.nodes:
+            key = u'{} [{}] -> '.format(n.key, n.match) if n.key is not None else u''
+            notes = u''.join(u'; ' + note for note in n.notes)
+            lines.append(u'{indent}{key}{n.name}  ({n.kind}, cost {n.cost}{notes})'.format(
+                indent=u'  ' * n.depth, key=key, n=n, notes=notes))
+        if self.warnings:
+            lines.append(u'')
+            lines.append(u'Warnings:')
+            lines.extend(u'  {w.path}: [{w.code}] {w.message}'.format(w=w) for w in self.warnings)
+        return u'\n'.join(lines)
+
+
+def explain(schema):
+    """ Make the execution plan of a compiled schema
+
+    :type schema: Schema
+    :rtype: Explanation
+    """
+    planner = _Planner()
+    planner.plan(schema.compiled, '/', 0)
+    for name, ref in sorted(schema.refs.items()):
+        planner.plan(ref, '/', 0, key=u'Ref({})'.format(name), match=u'ref')
+    return Explanation(planner.nodes, planner.warnings)
+
+
+class _Planner(object):
+    """ Walks the compiled schema, estimates the costs, and collects the warnings """
+
+    def __init__(self):
+        self.nodes = []
+        self.warnings = []
+        #: Estimated costs: { id(node): cost }; `None` while it's being planned (recursion)
+        self.costs = {}
+
+    def warn(self, path, code, message):
+        self.warnings.append(PlanWarning(path, code, message))
+
+    def plan(self, node, path, depth, key=None, match=None, any_depth=0):
+        """ Plan a compiled sub-schema, and its sub-schemas
+
+        :param any_depth: The number of `Any()` this node is nested in
+        :return: Estimated cost
+        :rtype: int
+        """
+        # Seen already: a reference, or a shared sub-schema
+        if id(node) in self.costs:
+            cost = self.costs[id(node)]
+            self._add(path, depth, key, match, node, [u'recursive' if cost is None else u'planned above'], cost or 0)
+            return cost or 0
+        self.costs[id(node)] = None
+
+        # Wrappers: plan the target
+        if node.compiled_type == const.COMPILED_TYPE.SCHEMA or isinstance(node.schema, CompiledSchema):
+            cost = self.plan(node.schema, path, depth, key, match, any_depth)
+            self.costs[id(node)] = cost
+            return cost
+        if node.compiled_type == const.COMPILED_TYPE.REF:
+            if node.target is None:
+                self._add(path, depth, key, match, node, [u'unresolved'], 0)
+                return 0
+            cost = self.plan(node.target, path, depth, key, match, any_depth)
+            self.costs[id(node)] = cost
+            return cost
+
+        # The step goes before its sub-schemas: its cost is known later
+        index = len(self.nodes)
+        self._add(path, depth, key, match, node, [], 0)
+        planner = {
+            const.COMPILED_TYPE.MAPPING: self._plan_mapping,
+            const.COMPILED_TYPE.ITERABLE: self._plan_iterable,
+            const.COMPILED_TYPE.CALLABLE: self._plan_callable,
+        }.get(node.compiled_type)
+        notes = []
+        cost = planner(node, path, depth, notes, any_depth) if planner else self._simple_cost(node)
+
+        self.nodes[index] = self.nodes[index]._replace(cost=cost, notes=notes)
+        self.costs[id(node)] = cost
+        return cost
+
+    def _add(self, path, depth, key, match, node, notes, cost):
+        self.nodes.append(PlanNode(path, depth, key, match, node.name, node.compiled_type, cost, notes))
+
+    def _simple_cost(self, node):
+        """ Literals, types, enums """
+        return Explanation.COST_CALL * (2 if node.compiled_type == const.COMPILED_TYPE.ENUM else 1)
+
+    def _plan_mapping(self, node, path, depth, notes, any_depth):
+        """ Keys in the order they're matched: literals by a lookup, the others by a loop over the input keys """
+        cost = Explanation.COST_CALL * 3
+        counts = collections.Counter()
+        scan_keys = []
+        for key_schema, value_schema, is_literal, is_identity in node.mapping_schemas:
+            marker = key_schema.compiled
+            catch_all = marker.key is Identity
+            match = u'literal' if is_literal else u'identity' if is_identity else u'scan'
+            counts[match] += 1
+
+            # Key cost: a loop over the remaining input keys, a matcher call for every key (assume one)
+            key_cost = Explanation.COST_CALL
+            if match == u'scan':
+                matcher = marker.key_schema
+                key_cost += self._matcher_cost(matcher)
+                if not catch_all:
+                    scan_keys.append(key_schema.name)
+                if matcher.compiled_type == const.COMPILED_TYPE.CALLABLE and not catch_all:
+                    self.warn(path, u'callable-key',
+                              u'Key {} is a callable: it raises and catches an error for every key it does not match'
+                              .format(key_schema.name))
+
+            sub_path = path.rstrip('/') + '/' + key_schema.name
+            key = u'{}({})'.format(type(marker).__name__, key_schema.name)
+            cost += key_cost + self.plan(value_schema, sub_path, depth + 1, key, match, any_depth)
+
+        notes.append(u'{} keys: {}'.format(
+            len(node.mapping_schemas),
+            u', '.join(u'{} {}'.format(counts[m], m) for m in (u'literal', u'identity', u'scan'))))
+        if scan_keys:
+            notes.append(u'O(n) matcher loop for {}'.format(u', '.join(scan_keys)))
+        if len(scan_keys) > Explanation.MAX_SCAN_KEYS:
+            self.warn(path, u'scan-keys',
+                      u'{} non-literal keys: every input key is matched against each of them in turn'
+                      .format(len(scan_keys)))
+        return cost
+
+    def _matcher_cost(self, matcher):
+        """ The cost of a key matcher: callables raise when the key does not match """
+        if matcher.compiled_type == const.COMPILED_TYPE.CALLABLE:
+            return Explanation.COST_CALL * 2 + Explanation.COST_RAISE
+        return Explanation.COST_CALL
+
+    def _plan_iterable(self, node, path, depth, notes, any_depth):
+        """ Every item is tried against the members in order: all but the last failure raise """
+        members = node.iterable_schemas
+        costs = [self.plan(member, path.rstrip('/') + ('/[]' if len(members) == 1 else '/[{}]'.format(i)),
+                           depth + 1, None, None, any_depth)
+                 for i, member in enumerate(members)]
+        item_cost = sum(costs) + Explanation.COST_RAISE * (len(members) - 1)
+        notes.append(u'per item: {}'.format(item_cost))
+        if len(members) > 1:
+            notes.append(u'{} members: an item that matches a later member raises for every earlier one'
+                         .format(len(members)))
+        return Explanation.COST_CALL * 2 + item_cost
+
+    def _plan_callable(self, node, path, depth, notes, any_depth):
+        """ Validators: `Any()` branches, `In()` containers, `Object()` plans; opaque functions """
+        validator = node.schema
+        cost = Explanation.COST_CALL * 2
+
+        # Any(): every failed branch raises
+        if isinstance(validator, Any):
+            any_depth += 1
+            branches = [self.plan(sub, path, depth + 1, None, None, any_depth) for sub in node.sub_schemas]
+            if validator.match_any is not None:
+                notes.append(u'{} patterns combined into a single regexp'.format(len(branches)))
+                return cost + Explanation.COST_CALL * 2
+            notes.append(u'{} branches, worst case: {} errors'.format(len(branches), len(branches)))
+            if len(branches) > Explanation.MAX_ANY_BRANCHES:
+                self.warn(path, u'any-branches',
+                          u'{}: {} branches, a value that matches a late one raises for every earlier one'
+                          .format(node.name, len(branches)))
+            if any_depth > Explanation.MAX_ANY_DEPTH:
+                self.warn(path, u'deep-any',
+                          u'{}: nested in {} more Any(): every failure is raised and caught at each level'
+                          .format(node.name, any_depth - 1))
+            return cost + sum(branches) + Explanation.COST_RAISE * len(branches)
+
+        # In(): hash lookup, unless the values are unhashable
+        if isinstance(validator, In):
+            if isinstance(validator.container, (list, tuple)):
+                notes.append(u'linear search: {} values'.format(len(validator.container)))
+                self.warn(path, u'in-list',
+                          u'{}: the values are not hashable, every lookup scans the list'.format(node.name))
+                return cost + Explanation.COST_CALL * len(validator.container)
+            return cost
+
+        # Object(): compiled attribute access, or the proxy
+        if isinstance(validator, Object):
+            if validator.fields is None:
+                notes.append(u'ObjectProxy')
+                self.warn(path, u'object-proxy',
+                          u'{}: the schema has non-literal keys, objects are validated through ObjectProxy'
+                          .format(node.name))
+                cost += Explanation.COST_CALL * 10
+            else:
+                for cls in (validator.cls if isinstance(validator.cls, tuple) else (validator.cls,)):
+                    if hasattr(cls, '__slots__') and ObjectPlan(cls, validator.fields).validate is None:
+                        notes.append(u'ObjectProxy for {}'.format(cls.__name__))
+                        self.warn(path, u'object-slots',
+                                  u'{}: the schema does not cover the __slots__ of {}: '
+                                  u'objects are validated through ObjectProxy'.format(node.name, cls.__name__))
+                        cost += Explanation.COST_CALL * 10
+
+        # Validators with sub-schemas: All(), Maybe(), ...
+        subs = node.sub_schemas
+        if subs:
+            cost += sum(self.plan(sub, path, depth + 1, None, None, any_depth) for sub in subs)
+        elif not hasattr(validator, 'name'):
+            notes.append(u'opaque callable')
+        return cost
+
+
+__all__ = ('Explanation',)
@@ -0,0 +1,344 @@
+""" Incremental re-validation: only the changed paths of a validated value """
+
+import six
+from copy import copy
+
+from . import markers, signals
+from .errors import Invalid, MultipleInvalid
+from .batch import copy_containers
+from .util import get_literal_name, get_provided_name, const
+from . import Schema
+
+
+#: Whole sub-tree: a leaf of the change tree
+WHOLE = True
+
+
+def parse_pointer(pointer):
+    """ Parse a JSON Pointer: `'/a/0/b'` -> `['a', '0', 'b']`
+
+    :type pointer: str
+    :rtype: list
+    """
+    if not pointer:
+        return []
+    if not pointer.startswith('/'):
+        raise Invalid(_(u'Invalid JSON Pointer'), _(u'/path'), six.text_type(pointer))
+    return [token.replace('~1', '/').replace('~0', '~') for token in pointer[1:].split('/')]
+
+
+def apply_patch(value, patch):
+    """ Apply a JSON-Patch-like diff to a copy of the value.
+
+    Operations: `add`, `remove`, `replace`.
+
+    The value itself is not modified: the containers on the way to every changed path are copied,
+    and the rest is shared with the value. Hence, the value stays the same when an operation fails,
+    and when the patched value fails validation.
+
+    :param value: The value to patch
+    :param patch: The list of operations: [{'op': 'replace', 'path': '/a/0', 'value': 1}, ...]
+    :type patch: list[dict]
+    :return: (patched value, changed paths)
+    :rtype: (*, list[list])
+    :raises Invalid: Invalid operation
+    """
+    paths = []
+    copied = set()  # ids of the containers copied by this patch: these can be modified
+
+    def writable(container):
+        if id(container) not in copied:
+            container = copy(container)
+            copied.add(id(container))
+        return container
+
+    for operation in patch:
+        op = operation.get('op')
+        tokens = parse_pointer(operation.get('path', ''))
+
+        # The whole value
+        if not tokens:
+            if op not in ('add', 'replace'):
+                raise Invalid(_(u'Invalid operation'), _(u'add|replace'), six.text_type(op), [])
+            value = operation['value']
+            paths.append([])
+            continue
+
+        # Navigate to the container, copying the containers on the way. List indexes are converted to `int`s
+        value = container = writable(value)
+        path = []
+        try:
+            for token in tokens:
+                if isinstance(container, list):
+                    token = len(container) if token == '-' else int(token)
+                if len(path) == len(tokens) - 1:
+                    break
+                child = writable(container[token])
+                container[token] = child
+                container = child
+                path.append(token)
+        except (KeyError, IndexError, ValueError, TypeError):
+            raise path_not_found(path, token)
+
+        # Modify
+        key = token
+        try:
+            if op == 'replace':
+                container[key]  # must exist
+                container[key] = operation['value']
+                paths.append(path + [key])
+            elif op == 'add':
+                if isinstance(container, list):
+                    container.insert(key, operation['value'])
+                else:
+                    container[key] = operation['value']
+                paths.append(path + [key])
+            elif op == 'remove':
+                del container[key]
+                if isinstance(container, list):
+                    # Items of a list are shifted: re-validate the list, with its own copies of the items
+                    container[:] = [copy_containers(item) for item in container]
+                    paths.append(path)
+                else:
+                    paths.append(path + [key])
+            else:
+                raise Invalid(_(u'Invalid operation'), _(u'add|remove|replace'), six.text_type(op), path + [key])
+        except (KeyError, IndexError, TypeError):
+            raise path_not_found(path, key)
+    return value, paths
+
+
+def path_not_found(path, token):
+    """ Make the error for a patch path that's not in the value
+
+    :param path: The path that was found
+    :type path: list
+    :param token: The token that was not found there
+    :rtype: Invalid
+    """
+    return Invalid(_(u'Path not found'), _(u'existing key'), get_literal_name(token), path)
+
+
+def build_tree(paths):
+    """ Build a tree of changes from a list of paths
+
+    :param paths: Changed paths
+    :type paths: collections.Iterable[collections.Sequence]
+    :return: { key: subtree | WHOLE }, or WHOLE
+    :rtype: dict|bool
+    """
+    tree = {}
+    for path in paths:
+        path = list(path)
+        if not path:
+            return WHOLE
+        node = tree
+        for key in path[:-1]:
+            sub = node.setdefault(key, {})
+            if sub is WHOLE:
+                break
+            node = sub
+        else:
+            node[path[-1]] = WHOLE
+    return tree
+
+
+def revalidate(node, value, changes):
+    """ Re-validate the changed parts of a validated value
+
+    :param node: The compiled schema
+    :type node: CompiledSchema
+    :param value: The validated value, with the changes applied
+    :param changes: Tree of changes: see build_tree()
+    :type changes: dict|bool
+    :return: Sanitized value
+    :raises Invalid: Validation errors
+    """
+    if changes is WHOLE:
+        return node(value)
+
+    # Get into nodes that wrap other nodes
+    while True:
+        if node.compiled_type == const.COMPILED_TYPE.SCHEMA:
+            node = node.schema
+        elif node.compiled_type == const.COMPILED_TYPE.REF and node.target is not None:
+            node = node.target
+        elif node.compiled_type == const.COMPILED_TYPE.CALLABLE and isinstance(node.schema, Schema):
+            node = node.schema.compiled
+        else:
+            break
+
+    if node.compiled_type == const.COMPILED_TYPE.MAPPING:
+        return revalidate_mapping(node, value, changes)
+    elif node.compiled_type == const.COMPILED_TYPE.ITERABLE:
+        return revalidate_iterable(node, value, changes)
+    else:
+        # Validators can't be split: validate the whole sub-tree
+        return node(value)
+
+
+def match_key(node, d, k):
+    """ Find the key schema that matches the key, the same way the mapping validator does.
+
+    :return: (key_schema, value_schema, sanitized-key, is_literal)
+    :rtype: tuple
+    """
+    for key_schema, value_schema, is_literal, is_identity in node.mapping_schemas:
+        if is_literal:
+            if k == key_schema.schema.key:
+                return key_schema, value_schema, k, True
+        elif not isinstance(key_schema.compiled, markers.Entire):
+            okay, sanitized_k = key_schema(k)
+            if okay:
+                return key_schema, value_schema, sanitized_k, False
+    # Unreachable: `Extra` matches everything
+    raise AssertionError('No key schema matched {!r}'.format(k))
+
+
+def revalidate_mapping(node, d, changes):
+    """ Re-validate the changed keys of a mapping, and its `Entire` markers.
+
+    Mirrors CompiledSchema._compile_mapping(), but only for the changed keys.
+    """
+    if not isinstance(d, dict):
+        return node(d)
+
+    changed = [(k, sub) + match_key(node, d, k) for k, sub in changes.items()]
+
+    # Removed keys that a non-literal schema has matched: markers like `Required(str)` need all of their matches
+    if any(k not in d and not is_literal for k, sub, key_schema, value_schema, sanitized_k, is_literal in changed):
+        return node(d)
+
+    errors = []
+    for k, sub, key_schema, value_schema, sanitized_k, is_literal in changed:
+        matches = [(k, sanitized_k, d[k])] if k in d else []
+
+        # Marker
+        if key_schema.compiled_type == const.COMPILED_TYPE.MARKER:
+            try:
+                matches = key_schema.compiled.execute(d, matches)
+            except Invalid as e:
+                errors.append(e.enrich(
+                    expected=key_schema.name,
+                    provided=None,
+                    path=node.path,
+                    validator=key_schema.compiled
+                ))
+                continue
+
+        # Values
+        for k, sanitized_k, v in matches:
+            try:
+                d[sanitized_k] = revalidate(value_schema, v, sub)
+                if k != sanitized_k:
+                    del d[k]
+            except signals.RemoveValue:
+                del d[k]
+            except Invalid as e:
+                errors.append(e.enrich(
+                    expected=value_schema.name,
+                    provided=get_provided_name(e, v),
+                    path=node.path + [k],
+                    validator=value_schema
+                ))
+
+    # Entire markers depend on all of the keys
+    for key_schema, value_schema, is_literal, is_identity in node.mapping_schemas:
+        if isinstance(key_schema.compiled, markers.Entire):
+            try:
+                key_schema.compiled.execute(d, [])
+            except Invalid as e:
+                errors.append(e.enrich(
+                    expected=key_schema.name,
+                    provided=None,
+                    path=node.path,
+                    validator=key_schema.compiled
+                ))
+
+    if errors:
+        raise MultipleInvalid.if_multiple(errors)
+    return node.rebuild_lean(d) if node.lean else d
+
+
+def revalidate_iterable(node, l, changes):
+    """ Re-validate the changed items of an iterable.
+
+    Mirrors CompiledSchema._compile_iterable(), but only for the changed items.
+    """
+    schema_type = type(node.schema)
+    if not isinstance(l, schema_type) or not isinstance(l, (list, tuple)) \
+            or not all(isinstance(i, six.integer_types) and 0 <= i < len(l) for i in changes):
+        return node(l)
+
+    members = node.iterable_schemas
+    error_passthrough = len(members) == 1
+    err_value = node.Invalid(_(u'Invalid value'), node.name)
+
+    errors = []
+    values = list(l)
+    removed = []
+    for value_index, sub in changes.items():
+        value = values[value_index]
+        for member in members:
+            try:
+                # Only a single member can be descended into: otherwise, any of them might match the new value
+                values[value_index] = revalidate(member, value, sub if error_passthrough else WHOLE)
+                break
+            except signals.RemoveValue:
+                removed.append(value_index)
+                break
+            except Invalid as e:
+                if error_passthrough:
+                    errors.append(e.enrich(path=[value_index]))
+                    break
+        else:
+            errors.append(err_value(get_literal_name(value), path=[value_index]))
+
+    if errors:
+        raise MultipleInvalid.if_multiple(errors)
+
+    for value_index in sorted(removed, reverse=True):
+        del values[value_index]
+
+    # Lists are modified in place, like mappings are
+    if isinstance(l, list):
+        l[:] = values
+        return l
+    return schema_type(values)
+
+
+def check_limits(limits, value, paths):
+    """ Check the changed values against the limits
+
+    :type limits: Limits
+    :param value: The value, with the changes applied
+    :param paths: Changed paths
+    :raises Invalid: A limit is exceeded
+    """
+    for path in paths:
+        v = value
+        try:
+            for key in path:
+                v = v[key]
+        except (KeyError, IndexError, TypeError):
+            continue  # removed
+        try:
+            limits.check(v, len(path) + 1)
+        except Invalid as e:
+            raise e.enrich(path=list(path))
+
+
+def prepare(value, changes):
+    """ Apply the changes, if that's a diff, and build the tree of changes
+
+    :param value: The validated value
+    :param changes: Changed paths, or a JSON-Patch-like diff
+    :return: (value, changed paths, tree of changes)
+    :rtype: (*, list[list], dict|bool)
+    """
+    changes = list(changes)
+    if changes and all(isinstance(change, dict) and 'op' in change for change in changes):
+        value, paths = apply_patch(value, changes)
+    else:
+        paths = changes
+    return value, paths, build_tree(paths)
@@ -0,0 +1,480 @@
+""" Iterative validation: an explicit stack instead of recursion.
+
+`CompiledSchema` validates nested values recursively: every mapping, iterable and wrapping validator
+adds Python frames, and a deeply nested input ends up with `RecursionError`.
+
+`IterativeCompiler` compiles the nodes that contain nested containers into *steps*: generator functions
+that validate a single value, and instead of calling a nested container, yield a request: `(target, nests, value)`.
+The engine, `run()`, keeps the generators on its own stack, sends the results back and throws the errors in,
+so the depth of the Python stack remains the same, whatever the depth of the input is.
+A step finishes by yielding `Return(value)`.
+
+Leaf validators (literals, types, callables) are called directly, and so are the containers that only have leaf
+values: with a depth limit, they're requested, and the engine executes them right away, without a generator.
+"""
+
+import six
+
+from . import signals
+from .errors import Invalid, MultipleInvalid
+from .util import get_literal_name, get_provided_name, get_type_name, const
+from .compiler import CompiledSchema
+from . import Schema
+from .. import helpers
+from ..validators import predicates
+
+
+class Return(object):
+    """ The final value of a step """
+    __slots__ = ('value',)
+
+    def __init__(self, value):
+        self.value = value
+
+
+class IterativeCompiler(object):
+    """ Compiles `CompiledSchema` nodes into steps for the iterative engine.
+
+    `compile(node)` returns a step, or `None` when the node has no nested containers: then, it's just called.
+
+    :param limited: Compile for a limited depth: containers with leaf values only are requested as well,
+        so the engine can count them. Otherwise, they're just called.
+    :type limited: bool
+
+    Validators that wrap other schemas (e.g. `All()`) need a step implementation in order to yield their sub-schemas:
+    these are registered in `adapters`: { validator class: method name }.
+    Other validators run their sub-schemas recursively.
+    """
+
+    adapters = {
+        Schema: '_adapt_schema',
+        predicates.All: '_adapt_all',
+        predicates.Any: '_adapt_any',
+        predicates.Neither: '_adapt_neither',
+        predicates.Maybe: '_adapt_maybe',
+        helpers.Msg: '_adapt_msg',
+        helpers.Object: '_adapt_object',
+    }
+
+    #: Compiled types that add a level of nesting
+    containers = (const.COMPILED_TYPE.MAPPING, const.COMPILED_TYPE.ITERABLE)
+
+    def __init__(self, limited=False):
+        self.limited = limited
+        #: Cache: { id(node): (node, step) }
+        self._compiled = {}
+        #: References: { id(node): (target, call) }
+        self._refs = {}
+
+    def compile(self, node):
+        """ Compile a node
+
+        :type node: CompiledSchema
+        :return: Step generator function, or `None` if the node has no nested containers
+        :rtype: callable|None
+        """
+        try:
+            return self._compiled[id(node)][1]
+        except KeyError:
+            step = self._compile(node)
+            self._compiled[id(node)] = (node, step)
+            return step
+
+    def call(self, node):
+        """ Get the request for validating a value with the node from within a step.
+
+        :type node: CompiledSchema
+        :return: `(target, nests)`, where `target` is a step or a node, and `nests` tells whether it adds a level of nesting.
+            `None` if the node is a leaf, and is called directly.
+        :rtype: tuple|None
+        """
+        if node.compiled_type == const.COMPILED_TYPE.REF:
+            return self._call_ref(node)
+
+        step = self.compile(node)
+        nests = node.compiled_type in self.containers
+        if step is None and not (nests and self.limited):
+            return None
+        return (step or node), nests
+
+    def _call_ref(self, node):
+        # The target contains this very reference, so it can't be compiled in advance:
+        # the engine resolves the reference when it gets the request, see resolve()
+        try:
+            return self._refs[id(node)][1]
+        except KeyError:
+            pass
+
+        # Skip references to references
+        target, seen = node.target, set()
+        while target is not None and target.compiled_type == const.COMPILED_TYPE.REF and id(target) not in seen:
+            seen.add(id(target))
+            target = target.target
+        if target is None or target.compiled_type == const.COMPILED_TYPE.REF:
+            call = None  # unresolved: fails when called
+        else:
+            call = (node, False)
+        self._refs[id(node)] = (target, call)
+        return call
+
+    def resolve(self, node):
+        """ Get the request for the target of a reference
+
+        :param node: A reference
+        :type node: CompiledSchema
+        :rtype: tuple|None
+        """
+        return self.call(self._refs[id(node)][0])
+
+    def _compile(self, node):
+        if node.compiled_type == const.COMPILED_TYPE.SCHEMA:
+            return self.compile(node.schema)
+        elif node.compiled_type == const.COMPILED_TYPE.CALLABLE:
+            return self._compile_callable(node)
+        elif node.compiled_type == const.COMPILED_TYPE.ITERABLE:
+            return self._compile_iterable(node)
+        elif node.compiled_type == const.COMPILED_TYPE.MAPPING:
+            return self._compile_mapping(node)
+        else:
+            return None
+
+    def _compile_callable(self, node):
+        schema = node.schema
+
+        # Validators with nested containers
+        if all(self.call(sub) is None for sub in node.sub_schemas):
+            return None
+        try:
+            adapter = getattr(self, self.adapters[type(schema)])
+        except KeyError:
+            return None  # can't get inside: runs recursively
+        call = (adapter(schema), False)
+
+        # Error utils: same as CompiledSchema._compile_callable()
+        enrich_exception = lambda e, value: e.enrich(
+            expected=node.name,
+            provided=get_provided_name(e, value),
+            path=node.path,
+            validator=schema)
+
+        def validate_with_callable(v):
+            try:
+                result = yield call + (v,)
+            except Invalid as e:
+                enrich_exception(e, v)
+                raise
+            except const.transformed_exceptions as e:
+                message = _(u'{message}').format(
+                    Exception=type(e).__name__,
+                    message=six.text_type(e))
+                e = Invalid(message)
+                raise enrich_exception(e, v)
+            yield Return(result)
+        return validate_with_callable
+
+    def _compile_iterable(self, node):
+        members = [(member, self.call(member)) for member in node.iterable_schemas]
+        if all(call is None for member, call in members):
+            return None
+
+        schema_type = type(node.schema)
+        error_passthrough = len(members) == 1
+        err_type = node.Invalid(_(u'Wrong value type'), get_type_name(schema_type))
+        err_value = node.Invalid(_(u'Invalid value'), node.name)
+
+        # Same as CompiledSchema._compile_iterable(), but yields the nested members
+        def validate_iterable(l):
+            if not isinstance(l, schema_type):
+                raise err_type(provided=get_type_name(type(l)))
+
+            errors = []
+            values = []
+            for value_index, value in list(enumerate(l)):
+                for member, call in members:
+                    try:
+                        values.append(member(value) if call is None else (yield call + (value,)))
+                        break
+                    except signals.RemoveValue:
+                        break
+                    except Invalid as e:
+                        if error_passthrough:
+                            errors.append(e.enrich(path=[value_index]))
+                            break
+                else:
+                    errors.append(err_value(get_literal_name(value), path=[value_index]))
+
+            if errors:
+                raise MultipleInvalid.if_multiple(errors)
+            yield Return(schema_type(values))
+        return validate_iterable
+
+    def _compile_mapping(self, node):
+        compiled = [(key_schema, value_schema, is_literal, is_identity, self.call(value_schema))
+                    for key_schema, value_schema, is_literal, is_identity in node.mapping_schemas]
+        if all(call is None for key_schema, value_schema, is_literal, is_identity, call in compiled):
+            return None
+
+        err_type = node.Invalid(_(u'Wrong value type'), get_type_name(dict))
+
+        # Same as CompiledSchema._compile_mapping(), but yields the nested values.
+        # The compiler rebuilds mapping schemas into a `dict`, so that's the type it checks.
+        def validate_mapping(d):
+            if not isinstance(d, dict):
+                raise err_type(provided=get_type_name(type(d)))
+
+            errors = []
+            d_keys = set(d.keys())
+
+            for key_schema, value_schema, is_literal, is_identity, call in compiled:
+                # Matches
+                matches = []
+                if is_literal:
+                    k = key_schema.schema.key
+                    if k in d_keys:
+                        matches.append((k, k, d[k]))
+                        d_keys.remove(k)
+                elif is_identity:
+                    matches.extend((k, k, d[k]) for k in d_keys)
+                    d_keys = None
+                elif d_keys:
+                    for k in tuple(d_keys):
+                        okay, sanitized_k = key_schema(k)
+                        if okay:
+                            matches.append((k, sanitized_k, d[k]))
+                            d_keys.remove(k)
+
+                # Marker
+                if key_schema.compiled_type == const.COMPILED_TYPE.MARKER:
+                    try:
+                        matches = key_schema.compiled.execute(d, matches)
+                    except Invalid as e:
+                        errors.append(e.enrich(
+                            expected=key_schema.name,
+                            provided=None,
+                            path=node.path,
+                            validator=key_schema.compiled
+                        ))
+                        continue
+
+                # Values
+                for k, sanitized_k, v in matches:
+                    try:
+                        d[sanitized_k] = value_schema(v) if call is None else (yield call + (v,))
+                        if k != sanitized_k:
+                            del d[k]
+                    except signals.RemoveValue:
+                        del d[k]
+                    except Invalid as e:
+                        errors.append(e.enrich(
+                            expected=value_schema.name,
+                            provided=get_provided_name(e, v),
+                            path=node.path + [k],
+                            validator=value_schema
+                        ))
+
+            if errors:
+                raise MultipleInvalid.if_multiple(errors)
+            yield Return(node.rebuild_lean(d) if node.lean else d)
+        return validate_mapping
+
+    #region Adapters
+
+    def _adapt_schema(self, schema):
+        sub = schema.compiled
+        call = self.call(sub)
+
+        def validate_schema(v):
+            v = sub(v) if call is None else (yield call + (v,))
+            yield Return(v)
+        return validate_schema
+
+    def _adapt_all(self, validator):
+        calls = [(schema.compiled, self.call(schema.compiled)) for schema in validator.compiled]
+
+        def validate_all(v):
+            for sub, call in calls:
+                v = sub(v) if call is None else (yield call + (v,))
+            yield Return(v)
+        return validate_all
+
+    def _adapt_any(self, validator):
+        calls = [(schema.compiled, self.call(schema.compiled)) for schema in validator.compiled]
+
+        def validate_any(v):
+            for sub, call in calls:
+                try:
+                    result = sub(v) if call is None else (yield call + (v,))
+                except Invalid:
+                    pass
+                else:
+                    yield Return(result)
+            raise Invalid(_(u'Invalid value'))
+        return validate_any
+
+    def _adapt_neither(self, validator):
+        calls = [(schema, self.call(schema.compiled)) for schema in validator.compiled]
+
+        def validate_neither(v):
+            for schema, call in calls:
+                try:
+                    if call is None:
+                        schema.compiled(v)
+                    else:
+                        yield call + (v,)
+                except Invalid:
+                    pass
+                else:
+                    raise Invalid(_(u'Value not allowed'), _(u'Not({})').format(schema.name), validator=schema.compiled.schema)
+            yield Return(v)
+        return validate_neither
+
+    def _adapt_maybe(self, validator):
+        sub = validator.schema.compiled
+        call = self.call(sub)
+
+        def validate_maybe(v):
+            if v == validator.none or v is const.UNDEFINED:
+                yield Return(validator.none)
+            try:
+                v = sub(v) if call is None else (yield call + (v,))
+            except Invalid as ee:
+                for e in ee:
+                    e.expected += _(u'?')
+                raise
+            yield Return(v)
+        return validate_maybe
+
+    def _adapt_msg(self, validator):
+        sub = validator.compiled
+        call = self.call(sub)
+
+        def validate_msg(v):
+            try:
+                v = sub(v) if call is None else (yield call + (v,))
+            except Invalid as ee:
+                for e in ee:
+                    e.message = validator.message
+                raise
+            except const.transformed_exceptions:
+                raise Invalid(validator.message or _(u'Invalid value'))
+            yield Return(v)
+        return validate_msg
+
+    def _adapt_object(self, validator):
+        sub = validator.compiled.compiled
+        call = self.call(sub)
+
+        def validate_object(v):
+            if not isinstance(v, validator.cls):
+                raise Invalid(_(u'Wrong value type'), provided=validator._format_value_type(v))
+            proxy = helpers.ObjectProxy(v)
+            proxy = sub(proxy) if call is None else (yield call + (proxy,))
+            yield Return(proxy.obj)
+        return validate_object
+
+    #endregion
+
+
+def run(compiler, node, value, max_depth=None):
+    """ Validate the value with the node, iteratively
+
+    :type compiler: IterativeCompiler
+    :type node: CompiledSchema
+    :param value: The value to validate
+    :param max_depth: The maximum nesting depth of mappings and iterables, or `None` for no limit
+    :type max_depth: int|None
+    :return: Sanitized value
+    :raises Invalid: Validation errors
+    """
+    call = compiler.call(node)
+    if call is None:
+        return node(value)
+
+    stack = []  # [(generator, nests)]
+    depth = 0  # The number of nesting steps on the stack
+    request = call + (value,)
+    result = error = None
+
+    while True:
+        # Execute the request
+        if request is not None:
+            target, nests, v = request
+            request = None
+            if nests and max_depth is not None and depth >= max_depth:
+                error = Invalid(_(u'Too deeply nested'), _(u'{max_depth} levels of nesting').format(max_depth=max_depth),
+                                get_type_name(type(v)))
+            elif isinstance(target, CompiledSchema):
+                # References are resolved into another request
+                if target.compiled_type == const.COMPILED_TYPE.REF:
+                    call = compiler.resolve(target)
+                    if call is not None:
+                        request = call + (v,)
+                        continue
+
+                # Containers with leaf values only are called right away
+                try:
+                    result = target(v)
+                except Exception as e:
+                    error = e
+            else:
+                stack.append((target(v), nests))
+                depth += nests
+                result = None
+
+        if not stack:
+            if error is not None:
+                raise error
+            return result
+
+        # Resume the current step: send the result, or throw the error in
+        gen, nests = stack[-1]
+        try:
+            if error is None:
+                out = gen.send(result)
+            else:
+                e, error = error, None
+                e.__traceback__ = None  # (Python 3) otherwise, it grows with every step it passes through
+                out = gen.throw(e)
+        except Exception as e:
+            stack.pop()
+            depth -= nests
+            error = e
+            continue
+
+        if isinstance(out, Return):
+            stack.pop()
+            depth -= nests
+            result = out.value
+        else:
+            request = out
+
+
+def get_compiler(schema, limited=False):
+    """ Get the iterative compiler of a `Schema`: there's one per Schema, and per mode
+
+    :type schema: Schema
+    :param limited: Is the nesting depth limited?
+    :type limited: bool
+    :rtype: IterativeCompiler
+    """
+    try:
+        compilers = schema.iterative_compilers
+    except AttributeError:
+        compilers = schema.iterative_compilers = {}
+    try:
+        return compilers[limited]
+    except KeyError:
+        compiler = compilers[limited] = IterativeCompiler(limited)
+        return compiler
+
+
+def validate(schema, value, max_depth=None):
+    """ Validate the value with a `Schema` iteratively
+
+    :type schema: Schema
+    :param value: The value to validate
+    :param max_depth: The maximum nesting depth of mappings and iterables, or `None` for no limit
+    :type max_depth: int|None
+    :return: Sanitized value
+    """
+    return run(get_compiler(schema, max_depth is not None), schema.compiled, value, max_depth)
@@ -0,0 +1,148 @@
+""" Input limits: guards against oversized input """
+
+import six
+import collections
+
+from .errors import Invalid
+from .util import get_type_name
+
+
+class Limits(object):
+    """ Limits on the size of the input, for validating untrusted payloads.
+
+    A huge list, or a deeply nested input, is fully traversed before the schema says no,
+    and that's how the worst-case CPU time per request gets unbounded.
+    With `Limits`, the [`Schema`](#schema) checks the whole input before the validation starts:
+
+    ```python
+    from good import Schema, Limits
+
+    schema = Schema({
+        'name': str,
+        'tags': [str],
+    }, limits=Limits(max_depth=10, max_items=100, max_keys=20, max_str_len=1000))
+
+    schema({'name': 'a', 'tags': ['a'] * 1000})
+    #-> Invalid: Too many items @ ['tags']: expected 100 items at most, got 1000 items
+    ```
+
+    Every mapping and iterable of the input is checked before its items are, and the first violation is reported
+    as an ordinary [`Invalid`](#invalid) error with a path: the check stops right there.
+    Hence, an oversized container is rejected without looking at its items, and without validating anything.
+
+    Note that the check is a separate pass over the input: for an input within the limits, it walks every container
+    and string on top of the validation, which costs about as much as validating a simple schema.
+    Strings are only looked at when `max_str_len` is set.
+
+    The check is iterative: it's not limited by the Python stack, whatever the depth of the input is.
+
+    Note that the limits apply to the whole input, including the values the schema would remove or ignore.
+
+    :param max_depth: The maximum nesting depth of mappings and iterables. The input itself is at the level 1.
+    :type max_depth: int|None
+    :param max_items: The maximum number of items in an iterable: `list`, `tuple`, `set`
+    :type max_items: int|None
+    :param max_keys: The maximum number of keys in a mapping
+    :type max_keys: int|None
+    :param max_str_len: The maximum length of a string. Long mapping keys are reported on the mapping itself.
+    :type max_str_len: int|None
+    """
+
+    #: Iterable types to check
+    iterable_types = (list, tuple, set, frozenset)
+
+    #: String types to check
+    string_types = (six.text_type, six.binary_type)
+
+    container_types = (collections.Mapping,) + iterable_types
+
+    def __init__(self, max_depth=None, max_items=None, max_keys=None, max_str_len=None):
+        self.max_depth = max_depth
+        self.max_items = max_items
+        self.max_keys = max_keys
+        self.max_str_len = max_str_len
+
+    def __repr__(self):
+        return '{cls}(max_depth={0.max_depth!r}, max_items={0.max_items!r}, max_keys={0.max_keys!r}, max_str_len={0.max_str_len!r})' \
+            .format(self, cls=type(self).__name__)
+
+    def check(self, value, depth=1):
+        """ Check the input against the limits
+
+        :param value: The input value
+        :param depth: The nesting level of the value
+        :type depth: int
+        :raises Invalid: A limit is exceeded
+        """
+        # Walk the containers with an explicit stack: [(container, depth, parent-entry, key)]
+        # The path is only built for the error.
+        entry = (value, depth, None, None)
+        self._check_value(value, entry)
+        stack = [entry] if isinstance(value, self.container_types) else []
+
+        # Strings are only looked at when their length is limited
+        string_types = self.string_types if self.max_str_len is not None else ()
+        container_types, iterable_types = self.container_types, self.iterable_types
+        max_keys, max_items, max_depth = self.max_keys, self.max_items, self.max_depth
+
+        while stack:
+            entry = stack.pop()
+            v, depth = entry[0], entry[1]
+
+            if isinstance(v, iterable_types):
+                if max_items is not None and len(v) > max_items:
+                    raise self._error(entry, _(u'Too many items'),
+                                      _(u'{n} items at most').format(n=max_items), _(u'{n} items').format(n=len(v)))
+                items = enumerate(v)
+            else:
+                if max_keys is not None and len(v) > max_keys:
+                    raise self._error(entry, _(u'Too many keys'),
+                                      _(u'{n} keys at most').format(n=max_keys), _(u'{n} keys').format(n=len(v)))
+                items = six.iteritems(v)
+                if string_types:
+                    for k in v:
+                        if isinstance(k, string_types):
+                            self._check_value(k, entry)  # reported on the mapping: don't put the key into the path
+
+            for k, item in items:
+                if isinstance(item, container_types):
+                    item_entry = (item, depth + 1, entry, k)
+                    if max_depth is not None and depth >= max_depth:
+                        raise self._error(item_entry, _(u'Too deeply nested'),
+                                          _(u'{max_depth} levels of nesting').format(max_depth=max_depth),
+                                          get_type_name(type(item)))
+                    stack.append(item_entry)
+                elif string_types and isinstance(item, string_types):
+                    self._check_value(item, (item, depth + 1, entry, k))
+
+    def wrap(self, validate):
+        """ Make a validator that checks the input against the limits first
+
+        :param validate: The validation callable
+        :type validate: callable
+        :rtype: callable
+        """
+        check = self.check
+
+        def validate_within_limits(value):
+            check(value)
+            return validate(value)
+        return validate_within_limits
+
+    def _check_value(self, v, entry):
+        """ Check a scalar value """
+        if self.max_str_len is not None and isinstance(v, self.string_types) and len(v) > self.max_str_len:
+            raise self._error(entry, _(u'String is too long'),
+                              _(u'{n} characters at most').format(n=self.max_str_len), _(u'{n} characters').format(n=len(v)))
+
+    def _error(self, entry, message, expected, provided):
+        """ Make an error for the stack entry """
+        path = []
+        while entry[2] is not None:
+            path.append(entry[3])
+            entry = entry[2]
+        path.reverse()
+        return Invalid(message, expected, provided, path, validator=self)
+
+
+__all__ = ('Limits',)
@@ -0,0 +1,192 @@
+""" Memory profiling: the memory compiled schemas retain, and the memory validation allocates """
+
+import sys
+import types
+import functools
+import collections
+
+from . import Schema
+from .compiler import CompiledSchema
+from .profiler import Profiler, node_paths
+from .util import const
+
+try:
+    import tracemalloc
+except ImportError:  # Python 2
+    tracemalloc = None
+
+
+#: The memory a compiled sub-schema retains
+NodeMemory = collections.namedtuple('NodeMemory', ('path', 'name', 'size'))
+
+
+class MemoryReport(object):
+    """ The memory a compiled schema retains: bytes per compiled sub-schema
+
+    :param nodes: Sub-schemas, in the order they're found in the schema
+    :type nodes: list[NodeMemory]
+    """
+
+    def __init__(self, nodes):
+        #: Sub-schemas: [NodeMemory]
+        self.nodes = nodes
+
+    def __repr__(self):
+        return '{cls}(nodes={0}, total={1})'.format(len(self.nodes), self.total, cls=type(self).__name__)
+
+    @property
+    def total(self):
+        """ The memory the schema retains, bytes
+
+        :rtype: int
+        """
+        return sum(n.size for n in self.nodes)
+
+    def report(self, limit=None):
+        """ Format a text report: the sub-schemas that retain the most memory come first
+
+        :param limit: The number of sub-schemas to report, or `None` for all of them
+        :type limit: int|None
+        :rtype: unicode
+        """
+        rows = sorted(self.nodes, key=lambda n: n.size, reverse=True)[:limit]
+        lines = [u'{:>10}  {}'.format('bytes', 'path: name')]
+        lines.extend(u'{0.size:>10}  {0.path}: {0.name}'.format(n) for n in rows)
+        lines.append(u'{:>10}  {}'.format(self.total, 'total'))
+        return u'\n'.join(lines)
+
+
+def memory_report(schema):
+    """ Measure the memory a compiled schema retains, per compiled sub-schema
+
+    :type schema: Schema
+    :rtype: MemoryReport
+    """
+    seen = set()
+    nodes = []
+    for node, path in node_paths([schema.compiled] + list(schema.refs.values())):
+        # Mapping keys are counted within their mapping
+        owned = [node]
+        if node.compiled_type == const.COMPILED_TYPE.MAPPING:
+            owned.extend(sub for key_schema, value_schema, is_literal, is_identity in node.mapping_schemas
+                         for sub in key_schema.walk())
+        nodes.append(NodeMemory(path, node.name, sum(retained_size(o, seen) for o in owned)))
+    return MemoryReport(nodes)
+
+
+def retained_size(node, seen):
+    """ Measure the memory a compiled sub-schema retains, bytes
+
+    Sums up the sizes of the node, its attributes, its validator, and the values the validator keeps:
+    closure cells, default arguments, `functools.partial` arguments, containers, and the attributes of the objects.
+    Stops at other compiled sub-schemas, at compiled `Schema`s, and at the objects that are shared
+    by all schemas: types, modules, code, builtins, and module-level functions.
+
+    :param node: Compiled sub-schema
+    :type node: CompiledSchema
+    :param seen: `id()`s of the objects counted already: every object is counted once
+    :type seen: set
+    :rtype: int
+    """
+    size = 0
+    stack = [node]
+    while stack:
+        o = stack.pop()
+        if id(o) in seen or (o is not node and _is_shared(o)):
+            continue
+        seen.add(id(o))
+        size += sys.getsizeof(o)
+
+        # Referents
+        if isinstance(o, dict):
+            stack.extend(o.keys())
+            stack.extend(o.values())
+        elif isinstance(o, (list, tuple, set, frozenset)):
+            stack.extend(o)
+        elif isinstance(o, types.FunctionType):
+            for cell in o.__closure__ or ():
+                stack.append(cell)
+            stack.append(o.__defaults__)
+            stack.append(o.__dict__)
+        elif type(o).__name__ == 'cell':
+            try:
+                stack.append(o.cell_contents)
+            except ValueError:  # empty cell
+                pass
+        elif isinstance(o, types.MethodType):
+            stack.append(o.__self__)
+        elif isinstance(o, functools.partial):
+            stack.extend((o.func, o.args, o.keywords))
+        elif hasattr(o, '__dict__'):
+            stack.append(o.__dict__)
+    return size
+
+
+def _is_shared(o):
+    """ Test whether the object is shared by all schemas """
+    if o is None or isinstance(o, (bool, type, types.ModuleType, types.CodeType, types.BuiltinFunctionType,
+                                   CompiledSchema, Schema)):
+        return True
+    if isinstance(o, types.FunctionType):  # module-level function
+        return getattr(sys.modules.get(o.__module__), o.__name__, None) is o
+    return False
+
+
+class AllocationProfiler(Profiler):
+    """ Allocation profiler: records the memory allocated in every compiled sub-schema (Python 3.4+: `tracemalloc`).
+
+    Works like [`Profiler`](#profiling), but measures the traced memory instead of time:
+    the net size of the allocations made by a sub-schema that are still alive when it returns,
+    e.g. the sanitized values it builds. Temporary objects allocated and freed within a call aren't counted,
+    and a sub-schema that drops what its sub-schemas have allocated (e.g. `Any()` catching their errors)
+    gets a negative self size. The profiler's own bookkeeping allocates a bit as well.
+
+    Starts `tracemalloc` if it's not running, and stops it when it's done.
+
+    :type schema: Schema
+    """
+
+    clock = staticmethod(lambda: tracemalloc.get_traced_memory()[0])
+
+    #: Collapsed stacks: bytes
+    collapsed_scale = 1
+
+    def __init__(self, schema):
+        if tracemalloc is None:
+            raise RuntimeError('Allocation profiling requires tracemalloc: Python 3.4+')
+        super(AllocationProfiler, self).__init__(schema)
+        self._tracing = False
+
+    def start(self):
+        """ Start profiling: start `tracemalloc`, and instrument the compiled schema """
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._tracing = True
+        super(AllocationProfiler, self).start()
+
+    def stop(self):
+        """ Stop profiling: restore the original validators, and stop `tracemalloc` """
+        super(AllocationProfiler, self).stop()
+        if self._tracing:
+            tracemalloc.stop()
+            self._tracing = False
+
+    def report(self, sort='own', limit=None):
+        """ Format a text report: the sub-schemas that allocate the most come first
+
+        :param sort: The column to sort by: 'own' (self bytes), 'total' (cumulative bytes), 'calls', 'failures'
+        :type sort: str
+        :param limit: The number of sub-schemas to report, or `None` for all of them
+        :type limit: int|None
+        :rtype: unicode
+        """
+        rows = sorted(self.stats.values(), key=lambda s: getattr(s, sort), reverse=True)[:limit]
+        lines = [u'{:>10} {:>12} {:>12} {:>10} {:>10}  {}'.format(
+            'calls', 'total, bytes', 'self, bytes', 'self/call', 'failures', 'path: name')]
+        lines.extend(u'{0.calls:>10} {1:>12} {2:>12} {3:>10} {0.failures:>10}  {0.path}: {0.name}'
+                     .format(s, int(s.total), int(s.own), int(s.own / s.calls) if s.calls else 0)
+                     for s in rows)
+        return u'\n'.join(lines)
+
+
+__all__ = ('MemoryReport', 'AllocationProfiler')
@@ -0,0 +1,262 @@
+""" Runtime metrics: counters and latency histograms per schema """
+
+import threading
+from bisect import bisect_left
+from timeit import default_timer
+
+import six
+
+from .compiler import CompiledSchema
+from .errors import Invalid, MultipleInvalid
+
+
+class SchemaMetrics(object):
+    """ Metrics of a single schema: the hook for [`Schema(metrics=...)`](#schema).
+
+    Counts every validation and failure, and times every n-th validation into a pre-bucketed histogram.
+
+    :param name: Schema name, used as a label
+    :type name: str
+    :param buckets: Upper bounds of the histogram buckets, in seconds, sorted
+    :type buckets: tuple[float]
+    :param sample_every: Time every n-th validation
+    :type sample_every: int
+    """
+
+    __slots__ = ('name', 'buckets', 'sample_every', 'failed', 'failures', 'counts', 'sum', 'samples',
+                 '_periods', '_countdown')
+
+    def __init__(self, name, buckets, sample_every=1):
+        self.name = name
+        self.buckets = tuple(buckets)
+        self.sample_every = sample_every
+
+        #: The number of failed validations
+        self.failed = 0
+        #: Errors by message: { message: count }. Every error of a `MultipleInvalid` is counted.
+        self.failures = {}
+        #: Histogram: the number of samples per bucket, not cumulative. The last one is `+Inf`.
+        self.counts = [0] * (len(self.buckets) + 1)
+        #: The sum of the sampled latencies, seconds
+        self.sum = 0.0
+        #: The number of samples
+        self.samples = 0
+
+        # Validations are counted down to the next sample: `validations` is computed
+        self._periods = 0
+        self._countdown = 1
+
+    @property
+    def validations(self):
+        """ The number of validations
+
+        :rtype: int
+        """
+        return self._periods * self.sample_every + 1 - self._countdown
+
+    def __repr__(self):
+        return '{cls}({0.name!r}, validations={0.validations}, failed={0.failed})'.format(self, cls=type(self).__name__)
+
+    def __call__(self, validate, value):
+        """ Validate the value, and collect the metrics
+
+        :param validate: The validation callable
+        :type validate: callable
+        :param value: The value to validate
+        :return: Sanitized value
+        """
+        return self.wrap(validate)(value)
+
+    def wrap(self, validate):
+        """ Make a validator that collects the metrics.
+
+        Works like the hook, but the validator is bound once: [`Schema`](#schema) uses it instead of the hook,
+        which saves a call on every validation.
+
+        :param validate: The validation callable.
+            A `CompiledSchema` is not called, but its validator is: that saves a call,
+            and follows the validator when it's replaced, e.g. by the [profiler](#profiling).
+        :type validate: callable|CompiledSchema
+        :rtype: callable
+        """
+        node = validate if isinstance(validate, CompiledSchema) else None
+
+        def validate_with_metrics(value):
+            self._countdown -= 1
+            if self._countdown > 0:
+                try:
+                    return node.compiled(value) if node is not None else validate(value)
+                except Invalid as e:
+                    self._fail(e)
+                    raise
+            return self._sample(validate, value)
+        return validate_with_metrics
+
+    def _sample(self, validate, value):
+        """ Validate the value, and time it """
+        self._periods += 1
+        self._countdown = self.sample_every
+        start = default_timer()
+        try:
+            value = validate(value)
+        except Invalid as e:
+            self._observe(default_timer() - start)
+            self._fail(e)
+            raise
+        self._observe(default_timer() - start)
+        return value
+
+    def _observe(self, seconds):
+        """ Add a sample to the histogram """
+        self.counts[bisect_left(self.buckets, seconds)] += 1
+        self.sum += seconds
+        self.samples += 1
+
+    def _fail(self, e):
+        """ Count a failure """
+        self.failed += 1
+        for error in (e.errors if isinstance(e, MultipleInvalid) else (e,)):
+            self.failures[error.message] = self.failures.get(error.message, 0) + 1
+
+    def quantile(self, q):
+        """ Estimate a latency quantile from the histogram, the way Prometheus `histogram_quantile()` does:
+        with linear interpolation within a bucket.
+
+        :param q: Quantile: 0.5, 0.99, ...
+        :type q: float
+        :return: Seconds, or `None` with no samples
+        :rtype: float|None
+        """
+        if not self.samples:
+            return None
+
+        rank = q * self.samples
+        seen = 0
+        for i, count in enumerate(self.counts):
+            if seen + count >= rank and count:
+                if i == len(self.buckets):
+                    return self.buckets[-1] if self.buckets else None  # +Inf: the highest known bound
+                lower = self.buckets[i - 1] if i else 0.0
+                return lower + (self.buckets[i] - lower) * (rank - seen) / count
+            seen += count
+        return None
+
+
+class Metrics(object):
+    """ Metrics collector: validation counters and latency histograms per schema, in Prometheus text format.
+
+    Give the schemas their hooks, and export the metrics when they're scraped:
+
+    ```python
+    from good import Schema, Metrics
+
+    metrics = Metrics(sample_rate=0.1)
+
+    user = Schema({'name': str}, metrics=metrics.hook('user'))
+    user({'name': 'a'})
+
+    metrics.export()
+    #-> # HELP good_validations_total Validations
+    #-> # TYPE good_validations_total counter
+    #-> good_validations_total{schema="user"} 1
+    #-> ...
+
+    metrics.hook('user').quantile(0.99)  # p99 latency, seconds
+    ```
+
+    Every validation and failure is counted, failures are counted by `Invalid.message` as well.
+    The latency is measured for a sample of the validations, `sample_rate`, into a histogram with fixed buckets.
+    The counters are plain integers, with no locking: under concurrent validation, increments might be lost,
+    which is fine for the metrics.
+
+    A metrics hook is any callable `hook(validate, value)` that returns `validate(value)`:
+    use one to report to another metrics system.
+
+    :param buckets: Upper bounds of the latency histogram buckets, seconds
+    :type buckets: collections.Iterable[float]
+    :param sample_rate: The share of the validations to time: 1.0 for all of them, 0.01 for every 100th one
+    :type sample_rate: float
+    :param prefix: Metric name prefix
+    :type prefix: str
+    """
+
+    #: Default latency buckets, seconds: 10us .. 10s
+    default_buckets = (0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005,
+                       0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+    #: The content type of the exported metrics
+    content_type = 'text/plain; version=0.0.4; charset=utf-8'
+
+    def __init__(self, buckets=None, sample_rate=1.0, prefix='good'):
+        self.buckets = tuple(sorted(self.default_buckets if buckets is None else buckets))
+        self.sample_every = max(1, int(round(1.0 / sample_rate)))
+        self.prefix = prefix
+
+        #: Schema metrics: { name: SchemaMetrics }
+        self.schemas = {}
+        self._lock = threading.Lock()
+
+    def __repr__(self):
+        return '{cls}(sample_every={0.sample_every!r}, prefix={0.prefix!r})'.format(self, cls=type(self).__name__)
+
+    def hook(self, name):
+        """ Get the metrics hook for a schema
+
+        Schemas that use the same name share the metrics.
+
+        :param name: Schema name, used as a label
+        :type name: str
+        :rtype: SchemaMetrics
+        """
+        try:
+            return self.schemas[name]
+        except KeyError:
+            with self._lock:
+                return self.schemas.setdefault(name, SchemaMetrics(name, self.buckets, self.sample_every))
+
+    def export(self):
+        """ Export the metrics in Prometheus text format
+
+        :rtype: unicode
+        """
+        p = self.prefix
+        schemas = sorted(self.schemas.values(), key=lambda m: m.name)
+        lines = []
+
+        lines.append(u'# HELP {}_validations_total Validations'.format(p))
+        lines.append(u'# TYPE {}_validations_total counter'.format(p))
+        lines.extend(u'{}_validations_total{{schema="{}"}} {}'.format(p, _escape(m.name), m.validations)
+                     for m in schemas)
+
+        lines.append(u'# HELP {}_failures_total Failed validations'.format(p))
+        lines.append(u'# TYPE {}_failures_total counter'.format(p))
+        lines.extend(u'{}_failures_total{{schema="{}"}} {}'.format(p, _escape(m.name), m.failed)
+                     for m in schemas)
+
+        lines.append(u'# HELP {}_errors_total Validation errors, by message'.format(p))
+        lines.append(u'# TYPE {}_errors_total counter'.format(p))
+        for m in schemas:
+            lines.extend(u'{}_errors_total{{schema="{}",message="{}"}} {}'.format(p, _escape(m.name), _escape(message), count)
+                         for message, count in sorted(m.failures.items()))
+
+        lines.append(u'# HELP {}_validation_seconds Validation latency, sampled'.format(p))
+        lines.append(u'# TYPE {}_validation_seconds histogram'.format(p))
+        for m in schemas:
+            name = _escape(m.name)
+            cumulative = 0
+            for bound, count in zip(m.buckets + (None,), m.counts):
+                cumulative += count
+                lines.append(u'{}_validation_seconds_bucket{{schema="{}",le="{}"}} {}'.format(
+                    p, name, u'+Inf' if bound is None else repr(float(bound)), cumulative))
+            lines.append(u'{}_validation_seconds_sum{{schema="{}"}} {}'.format(p, name, repr(m.sum)))
+            lines.append(u'{}_validation_seconds_count{{schema="{}"}} {}'.format(p, name, m.samples))
+
+        return u'\n'.join(lines) + u'\n'
+
+
+def _escape(value):
+    """ Escape a Prometheus label value """
+    return six.text_type(value).replace(u'\\', u'\\\\').replace(u'"', u'\\"').replace(u'\n', u'\\n')
+
+
+__all__ = ('Metrics', 'SchemaMetrics')
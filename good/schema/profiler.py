@@ -0,0 +1,204 @@
+""" Validation profiler: time spent in every compiled sub-schema """
+
+import threading
+from collections import defaultdict
+from timeit import default_timer
+
+from .errors import Invalid
+from .util import const
+
+
+def node_paths(roots, own=False):
+    """ List the compiled sub-schemas with their paths. Matchers (mapping keys) are skipped.
+
+    Paths use `/` to separate mapping keys, and `[]` for the members of iterables.
+    A sub-schema that is used in many places is listed once, at the first path it's found at.
+
+    :param roots: Compiled schemas to walk
+    :type roots: list[CompiledSchema]
+    :param own: Only the sub-schemas the roots own: don't enter other `Schema`s used within them
+    :type own: bool
+    :rtype: list[(CompiledSchema, str)]
+    """
+    result = []
+    seen = set()
+    stack = [(root, '') for root in reversed(roots)]
+    while stack:
+        node, path = stack.pop()
+        if id(node) in seen or node.matcher:
+            continue
+        seen.add(id(node))
+        result.append((node, path or '/'))
+
+        if own and node.is_nested_schema:
+            subs = []
+        elif node.compiled_type == const.COMPILED_TYPE.MAPPING:
+            subs = [(value_schema, path + '/' + key_schema.name)
+                    for key_schema, value_schema, is_literal, is_identity in node.mapping_schemas]
+        elif node.compiled_type == const.COMPILED_TYPE.ITERABLE:
+            members = node.iterable_schemas
+            subs = [(member, path + ('/[]' if len(members) == 1 else '/[{}]'.format(i)))
+                    for i, member in enumerate(members)]
+        else:
+            subs = [(sub, path) for sub in node.sub_schemas]
+        stack.extend(reversed(subs))
+    return result
+
+
+class NodeStats(object):
+    """ Profile of a compiled sub-schema
+
+    :param path: Path to the sub-schema within the schema: `/items/[]/price`
+    :type path: str
+    :param name: Sub-schema name
+    :type name: unicode
+    """
+
+    __slots__ = ('path', 'name', 'calls', 'failures', 'total', 'own', 'active')
+
+    def __init__(self, path, name):
+        self.path = path
+        self.name = name
+        #: The number of calls
+        self.calls = 0
+        #: The number of calls that raised `Invalid`
+        self.failures = 0
+        #: Cumulative time, seconds
+        self.total = 0.0
+        #: Self time, seconds: with no time spent in the sub-schemas
+        self.own = 0.0
+        #: Calls in progress: recursive calls are counted once in the cumulative time
+        self.active = 0
+
+    def __repr__(self):
+        return '{cls}({0.path!r}, calls={0.calls}, total={0.total:.6f}, own={0.own:.6f}, failures={0.failures})' \
+            .format(self, cls=type(self).__name__)
+
+
+class Profiler(object):
+    """ Validation profiler: records the time spent in every compiled sub-schema.
+
+    While it's on, every compiled sub-schema is wrapped with a function that measures it.
+    When it's off, the original validators are put back in place, so a schema that is not being profiled
+    runs with no overhead at all.
+
+    The sub-schemas are instrumented in place, so the schemas that share them are profiled as well:
+    see [`Schema.profile()`](#profiling). Other `Schema`s used within the schema are not instrumented.
+
+    Only [`Schema.__call__()`](#validating) is profiled.
+
+    :type schema: Schema
+    """
+
+    #: The measure: self "time" is the difference of two readings
+    clock = staticmethod(default_timer)
+
+    #: Collapsed stacks: readings to the reported integers, microseconds
+    collapsed_scale = 1000000
+
+    def __init__(self, schema):
+        self.schema = schema
+        #: Profiles: { id(node): NodeStats }
+        self.stats = {}
+        #: Self time of call stacks: { (label, ...): seconds }
+        self.stacks = defaultdict(float)
+        #: Original validators: [(node, compiled)]
+        self._originals = []
+        self._local = threading.local()
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def start(self):
+        """ Start profiling: instrument the compiled schema """
+        assert not self._originals, 'The profiler is already started'
+        roots = [self.schema.compiled] + list(self.schema.refs.values())
+        for node, path in node_paths(roots, own=True):
+            self._originals.append((node, node.compiled))
+            node.compiled = self._instrument(node, path)
+
+    def stop(self):
+        """ Stop profiling: restore the original validators """
+        for node, compiled in reversed(self._originals):
+            node.compiled = compiled
+        self._originals = []
+
+    def _instrument(self, node, path):
+        """ Make an instrumented validator for the node """
+        compiled = node.compiled
+
+        # Wrappers: call the target, so that it's profiled.
+        # References call the target's validator directly: see CompiledSchema.resolve_refs()
+        if node.compiled_type == const.COMPILED_TYPE.SCHEMA:
+            return lambda v: node.schema(v)
+        if node.compiled_type == const.COMPILED_TYPE.REF:
+            return (lambda v: node.target(v)) if node.target is not None else compiled
+
+        stats = self.stats[id(node)] = NodeStats(path, node.name)
+        label = u'{}: {}'.format(path.rsplit('/', 1)[-1] or '/', node.name).replace(';', ',')
+        local = self._local
+        stacks = self.stacks
+        clock = self.clock
+
+        def profiled(v):
+            # Per-thread stacks: [time spent in the sub-schemas], [labels]
+            try:
+                times, labels = local.times, local.labels
+            except AttributeError:
+                times, labels = local.times, local.labels = [], []
+
+            times.append(0.0)
+            labels.append(label)
+            stats.active += 1
+            start = clock()
+            try:
+                return compiled(v)
+            except Invalid:
+                stats.failures += 1
+                raise
+            finally:
+                elapsed = clock() - start
+                own = elapsed - times.pop()
+                stats.calls += 1
+                stats.own += own
+                stats.active -= 1
+                if not stats.active:
+                    stats.total += elapsed
+                if times:
+                    times[-1] += elapsed
+                stacks[tuple(labels)] += own
+                labels.pop()
+        return profiled
+
+    def report(self, sort='own', limit=None):
+        """ Format a text report: the sub-schemas that take the most time come first
+
+        :param sort: The column to sort by: 'own' (self time), 'total' (cumulative time), 'calls', 'failures'
+        :type sort: str
+        :param limit: The number of sub-schemas to report, or `None` for all of them
+        :type limit: int|None
+        :rtype: unicode
+        """
+        rows = sorted(self.stats.values(), key=lambda s: getattr(s, sort), reverse=True)[:limit]
+        lines = [u'{:>10} {:>10} {:>10} {:>10}  {}'.format('calls', 'total, ms', 'self, ms', 'failures', 'path: name')]
+        lines.extend(u'{0.calls:>10} {1:>10.3f} {2:>10.3f} {0.failures:>10}  {0.path}: {0.name}'
+                     .format(s, s.total * 1000, s.own * 1000)
+                     for s in rows)
+        return u'\n'.join(lines)
+
+    def collapsed(self):
+        """ Format the collapsed stacks, for flame graphs: `a;b;c <microseconds>`, a line per stack.
+
+        Feed it to [FlameGraph](https://github.com/brendangregg/FlameGraph) or [speedscope](https://www.speedscope.app/).
+
+        :rtype: unicode
+        """
+        return u''.join(u'{} {}\n'.format(u';'.join(stack), int(round(seconds * self.collapsed_scale)))
+                        for stack, seconds in sorted(self.stacks.items()))
+
+
+__all__ = ('Profiler',)
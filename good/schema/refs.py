@@ -0,0 +1,66 @@
+""" References: recursive schemas """
+
+import six
+
+
+class Ref(object):
+    """ A reference to a schema: makes recursive schemas possible.
+
+    `Ref()` refers to the whole schema, and allows tree-shaped data of any depth:
+
+    ```python
+    from good import Schema, Optional, Ref
+
+    comment = Schema({
+        'text': str,
+        Optional('replies'): [Ref()],  # the same schema again
+    })
+
+    comment({'text': 'a', 'replies': [{'text': 'b', 'replies': [{'text': 'c'}]}]})
+    ```
+
+    `Ref(name)` refers to a named schema, provided with the `refs` argument of the [`Schema`](#schema):
+
+    ```python
+    schema = Schema({
+        'title': str,
+        'menu': [Ref('item')],
+    }, refs={
+        'item': {
+            'title': str,
+            'url': str,
+            Optional('items'): [Ref('item')],
+        },
+    })
+    ```
+
+    References are resolved once, when the `Schema` is created: every reference uses the same compiled schema,
+    whatever the depth is. Error paths are reported in full: e.g. `['replies', 0, 'replies', 0, 'text']`.
+
+    References can be used with validators that wrap schemas, such as `Maybe([Ref()])`:
+    a reference always refers to the outermost `Schema` it's compiled into,
+    and named references are looked up in every `Schema` that contains them, from the outermost.
+
+    A `Schema` object that is used within another schema keeps its own references:
+    `Ref()` within it still refers to it, and `Ref(name)` needs its own `refs`.
+    This way, a recursive schema can be embedded anywhere, and still be used on its own:
+
+    ```python
+    document = Schema({'title': str, 'comments': [comment]})  # `comment` from above is still recursive
+    ```
+
+    Note that references can't be used as mapping keys.
+
+    :param name: Name of the schema to refer to, or `None` to refer to the whole schema
+    :type name: str|None
+    """
+
+    def __init__(self, name=None):
+        self.ref = name
+        self.name = _(u'self') if name is None else six.text_type(name)
+
+    def __repr__(self):
+        return '{cls}({name})'.format(cls=type(self).__name__, name='' if self.ref is None else repr(self.ref))
+
+
+__all__ = ('Ref',)
@@ -0,0 +1,285 @@
+""" Schema registry: versioned schemas, compiled on first use """
+
+import sys
+import threading
+import collections
+from timeit import default_timer
+
+from . import Schema
+
+
+class SchemaRegistry(object):
+    """ A registry of versioned schemas: compiles them on first use, and keeps the recently used ones.
+
+    A service that validates the data of many tenants, or many versions of a message format, needs many schemas,
+    but only a few of them at any moment. The registry maps `(name, version)` to schema factories,
+    compiles a schema when it's first requested, and keeps the compiled schemas within a budget,
+    evicting the least recently used ones:
+
+    ```python
+    from good import Schema, SchemaRegistry, Email
+
+    registry = SchemaRegistry(max_schemas=500)
+
+    @registry.register('user', 1)
+    def user_v1():
+        return Schema({'name': str})
+
+    registry.register('user', 2, lambda: {'name': str, 'email': Email()})  # a definition works as well
+
+    registry.get('user', 2)({'name': 'a', 'email': 'a@example.com'})
+    registry.get('user')  # the latest version
+    ```
+
+    A factory is called with no arguments, and returns a [`Schema`](#schema), or a schema definition.
+    Registering a factory once again replaces the compiled schema.
+
+    Schemas that are not registered can be provided by a `loader`: e.g. definitions stored on disk.
+    Note that compiled schemas can't be stored: validators are closures, so a loader provides definitions,
+    and these are compiled on first use, just like the registered ones:
+
+    ```python
+    def load(name, version):
+        with open('schemas/{}-{}.json'.format(name, version)) as f:
+            return json.load(f)  # a definition of literals, lists and mappings
+
+    registry = SchemaRegistry(loader=load)
+    ```
+
+    The budget is the number of compiled schemas, and/or their estimated memory:
+    see `good.schema.registry.estimate_size()`.
+    The registry is thread-safe, and it compiles every schema once, even when it's requested concurrently.
+    Schemas are compiled, and loaded, outside of the registry lock: a slow one only delays the threads that wait for it.
+
+    :param max_schemas: The maximum number of compiled schemas to keep, or `None` for no limit
+    :type max_schemas: int|None
+    :param max_memory: The maximum estimated memory of the compiled schemas to keep, in bytes, or `None` for no limit.
+        The most recently used schema is always kept.
+    :type max_memory: int|None
+    :param loader: A callable for the schemas that are not registered: `loader(name, version)`.
+        Returns a `Schema`, a schema definition, or `None` if there's no such schema.
+        With no version requested, `version` is `None`.
+    :type loader: callable|None
+    """
+
+    def __init__(self, max_schemas=None, max_memory=None, loader=None):
+        self.max_schemas = max_schemas
+        self.max_memory = max_memory
+        self.loader = loader
+
+        #: Factories: { name: { version: factory } }
+        self._factories = {}
+        #: Compiled schemas, least recently used first: { (name, version): (schema, size) }
+        self._schemas = collections.OrderedDict()
+        #: The estimated memory of the compiled schemas
+        self._memory = 0
+        #: Counters
+        self._stats = dict(hits=0, misses=0, compiles=0, compile_time=0.0, evictions=0)
+        #: Schemas being compiled: { (name, version): threading.Event }
+        self._compiling = {}
+        #: Incremented by evict(): schemas compiled before that are not kept
+        self._generation = 0
+
+        self._lock = threading.RLock()
+
+    def __repr__(self):
+        return '{cls}(max_schemas={0.max_schemas!r}, max_memory={0.max_memory!r})'.format(self, cls=type(self).__name__)
+
+    def register(self, name, version, factory=None):
+        """ Register a schema factory
+
+        Can be used as a decorator, when no `factory` is given.
+
+        :param name: Schema name
+        :type name: str
+        :param version: Schema version. Versions of a schema must be comparable to each other, e.g. integers.
+        :param factory: A callable that returns a `Schema`, or a schema definition
+        :type factory: callable
+        :return: The factory
+        :rtype: callable
+        """
+        if factory is None:
+            return lambda factory: self.register(name, version, factory)
+
+        with self._lock:
+            self._factories.setdefault(name, {})[version] = factory
+            self.evict(name, version)
+        return factory
+
+    def names(self):
+        """ Get the names of the registered schemas
+
+        :return: Sorted list of names
+        :rtype: list
+        """
+        return sorted(self._factories)
+
+    def versions(self, name):
+        """ Get the registered versions of a schema
+
+        :param name: Schema name
+        :type name: str
+        :return: Sorted list of versions
+        :rtype: list
+        """
+        return sorted(self._factories.get(name, {}))
+
+    def get(self, name, version=None):
+        """ Get a compiled schema
+
+        :param name: Schema name
+        :type name: str
+        :param version: Schema version, or `None` for the latest registered version
+        :return: The compiled schema
+        :rtype: Schema
+        :raises KeyError: No such schema
+        :raises SchemaError: Schema compilation error
+        """
+        while True:
+            with self._lock:
+                if version is None and self._factories.get(name):
+                    version = max(self._factories[name])
+                key = (name, version)
+
+                # Hit
+                try:
+                    schema, size = self._schemas.pop(key)
+                except KeyError:
+                    pass
+                else:
+                    self._schemas[key] = (schema, size)  # the most recently used
+                    self._stats['hits'] += 1
+                    return schema
+
+                # Another thread compiles it: wait, and look again
+                compiling = self._compiling.get(key)
+                if compiling is None:
+                    # Miss
+                    self._stats['misses'] += 1
+                    factory = self._factories.get(name, {}).get(version)
+                    if factory is None and self.loader is not None:
+                        factory = lambda: self.loader(name, version)
+                    if factory is None:
+                        raise KeyError(key)
+                    compiling = self._compiling[key] = threading.Event()
+                    generation = self._generation
+                    break
+            compiling.wait()
+
+        # Compile: without the lock, so that the other schemas are still served
+        try:
+            start = default_timer()
+            schema = factory()
+            if schema is None:
+                raise KeyError(key)
+            if not isinstance(schema, Schema):
+                schema = Schema(schema)
+            compile_time = default_timer() - start
+            size = estimate_size(schema) if self.max_memory is not None else 0
+
+            # Keep: unless it was replaced, or evicted, while compiling
+            with self._lock:
+                self._stats['compiles'] += 1
+                self._stats['compile_time'] += compile_time
+                if generation == self._generation:
+                    self._schemas[key] = (schema, size)
+                    self._memory += size
+                    self._shrink()
+            return schema
+        finally:
+            with self._lock:
+                del self._compiling[key]
+            compiling.set()
+
+    def __getitem__(self, key):
+        """ Get a compiled schema: `registry['user', 2]`
+
+        :param key: (name, version)
+        :type key: tuple
+        :rtype: Schema
+        """
+        return self.get(*key)
+
+    def __contains__(self, key):
+        """ Test whether a schema is registered: `('user', 2) in registry`
+
+        :param key: (name, version)
+        :type key: tuple
+        :rtype: bool
+        """
+        name, version = key
+        return version in self._factories.get(name, {})
+
+    def evict(self, name=None, version=None):
+        """ Forget the compiled schemas: they will be compiled again when requested
+
+        :param name: Schema name, or `None` for all schemas
+        :type name: str|None
+        :param version: Schema version, or `None` for all versions
+        """
+        with self._lock:
+            self._generation += 1
+            for key in list(self._schemas):
+                if (name is None or key[0] == name) and (version is None or key[1] == version):
+                    schema, size = self._schemas.pop(key)
+                    self._memory -= size
+
+    def _shrink(self):
+        """ Evict the least recently used schemas that don't fit into the budget """
+        while len(self._schemas) > 1 and (
+                (self.max_schemas is not None and len(self._schemas) > self.max_schemas) or
+                (self.max_memory is not None and self._memory > self.max_memory)):
+            key, (schema, size) = self._schemas.popitem(last=False)
+            self._memory -= size
+            self._stats['evictions'] += 1
+
+    @property
+    def stats(self):
+        """ Registry statistics:
+
+        * `hits`: requests for compiled schemas
+        * `misses`: requests that had to compile a schema
+        * `compiles`: compiled schemas
+        * `compile_time`: the total time spent compiling, in seconds
+        * `evictions`: schemas evicted to fit into the budget
+        * `schemas`: compiled schemas kept
+        * `memory`: the estimated memory of the compiled schemas kept, in bytes. Only estimated with `max_memory`.
+
+        :rtype: dict
+        """
+        with self._lock:
+            return dict(self._stats, schemas=len(self._schemas), memory=self._memory)
+
+
+def estimate_size(schema):
+    """ Estimate the memory a compiled schema uses, in bytes
+
+    Sums up the sizes of the compiled sub-schemas, their attributes, their validators, and the values
+    the validators keep in closures. Objects shared with other schemas, like types and modules, are counted as well:
+    that's an estimate to compare schemas to each other.
+
+    :type schema: Schema
+    :rtype: int
+    """
+    seen = set()
+
+    def sizeof(o):
+        if id(o) in seen:
+            return 0
+        seen.add(id(o))
+        return sys.getsizeof(o)
+
+    size = 0
+    for root in [schema.compiled] + list(schema.refs.values()):
+        for node in root.walk():
+            size += sizeof(node) + sizeof(node.__dict__)
+            size += sum(sizeof(v) for v in node.__dict__.values())
+            for cell in getattr(node.compiled, '__closure__', None) or ():
+                try:
+                    size += sizeof(cell) + sizeof(cell.cell_contents)
+                except ValueError:  # empty cell
+                    pass
+    return size
+
+
+__all__ = ('SchemaRegistry',)
@@ -0,0 +1,498 @@
+""" Sample generator: valid and invalid values for a compiled schema """
+
+import six
+import random
+import collections
+from copy import deepcopy
+from datetime import datetime, date, time, timedelta
+
+try:
+    import re._parser as sre_parse  # Python 3.11+
+except ImportError:
+    import sre_parse
+
+from .compiler import CompiledSchema
+from .errors import SchemaError, Invalid
+from .util import const
+from .. import markers
+from ..helpers import Object
+from ..validators import (Any, All, Maybe, Neither, In, Map, Range, Clamp, Length, Default, Match, MatchAny, Email,
+                          Url, DateTime, Date, Time, Coerce, Type, Boolean, Truthy, Falsy)
+from ..validators.dates import FixedOffset
+
+
+#: A generated value. `path` is the path to the error within an invalid value, and `None` for a valid one.
+Sample = collections.namedtuple('Sample', ('value', 'path'))
+
+
+class Unsupported(Exception):
+    """ The generator does not know how to make a value for a sub-schema """
+
+
+class SampleGenerator(object):
+    """ Sample generator: makes valid values for a compiled schema, and invalid ones with known error paths.
+
+    See [`Schema.sampler()`](#generating-samples).
+
+    :param schema: The schema to generate the values for
+    :type schema: Schema
+    :param seed: Random seed: the same seed makes the same values
+    :param providers: Values for the sub-schemas the generator does not know: { callable|type: provider(random) }.
+        The key is the validator itself, or its class.
+    :type providers: dict|None
+    :param max_items: The maximum number of items in the generated lists
+    :type max_items: int
+    :param max_depth: Nesting depth after which optional keys are omitted and lists are empty: for recursive schemas
+    :type max_depth: int
+    :param attempts: The number of attempts to make a value that passes the validation
+    :type attempts: int
+    """
+
+    #: Values that make an invalid value: one of them is rejected by most of the schemas
+    wrong_values = (None, u'<invalid>', -1, 1.5, True, [], {})
+
+    def __init__(self, schema, seed=None, providers=None, max_items=3, max_depth=5, attempts=20):
+        self.schema = schema
+        self.random = random.Random(seed)
+        self.providers = providers or {}
+        self.max_items = max_items
+        self.max_depth = max_depth
+        self.attempts = attempts
+
+        #: Places to put an error to, collected while a value is generated: [(path, node, container, key)]
+        self._sites = None
+
+    def __repr__(self):
+        return '{cls}({0.schema!r})'.format(self, cls=type(self).__name__)
+
+    #region API
+
+    def valid(self):
+        """ Make a valid value
+
+        :return: A value that the schema accepts
+        :raises SchemaError: Can't make a valid value: provide the values for the custom validators with `providers`
+        """
+        return self._valid()[0]
+
+    def invalid(self):
+        """ Make an invalid value: a valid one with a single error in it
+
+        The error is put to a random place: a wrong value, or a missing required key.
+
+        :return: The value, and the path to the error the schema reports for it
+        :rtype: Sample
+        :raises SchemaError: Can't make an invalid value
+        """
+        for attempt in range(self.attempts):
+            value, sites = self._valid()
+            if not sites:
+                break
+            path, node, container, key = self.random.choice(sites)
+
+            # Missing required key
+            if node is None:
+                del container[key]
+            # Wrong value
+            else:
+                wrong = self._wrong(node)
+                if wrong is None:
+                    continue
+                if container is None:
+                    value = wrong[0]
+                else:
+                    container[key] = wrong[0]
+
+            # The schema must report the error at the path
+            error = self._check(value)
+            if error is not None and path in [e.path for e in getattr(error, 'errors', [error])]:
+                return Sample(value, path)
+        raise SchemaError(_(u'Could not make an invalid value for {name}').format(name=self.schema.name))
+
+    def samples(self, count, invalid=0.0):
+        """ Make a number of values
+
+        :param count: The number of values
+        :type count: int
+        :param invalid: The share of invalid values: 0.0 .. 1.0
+        :type invalid: float
+        :rtype: collections.Iterator[Sample]
+        """
+        for i in range(count):
+            if self.random.random() < invalid:
+                yield self.invalid()
+            else:
+                yield Sample(self.valid(), None)
+
+    #endregion
+
+    def _valid(self):
+        """ Make a valid value, and the places to put an error to
+
+        :rtype: (*, list)
+        """
+        for attempt in range(self.attempts):
+            self._sites = [([], self.schema.compiled, None, None)]
+            try:
+                value = self.generate(self.schema.compiled, [], 0)
+            except Unsupported as e:
+                raise SchemaError(_(u'Cannot generate values for {name}: give a provider for it').format(name=e))
+            if self._check(value) is None:
+                return value, self._sites
+        raise SchemaError(_(u'Could not make a valid value for {name}').format(name=self.schema.name))
+
+    def _check(self, value, node=None):
+        """ Validate a copy of the value
+
+        :return: The error, or `None` when the value is valid
+        :rtype: Invalid|None
+        """
+        try:
+            (self.schema if node is None else node)(deepcopy(value))
+        except Invalid as e:
+            return e
+        return None
+
+    def _wrong(self, node):
+        """ Make a value the sub-schema rejects
+
+        :return: (value,), or `None`
+        :rtype: tuple|None
+        """
+        candidates = list(self.wrong_values)
+        self.random.shuffle(candidates)
+        for candidate in candidates:
+            if self._check(candidate, node) is not None:
+                return (candidate,)
+        return None
+
+    #region Generators
+
+    def generate(self, node, path, depth):
+        """ Make a value for a compiled sub-schema
+
+        :param node: Compiled sub-schema
+        :type node: CompiledSchema
+        :param path: Path to the value, or `None` for the values an error can't be put into
+        :type path: list|None
+        :param depth: Nesting depth
+        :type depth: int
+        :raises Unsupported: Don't know how
+        """
+        # Providers: by the schema itself, or by its type
+        for key in (node.schema, type(node.schema)):
+            try:
+                if key in self.providers:
+                    return self.providers[key](self.random)
+            except TypeError:  # unhashable
+                pass
+
+        # Wrappers
+        if isinstance(node.schema, CompiledSchema):
+            return self.generate(node.schema, path, depth)
+        if node.compiled_type == const.COMPILED_TYPE.REF:
+            return self.generate(node.target, path, depth)
+
+        generator = {
+            const.COMPILED_TYPE.LITERAL: lambda: node.schema,
+            const.COMPILED_TYPE.TYPE: lambda: self.generate_type(node.schema, node),
+            const.COMPILED_TYPE.ENUM: lambda: self.random.choice(list(node.schema)).value,
+            const.COMPILED_TYPE.MARKER: lambda: self.generate(node.compiled.key_schema, None, depth),
+            const.COMPILED_TYPE.ITERABLE: lambda: self.generate_iterable(node, path, depth),
+            const.COMPILED_TYPE.MAPPING: lambda: self.generate_mapping(node, path, depth),
+            const.COMPILED_TYPE.CALLABLE: lambda: self.generate_callable(node, path, depth),
+        }[node.compiled_type]
+        return generator()
+
+    def generate_type(self, schema, node):
+        """ Make a value of a type """
+        rnd = self.random
+        if schema in six.integer_types:
+            return schema(rnd.randint(0, 1000))
+        if schema is float:
+            return round(rnd.uniform(0, 1000), 2)
+        if schema is bool:
+            return rnd.choice([True, False])
+        if schema is six.text_type or (six.PY2 and schema is basestring):
+            return self.word()
+        if schema is six.binary_type:
+            return self.word().encode('ascii')
+        if schema is type(None):
+            return None
+        if schema is complex:
+            return complex(rnd.randint(0, 10), rnd.randint(0, 10))
+        if schema is datetime:
+            return self.datetime()
+        if schema is date:
+            return self.datetime().date()
+        if schema is time:
+            return self.datetime().time()
+        if schema in (list, dict, tuple, set):
+            return schema()
+        raise Unsupported(node.name)
+
+    def generate_iterable(self, node, path, depth):
+        """ Make a list of random members """
+        schema_type = type(node.schema)
+        count = self.random.randint(0, self.max_items) if depth < self.max_depth else 0
+        items = [self.generate(self.random.choice(node.iterable_schemas),
+                               path + [i] if path is not None and schema_type is list else None,
+                               depth + 1)
+                 for i in range(count)]
+        if schema_type is not list:
+            return schema_type(items)
+        if path is not None:
+            self._sites.extend((path + [i], self._member(node, items[i]), items, i) for i in range(count))
+        return items
+
+    def _member(self, node, item):
+        """ The member of an iterable that accepts the item: to put an error into """
+        for member in node.iterable_schemas:
+            if self._check(item, member) is None:
+                return member
+        return node.iterable_schemas[0]
+
+    def generate_mapping(self, node, path, depth):
+        """ Make a mapping: required keys, some of the optional keys """
+        d = {}
+        for key_schema, value_schema, is_literal, is_identity in node.mapping_schemas:
+            marker = key_schema.compiled
+            if type(marker) is markers.Required:
+                required = True
+            elif type(marker) is markers.Optional:
+                required = False
+                if depth >= self.max_depth or self.random.random() < 0.5:
+                    continue
+            else:
+                continue  # Remove, Reject, Allow, Extra, Entire: nothing to generate
+
+            # Key: a literal, or a value of the key schema that no other key takes
+            for attempt in range(self.attempts):
+                key = marker.key if is_literal else self.generate(marker.key_schema, None, depth)
+                if key not in d:
+                    break
+            else:
+                continue
+
+            sub_path = path + [key] if path is not None else None
+            d[key] = self.generate(value_schema, sub_path, depth + 1)
+            if sub_path is not None:
+                self._sites.append((sub_path, value_schema, d, key))
+                if required and is_literal:
+                    self._sites.append((sub_path, None, d, key))  # missing key
+        return d
+
+    def generate_callable(self, node, path, depth):
+        """ Make a value for a validator """
+        validator = node.schema
+        subs = node.sub_schemas
+        rnd = self.random
+
+        # Predicates
+        if isinstance(validator, Any):
+            if validator.match_any is not None:
+                return self.regex(rnd.choice(validator.match_any.patterns))
+            return self.generate(rnd.choice(subs), None, depth)
+        if isinstance(validator, Maybe):
+            return validator.none if rnd.random() < 0.25 else self.generate(subs[0], path, depth)
+        if isinstance(validator, All):
+            # The last validators are usually the most specific: Range, Length, ...
+            for sub in list(reversed(subs)) * 3:
+                try:
+                    value = self.generate(sub, None, depth)
+                except Unsupported:
+                    continue
+                if self._check(value, node) is None:
+                    return value
+            raise Unsupported(node.name)
+        if isinstance(validator, Neither):
+            return self.probe(node)
+
+        # Values
+        if isinstance(validator, In):
+            container = validator.container
+            if isinstance(container, Map):
+                return rnd.choice(self.map_values(container))
+            if isinstance(container, (list, tuple, set, frozenset, dict)):
+                return rnd.choice(sorted(container, key=repr))
+            raise Unsupported(node.name)
+        if isinstance(validator, Map):
+            return rnd.choice(self.map_values(validator))
+        if isinstance(validator, (Range, Clamp)):
+            return self.number(validator.min, validator.max)
+        if isinstance(validator, Length):
+            lo = validator.min or 0
+            return self.word(rnd.randint(lo, validator.max if validator.max is not None else lo + 10))
+        if isinstance(validator, Default):
+            return validator.default
+
+        # Strings
+        if isinstance(validator, Email):
+            return u'{}@example.com'.format(self.word())
+        if isinstance(validator, Url):
+            return u'{}://example.com/{}'.format(validator.protocols[0], self.word())
+        if isinstance(validator, Match):
+            return self.regex(validator.rex.pattern)
+        if isinstance(validator, MatchAny):
+            return self.regex(rnd.choice(validator.patterns))
+
+        # Dates
+        if isinstance(validator, DateTime):
+            fmt = validator.formats[0]
+            value = self.datetime(aware='%z' in fmt)
+            value = value.date() if isinstance(validator, Date) else value.timetz() if isinstance(validator, Time) else value
+            return value.strftime(fmt)
+
+        # Types
+        if isinstance(validator, Coerce) and isinstance(validator.constructor, type):
+            return self.generate_type(validator.constructor, node)
+        if isinstance(validator, Type):
+            return self.generate_type(validator.types[0], node)
+        if isinstance(validator, (Boolean, Truthy)):
+            return True
+        if isinstance(validator, Falsy):
+            return False
+
+        # Objects
+        if isinstance(validator, Object):
+            return self.object(validator, self.generate(subs[0], None, depth))
+
+        # Wrappers: Msg(), Record(), ...
+        if len(subs) == 1:
+            return self.generate(subs[0], path, depth)
+
+        # Anything else: try some values
+        return self.probe(node)
+
+    #endregion
+
+    #region Values
+
+    def word(self, length=None):
+        """ Make a random word """
+        length = self.random.randint(3, 10) if length is None else length
+        return u''.join(self.random.choice(u'abcdefghijklmnopqrstuvwxyz') for i in range(length))
+
+    def number(self, lo, hi):
+        """ Make a number within the bounds: integers for integer bounds """
+        lo = lo if lo is not None else (hi - 1000 if hi is not None else 0)
+        hi = hi if hi is not None else lo + 1000
+        if isinstance(lo, six.integer_types) and isinstance(hi, six.integer_types):
+            return self.random.randint(lo, hi)
+        return self.random.uniform(lo, hi)
+
+    def datetime(self, aware=False):
+        """ Make a random date and time, to the second """
+        value = datetime(2000, 1, 1) + timedelta(seconds=self.random.randint(0, 30 * 365 * 24 * 3600))
+        return value.replace(tzinfo=FixedOffset(timedelta(0))) if aware else value
+
+    def map_values(self, m):
+        """ The values a `Map()` accepts """
+        names = [e.name for e in m.enum] if m.enum is not None else list(m.mapping)
+        values = [e.value for e in m.enum] if m.enum is not None else list(m.mapping.values())
+        return sorted(names if m.mode & Map.KEY else values, key=repr)
+
+    def object(self, validator, fields):
+        """ Make an object of the `Object()` class """
+        cls = validator.cls if not isinstance(validator.cls, tuple) else validator.cls[0]
+        if cls is object:
+            cls = _Object
+        if issubclass(cls, tuple) and hasattr(cls, '_fields'):
+            return cls(**fields)
+        obj = cls.__new__(cls)
+        for name, value in fields.items():
+            setattr(obj, name, value)
+        return obj
+
+    def probe(self, node):
+        """ Try some values until the sub-schema accepts one """
+        candidates = [self.word(), self.random.randint(0, 1000), round(self.random.uniform(0, 1000), 2),
+                      True, False, None, self.datetime()]
+        for candidate in candidates:
+            if self._check(candidate, node) is None:
+                return candidate
+        raise Unsupported(node.name)
+
+    def regex(self, pattern):
+        """ Make a string that matches a regular expression
+
+        Supports literals, character classes, repeats, groups, and alternatives.
+
+        :raises Unsupported: The pattern uses something else
+        """
+        try:
+            return u''.join(self._regex(sre_parse.parse(pattern), {}))
+        except (Unsupported, ValueError, TypeError):
+            raise Unsupported(u'/{}/'.format(pattern))
+
+    def _regex(self, parsed, groups):
+        rnd = self.random
+        out = []
+        for op, arg in parsed:
+            op = str(op).upper()
+            if op == 'LITERAL':
+                out.append(six.unichr(arg))
+            elif op == 'NOT_LITERAL':
+                out.append(u'x' if six.unichr(arg) != u'x' else u'y')
+            elif op == 'ANY':
+                out.append(rnd.choice(u'abcdefghijklmnopqrstuvwxyz'))
+            elif op == 'IN':
+                out.append(self._regex_class(arg))
+            elif op in ('MAX_REPEAT', 'MIN_REPEAT'):
+                lo, hi, sub = arg
+                for i in range(rnd.randint(lo, min(hi, lo + 5))):
+                    out.extend(self._regex(sub, groups))
+            elif op == 'SUBPATTERN':
+                group, sub = arg[0], arg[-1]
+                text = u''.join(self._regex(sub, groups))
+                groups[group] = text
+                out.append(text)
+            elif op == 'BRANCH':
+                out.extend(self._regex(rnd.choice(arg[1]), groups))
+            elif op == 'GROUPREF':
+                out.append(groups[arg])
+            elif op == 'CATEGORY':
+                out.append(self._regex_class([(op, arg)]))
+            elif op == 'AT':
+                pass  # anchors
+            else:
+                raise Unsupported(op)
+        return out
+
+    def _regex_class(self, items):
+        """ Pick a character of a character class """
+        chars = u''
+        negate = False
+        for op, arg in items:
+            op = str(op).upper()
+            if op == 'NEGATE':
+                negate = True
+            elif op == 'LITERAL':
+                chars += six.unichr(arg)
+            elif op == 'RANGE':
+                lo, hi = arg
+                chars += u''.join(six.unichr(c) for c in range(lo, min(hi, lo + 100) + 1))
+            elif op == 'CATEGORY':
+                chars += {
+                    'CATEGORY_DIGIT': u'0123456789',
+                    'CATEGORY_WORD': u'abcdefghijklmnopqrstuvwxyz0123456789_',
+                    'CATEGORY_SPACE': u' ',
+                }.get(str(arg).upper(), u'')
+                if str(arg).upper().startswith('CATEGORY_NOT_'):
+                    raise Unsupported(arg)
+            else:
+                raise Unsupported(op)
+        if negate:
+            chars = u''.join(c for c in u'abcdefghijklmnopqrstuvwxyz0123456789' if c not in chars)
+        if not chars:
+            raise Unsupported(u'empty character class')
+        return self.random.choice(chars)
+
+    #endregion
+
+
+class _Object(object):
+    """ Objects for `Object()` with no class """
+
+
+__all__ = ('SampleGenerator', 'Sample')
@@ -2,7 +2,8 @@
 
 import six
 import collections
-from datetime import date, time, datetime
+
+from ..i18n import Message
 
 try:
     from enum import EnumMeta, Enum
@@ -36,26 +37,40 @@ class Undefined(object):
         return '<Undefined>'
 
 
-__type_names = {
-    None:             _(u'None'),
-    type(None):       _(u'None'),
-    bool:       _(u'Boolean'),
-    float:      _(u'Fractional number'),
-    complex:    _(u'Complex number'),
-    six.text_type:    _(u'String'),
-    six.binary_type:  _(u'Binary String'),
-    tuple:      _(u'Tuple'),
-    list:       _(u'List'),
-    set:        _(u'Set'),
-    frozenset:  _(u'Frozen Set'),
-    dict:       _(u'Dictionary'),
-    date:       _(u'Date'),
-    time:       _(u'Time'),
-    datetime:   _(u'DateTime'),
-}
-if EnumMeta:
-    __type_names[EnumMeta] = u'Enum'
-    __type_names[Enum] = u'Enum'
+#: Human-friendly type names: see `register_type_name()`.
+#: The built-in ones are added on first use: `import good` does not load `datetime`.
+__type_names = {}
+
+
+def _type_names():
+    """ Get the type names, with the built-in ones added on first use
+
+    :rtype: dict
+    """
+    if None not in __type_names:
+        from datetime import date, time, datetime
+        builtin = [
+            (None, _(u'None')),
+            (type(None), _(u'None')),
+            (bool, _(u'Boolean')),
+            (float, _(u'Fractional number')),
+            (complex, _(u'Complex number')),
+            (six.text_type, _(u'String')),
+            (six.binary_type, _(u'Binary String')),
+            (tuple, _(u'Tuple')),
+            (list, _(u'List')),
+            (set, _(u'Set')),
+            (frozenset, _(u'Frozen Set')),
+            (dict, _(u'Dictionary')),
+            (date, _(u'Date')),
+            (time, _(u'Time')),
+            (datetime, _(u'DateTime')),
+        ]
+        if EnumMeta:
+            builtin += [(EnumMeta, u'Enum'), (Enum, u'Enum')]
+        for t, name in builtin:
+            __type_names.setdefault(t, name)  # registered names win
+    return __type_names
 
 
 def register_type_name(t, name):
@@ -71,6 +86,16 @@ def register_type_name(t, name):
     __type_names[t] = name
 
 
+def to_text(v):
+    """ Convert a value to text: translatable messages are kept, and translated when rendered
+
+    :param v: Value
+    :type v: *
+    :rtype: unicode
+    """
+    return v if isinstance(v, Message) else six.text_type(v)
+
+
 def get_literal_name(v):
     """ Get a human-friendly name for the given literal.
 
@@ -78,7 +103,22 @@ def get_literal_name(v):
     :type v: *
     :rtype: unicode
     """
-    return six.text_type(v)
+    return to_text(v)
+
+
+def get_provided_name(e, v):
+    """ Get a human-friendly name for the provided value, if any of the errors needs it.
+
+    Used with `Invalid.enrich(provided=...)`, which only sets `provided` on the errors that don't have it.
+    Nested errors typically do: stringifying every enclosing container as well would be quadratic,
+    and would exceed the recursion limit with deeply nested values.
+
+    :type e: Invalid
+    :param v: Value
+    :type v: *
+    :rtype: unicode|None
+    """
+    return get_literal_name(v) if any(x.provided is None for x in e) else None
 
 
 def get_type_name(t):
@@ -89,7 +129,7 @@ def get_type_name(t):
     """
     # Lookup in the mapping
     try:
-        return __type_names[t]
+        return _type_names()[t]
     except KeyError:
         # Specific types
         if issubclass(t, six.integer_types):
@@ -107,7 +147,7 @@ def get_callable_name(c):
     :rtype: unicode
     """
     if hasattr(c, 'name'):
-        return six.text_type(c.name)
+        return to_text(c.name)
     elif hasattr(c, '__name__'):
         return six.text_type(c.__name__) + u'()'
     else:
@@ -134,6 +174,25 @@ def get_primitive_name(schema):
         return six.text_type(repr(schema))
 
 
+class cached_property(object):
+    """ A property that is computed on first access, and stored on the instance.
+
+    It's a non-data descriptor: once the value is in the instance `__dict__`, the descriptor is not called anymore.
+    Remove the value from `__dict__` to have it computed again.
+    """
+
+    def __init__(self, func):
+        self.func = func
+        self.__name__ = func.__name__
+        self.__doc__ = func.__doc__
+
+    def __get__(self, instance, owner):
+        if instance is None:
+            return self
+        value = instance.__dict__[self.__name__] = self.func(instance)
+        return value
+
+
 class const:
     """ Misc constants """
 
@@ -159,6 +218,7 @@ class const:
         ITERABLE = 'iterable'
         MAPPING = 'mapping'
         MARKER = 'marker'
+        REF = 'ref'
 
     #: Priorities for compiled types
     #: This is used for mappings to determine the sequence with which the keys are processed
@@ -173,6 +233,7 @@ class const:
         COMPILED_TYPE.ITERABLE:   0,
         COMPILED_TYPE.MAPPING:    0,
         COMPILED_TYPE.MARKER:   None,  # Markers have their own priorities
+        COMPILED_TYPE.REF:        0,
     }
 
 
@@ -0,0 +1,136 @@
+""" Pre-fork warmup: fill the lazy state of compiled schemas before forking workers """
+
+import gc
+
+from . import Schema, markers
+from .compiler import CompiledSchema
+from .registry import SchemaRegistry
+from .util import const, get_type_name
+from .. import i18n
+from ..validators.base import ValidatorBase
+
+
+def warmup(schemas, locales=(), freeze=False, engines=(), versions=None):
+    """ Fill the lazy state of compiled schemas: call it in the master of a pre-fork server, before forking workers.
+
+    Forked workers share the memory pages of the master until they write to them.
+    The state that is filled on first use is written by every worker into its own copy of the page:
+
+    * `supports_undefined` of the values of `Required` keys, tested when a key is missing
+    * [`Object()`](#object) attribute access plans of the required classes
+    * Schemas of a [`SchemaRegistry`](#schemaregistry), compiled on first use: the latest version of every name,
+      or the `versions` requested. Schemas that don't fit into the registry budget are not compiled.
+    * The engines of [`Schema.validate_async()`](#validating-asynchronously)
+      and [`Schema.validate_iterative()`](#validating-iteratively), compiled on first use: only the `engines` requested
+    * Translations: the catalogs of the environment locale, and of `locales`
+    * Human-friendly type names
+
+    Python itself writes to every object it touches: reference counts, and the garbage collector's bookkeeping.
+    With `freeze=True`, `gc.freeze()` (Python 3.7+) moves all objects to a permanent generation
+    that the garbage collector ignores. Call `gc.enable()` in workers if you disable it in the master.
+
+    ```python
+    from good import Schema, warmup
+
+    schemas = [Schema({'id': int, 'name': str}), ...]
+    warmup(schemas, locales=['de', 'fr'], engines=['iterative'], freeze=True)
+
+    for i in range(workers):
+        if os.fork() == 0:
+            serve()
+    ```
+
+    :param schemas: Schemas, and schema registries
+    :type schemas: collections.Iterable[Schema|CompiledSchema|SchemaRegistry]
+    :param locales: Locales to load the catalogs for, besides the environment locale
+    :type locales: collections.Iterable[str]
+    :param freeze: Collect the garbage, and freeze all objects: `gc.freeze()`. Ignored before Python 3.7.
+    :type freeze: bool
+    :param engines: Validation engines to compile for every `Schema`: `'async'`, `'iterative'`
+    :type engines: collections.Iterable[str]
+    :param versions: Registry schemas to compile: { name: [version, ...] }. Default: the latest version of every name.
+    :type versions: dict|None
+    :return: The number of compiled schemas visited
+    :rtype: int
+    """
+    engines = set(engines)
+    assert engines <= {'async', 'iterative'}, 'Unknown engines: {}'.format(', '.join(engines - {'async', 'iterative'}))
+
+    # Roots: registries compile their schemas
+    roots = []
+    for schema in schemas:
+        for s in (_warmup_registry(schema, versions) if isinstance(schema, SchemaRegistry) else [schema]):
+            if isinstance(s, Schema):
+                roots.append(s.compiled)
+                roots.extend(s.refs.values())
+                _warmup_engines(s, engines)
+            elif isinstance(s, CompiledSchema):
+                roots.append(s)
+
+    # Nodes
+    seen = set()
+    for root in roots:
+        for node in root.walk():
+            if id(node) in seen:
+                continue
+            seen.add(id(node))
+            _warmup_node(node)
+
+    # Globals
+    get_type_name(bool)  # fills the type names
+    for locale in (None,) + tuple(locales):
+        i18n.translation(locale)
+
+    # Freeze
+    if freeze and hasattr(gc, 'freeze'):
+        gc.collect()
+        gc.freeze()
+    return len(seen)
+
+
+def _warmup_registry(registry, versions=None):
+    """ Compile the schemas of a registry, within its budget
+
+    :type registry: SchemaRegistry
+    :param versions: { name: [version, ...] }, or `None` for the latest version of every name
+    :type versions: dict|None
+    :return: The compiled schemas
+    :rtype: list[Schema]
+    """
+    keys = [(name, version)
+            for name in (registry.names() if versions is None else sorted(versions))
+            for version in ([None] if versions is None else versions[name])]
+
+    schemas = []
+    for name, version in keys:
+        evictions = registry.stats['evictions']
+        schemas.append(registry.get(name, version))
+        if registry.stats['evictions'] != evictions:
+            break  # the budget is full: more schemas would only evict the warm ones
+    return schemas
+
+
+def _warmup_engines(schema, engines):
+    """ Compile the validation engines of a `Schema`, in all of their modes """
+    if 'async' in engines:
+        from . import aio
+        for chunked in (False, True):
+            aio.get_compiler(schema, chunked).compile(schema.compiled)
+    if 'iterative' in engines:
+        from . import iterative
+        for limited in (False, True):
+            iterative.get_compiler(schema, limited).call(schema.compiled)
+
+
+def _warmup_node(node):
+    """ Fill the lazy state of a compiled schema """
+    if node.compiled_type == const.COMPILED_TYPE.MAPPING:
+        for key_schema, value_schema, is_literal, is_identity in node.mapping_schemas:
+            marker = key_schema.compiled
+            if isinstance(marker, markers.Required) and marker.value_schema is not None:
+                marker.value_schema.supports_undefined
+    elif node.compiled_type == const.COMPILED_TYPE.CALLABLE and isinstance(node.schema, ValidatorBase):
+        node.schema.warmup()
+
+
+__all__ = ('warmup',)
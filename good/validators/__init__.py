@@ -1,8 +1,50 @@
-from .predicates import *
-from .types import *
-from .values import *
-from .boolean import *
-from .numbers import *
-from .strings import *
-from .dates import *
-from .files import *
+""" Validators.
+
+On Python 3.7+, validator modules are imported on first use (PEP 562): `import good` does not pay
+for `re`, `datetime`, `mmap`, ... until a validator that needs them is used.
+"""
+
+import sys
+
+#: Validator modules, and the validators they export. Every module's `__all__` must be listed here.
+MODULES = (
+    ('predicates', ('Maybe', 'Any', 'All', 'Neither', 'Inclusive', 'Exclusive')),
+    ('types', ('Type', 'Coerce')),
+    ('values', ('In', 'Length', 'Default', 'Fallback', 'Map', 'FileSet', 'BloomFilter')),
+    ('boolean', ('Check', 'BatchCheck', 'Truthy', 'Falsy', 'Boolean')),
+    ('numbers', ('Range', 'Clamp')),
+    ('strings', ('Lower', 'Upper', 'Capitalize', 'Title', 'Match', 'MatchAny', 'Replace', 'Url', 'Email')),
+    ('dates', ('DateTime', 'Date', 'Time')),
+    ('files', ('IsFile', 'IsDir', 'PathExists')),
+)
+
+#: { validator name: module name }
+_lazy = dict((name, module) for module, names in MODULES for name in names)
+
+__all__ = tuple(name for module, names in MODULES for name in names)
+
+
+if sys.version_info >= (3, 7):
+    from importlib import import_module
+
+    def __getattr__(name):
+        """ Import the validator's module on first access """
+        try:
+            module = _lazy[name]
+        except KeyError:
+            raise AttributeError('module {!r} has no attribute {!r}'.format(__name__, name))
+        value = getattr(import_module('.' + module, __name__), name)
+        globals()[name] = value  # next time, no __getattr__()
+        return value
+
+    def __dir__():
+        return sorted(set(globals()) | set(__all__))
+else:
+    from .predicates import *
+    from .types import *
+    from .values import *
+    from .boolean import *
+    from .numbers import *
+    from .strings import *
+    from .dates import *
+    from .files import *
@@ -17,6 +17,12 @@ class ValidatorBase(object):
         """
         raise NotImplementedError
 
+    def warmup(self):
+        """ Fill the state that is otherwise filled on first use: caches, plans.
+
+        Called by [`warmup()`](#warmup) before forking workers. Override it in validators that have such state.
+        """
+
     def __repr__(self):
         return self.name
 
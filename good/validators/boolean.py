@@ -3,6 +3,7 @@ import six
 from .base import ValidatorBase
 from .. import Invalid
 from ..schema.util import get_callable_name, get_primitive_name, get_type_name
+from ..schema.batch import BatchScope, unhashable
 
 
 class Check(ValidatorBase):
@@ -46,6 +47,84 @@ class Check(ValidatorBase):
             raise Invalid(self.message, self.expected)
 
 
+class BatchCheck(ValidatorBase):
+    """ Check values with a function that tests many of them at once, e.g. a database lookup.
+
+    Unlike [`Check`](#check), this validator does not check values one by one:
+    during a single [`Schema`](#schema) call, it collects every value it sees across the whole document,
+    calls the loader function once with the set of distinct values, and then reports errors for the invalid ones.
+
+    The loader function receives a `set` of values, and returns a container of the valid ones:
+
+    ```python
+    from good import Schema, BatchCheck
+
+    def existing_users(ids):
+        return set(db.execute('SELECT id FROM users WHERE id IN ({})'.format(
+                              ','.join('?' * len(ids))), tuple(ids)).fetchall())
+
+    schema = Schema({
+        'author': BatchCheck(existing_users, u'Unknown user'),
+        'reviewers': [BatchCheck(existing_users, u'Unknown user')],
+    })
+
+    schema({ 'author': 1, 'reviewers': [2, 3] })  # a single query
+    #-> Invalid: Unknown user: expected existing_users(), got 3 @ ['reviewers', 1]
+    ```
+
+    Note that the same validator instance must be used to get the values into a single batch:
+    every `BatchCheck` instance calls its loader separately.
+
+    When any value is invalid, the input is validated for the second time in order to report errors with correct paths,
+    hence validators that have side-effects might be called twice.
+    When used outside of a `Schema`, or with [`Schema.validate_async()`](#validating-asynchronously),
+    the loader is called for every value.
+
+    Values must be hashable: other values are reported as invalid.
+
+    :param loader: Function that receives a `set` of values and returns a container of the valid ones
+    :type loader: callable
+    :param message: Error message to report for invalid values
+    :type message: unicode
+    :param expected: Expected value string representation, or `None` to get it from the loader
+    :type expected: None|str|unicode
+    """
+
+    #: Tell Schema this validator needs a batch scope
+    batched = True
+
+    def __init__(self, loader, message, expected=None):
+        assert isinstance(message, six.text_type), 'BatchCheck() message must be a unicode string'
+        assert isinstance(expected, six.text_type) or expected is None, 'BatchCheck() expected must be a unicode string'
+
+        self.load = loader
+        self.name = get_callable_name(loader)
+        self.message = message
+        self.expected = expected
+
+    def __call__(self, v):
+        scope = BatchScope.current()
+
+        # No scope: check immediately
+        if scope is None:
+            try:
+                values = {v}
+            except TypeError:
+                raise unhashable(v)
+            valid = v in self.load(values)
+        # Collecting: report later
+        elif scope.collecting:
+            scope.collect(self, v)
+            return v
+        # Reporting
+        else:
+            valid = scope.check(self, v)
+
+        if not valid:
+            raise Invalid(self.message, self.expected)
+        return v
+
+
 class Truthy(ValidatorBase):
     """ Assert that the value is truthy, in the Python sense.
 
@@ -155,4 +234,4 @@ class Boolean(ValidatorBase):
 
 
 
-__all__ = ('Check', 'Truthy', 'Falsy', 'Boolean')
+__all__ = ('Check', 'BatchCheck', 'Truthy', 'Falsy', 'Boolean')
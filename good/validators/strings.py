@@ -1,4 +1,5 @@
 import six
+import sys
 from functools import wraps
 import re
 
@@ -102,6 +103,187 @@ class Match(ValidatorBase):
             return v
 
 
+class MatchAny(ValidatorBase):
+    """ Validate the input string against a list of regular expressions: any of them should match.
+
+    This is a faster alternative to `Any(Match(p1), Match(p2), ...)`: the patterns are combined into
+    a single alternation regexp, so the input is tested with a single regexp call instead of a call per pattern
+    (and a caught exception per mismatch).
+
+    ```python
+    from good import Schema, MatchAny
+
+    schema = Schema(MatchAny([
+        r'^/api/v1/users/\d+$',
+        r'^/api/v1/orders/\d+$',
+        r'^/static/',
+    ], expected=u'Allowed path'))
+
+    schema('/static/app.js')  #-> '/static/app.js'
+    schema('/admin')
+    #-> Invalid: Wrong format: expected Allowed path, got /admin
+    ```
+
+    Patterns are tried in order, and the first one that matches wins, just like with [`Any`](#any).
+    To find out which pattern has matched, use `MatchAny.which(value)`:
+
+    ```python
+    matcher = MatchAny([r'^/api/', r'^/static/'])
+    matcher.which('/static/app.js')  #-> '^/static/'
+    matcher.which('/admin')  #-> None
+    ```
+
+    Patterns that can't be combined safely (those with capturing groups, or with non-default flags)
+    are still supported, but are tested individually.
+
+    Note that [`Any`](#any) uses `MatchAny` automatically when all of its schemas are [`Match`](#match) validators.
+
+    :param patterns: List of RegExp patterns to match with: strings, compiled patterns, or [`Match`](#match) validators
+    :type patterns: list[str|_SRE_Pattern|Match]
+    :param message: Error message override
+    :type message: unicode
+    :param expected: Textual representation of what's expected from the user
+    :type expected: unicode
+    :param any_errors: Report errors exactly like `Any(Match(p1), Match(p2), ...)` does:
+        `"Invalid value"` message, and the expected value listing the name of every pattern.
+
+        This overrides `message` and `expected`.
+    :type any_errors: bool
+    """
+
+    #: The maximum number of patterns combined into a single regexp.
+    #: Python 2 and Python < 3.5 only support 100 groups per regexp.
+    max_combined = 99 if sys.version_info < (3, 5) else 10000
+
+    def __init__(self, patterns, message=None, expected=None, any_errors=False):
+        self.patterns = []
+        self.any_errors = any_errors
+
+        # Compile each pattern
+        rexes, names = [], []
+        for pattern in patterns:
+            if isinstance(pattern, Match):
+                rexes.append(pattern.rex)
+                names.append(pattern.name)
+                self.patterns.append(pattern.rex.pattern)
+            else:
+                rexes.append(re.compile(pattern))  # accepts compiled patterns as well
+                names.append(_(u'(special format)'))
+                self.patterns.append(pattern)
+
+        # Combine patterns into chunks
+        self._chunks = self._combine(rexes)
+
+        # Name & Message
+        if any_errors:
+            self.name = _(u'Any({})').format(_(u'|').join(names))
+            self.message = _(u'Invalid value')
+        else:
+            self.name = expected or _(u'(special format)')
+            self.message = message or _(u'Wrong format')
+
+    @classmethod
+    def _combine(cls, rexes):
+        """ Combine compiled patterns into a list of chunks.
+
+        Consecutive patterns of the same kind are combined into a single alternation regexp: `(p1)|(p2)|...`,
+        where the number of the matched group tells which pattern has matched.
+        Patterns that have groups of their own, or use non-default flags, are kept as is.
+
+        :type rexes: list[_SRE_Pattern]
+        :return: List of chunks: (regexp, group-indexes, pattern-index).
+
+            For combined chunks, `group-indexes` maps a group number to a pattern index.
+            Otherwise, it's `None`, and `pattern-index` is used.
+        :rtype: list[tuple]
+        """
+        chunks = []
+        combined = []  # [(pattern-index, regexp)] waiting to be combined
+
+        def flush():
+            if len(combined) == 1:
+                i, rex = combined[0]
+                chunks.append((rex, None, i))
+            elif combined:
+                if isinstance(combined[0][1].pattern, six.text_type):
+                    sep, lp, rp = u'|', u'(', u')'
+                else:
+                    sep, lp, rp = b'|', b'(', b')'
+                pattern = sep.join(lp + rex.pattern + rp for i, rex in combined)
+                chunks.append((re.compile(pattern), (None,) + tuple(i for i, rex in combined), None))
+            del combined[:]
+
+        for i, rex in enumerate(rexes):
+            pattern_type = type(rex.pattern)
+            combinable = not rex.groups and rex.flags == re.compile(pattern_type()).flags
+
+            # Start a new chunk when the kind changes
+            if not combinable or \
+                    (combined and type(combined[0][1].pattern) is not pattern_type) or \
+                    len(combined) >= cls.max_combined:
+                flush()
+
+            if combinable:
+                combined.append((i, rex))
+            else:
+                chunks.append((rex, None, i))
+        flush()
+
+        return chunks
+
+    def _lookup(self, v):
+        """ Find the index of the first pattern that matches the value
+
+        :return: Pattern index, or `None` if nothing has matched
+        :rtype: int|None
+        :raises TypeError: The value is not a string
+        """
+        type_errors = 0
+        for rex, group_indexes, i in self._chunks:
+            try:
+                match = rex.match(v)
+            except TypeError:
+                # Wrong type for this pattern (e.g. bytes vs unicode): try other chunks
+                type_errors += 1
+                continue
+            if match:
+                return i if group_indexes is None else group_indexes[match.lastindex]
+
+        # Nothing has matched. Was it the wrong type?
+        if type_errors and type_errors == len(self._chunks):
+            raise TypeError(v)
+        return None
+
+    def which(self, v):
+        """ Get the pattern that matches the value.
+
+        :param v: The value to test
+        :return: The first matching pattern (as it was given), or `None` if nothing has matched
+        :rtype: str|_SRE_Pattern|None
+        """
+        try:
+            i = self._lookup(v)
+        except TypeError:
+            return None
+        return None if i is None else self.patterns[i]
+
+    def __call__(self, v):
+        try:
+            # Try to match
+            i = self._lookup(v)
+        except TypeError:
+            # Wrong type
+            if self.any_errors:
+                raise Invalid(self.message)
+            raise Invalid(_(u'Wrong value type'), u'String', get_type_name(type(v)))
+
+        # Matched?
+        if i is None:
+            raise Invalid(self.message)
+        else:
+            return v
+
+
 class Replace(Match):
     """ RegExp substitution.
 
@@ -255,4 +437,4 @@ class Email(Match):
         super(Email, self).__init__(self._rex, u'Invalid E-Mail', u'E-Mail')
 
 
-__all__ = ('Lower', 'Upper', 'Capitalize', 'Title', 'Match', 'Replace', 'Url', 'Email')
+__all__ = ('Lower', 'Upper', 'Capitalize', 'Title', 'Match', 'MatchAny', 'Replace', 'Url', 'Email')
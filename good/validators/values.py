@@ -1,3 +1,8 @@
+from __future__ import division
+import os
+import six
+import mmap
+import math
 import collections
 
 from .base import ValidatorBase
@@ -31,6 +36,11 @@ class In(ValidatorBase):
 
     The same example will work with [`Any`](#any), but slower :-)
 
+    Lists and tuples are converted to a `frozenset` (provided their values are hashable),
+    so the lookup does not depend on the number of allowed values.
+
+    For huge collections that do not fit comfortably into memory, see [`FileSet`](#fileset).
+
     :param container: Collection of allowed values.
 
         In addition to naive tuple/list/set/dict, this can be any object that supports `in` operation.
@@ -52,9 +62,21 @@ class In(ValidatorBase):
                 cs = get_primitive_name(self.container)
             self.name = _(u'In({container})').format(container=cs)
 
+        # Lists & tuples have O(n) lookups: use a hash set instead
+        if isinstance(self.container, (list, tuple)):
+            try:
+                self.container = frozenset(self.container)
+            except TypeError:
+                pass  # unhashable values: keep it as is
+
     def __call__(self, v):
         # Test
-        if v not in self.container:
+        try:
+            found = v in self.container
+        except TypeError:
+            # Unhashable value can't be in a hash set
+            found = False
+        if not found:
             raise Invalid(_(u'Unsupported value'))
 
         # Okay
@@ -396,4 +418,216 @@ class Map(ValidatorBase):
             raise Invalid(_(u'Unsupported value'))
 
 
-__all__ = ('In', 'Length', 'Default', 'Fallback', 'Map')
+class FileSet(object):
+    """ A huge set of strings, stored in a sorted file, to be used with [`In`](#in).
+
+    The file contains one value per line, sorted bytewise.
+    It's memory-mapped, and every lookup is a binary search over the file, so nothing is loaded into memory:
+    the pages are shared by all processes through the page cache.
+
+    ```python
+    from good import Schema, In, FileSet
+
+    FileSet.write('/var/lib/app/skus.txt', load_all_skus())  # once
+
+    schema = Schema(In(FileSet('/var/lib/app/skus.txt')))
+
+    schema(u'SKU-0001')  #-> u'SKU-0001'
+    schema(u'SKU-XXXX')
+    #-> Invalid: Unsupported value: expected In(FileSet(/var/lib/app/skus.txt)), got SKU-XXXX
+    ```
+
+    Unicode values are encoded with `encoding`, binary strings are used as is, and other values are never contained.
+
+    A binary search touches a couple dozen pages per lookup. When most of the lookups are misses,
+    enable the [`BloomFilter`](#bloomfilter) prefilter with `bloom=<error-rate>`:
+    it's built when the file is opened, and rejects most of the missing values without touching the file.
+    Note that it takes about 10 bits per value at `bloom=0.01`, in every process that builds it.
+
+    :param path: Path to the sorted file. See `FileSet.write()`.
+    :type path: str
+    :param encoding: Encoding for unicode values
+    :type encoding: str
+    :param bloom: Build a Bloom filter with the given false positive rate, e.g. `0.01`. `None` to disable.
+    :type bloom: float|None
+    """
+
+    def __init__(self, path, encoding='utf-8', bloom=None):
+        self.path = path
+        self.encoding = encoding
+        self._len = None
+
+        # Map the file
+        with open(path, 'rb') as f:
+            if os.fstat(f.fileno()).st_size:
+                self._data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            else:
+                self._data = b''  # empty files can't be mapped
+
+        # Bloom filter
+        self.bloom = None
+        if bloom:
+            self.bloom = BloomFilter(len(self), bloom, self.keys())
+
+    @classmethod
+    def write(cls, path, values, encoding='utf-8'):
+        """ Write a set of values into a file that `FileSet` can use.
+
+        Values are deduplicated and sorted in memory. For really huge sets, prepare the file with
+        `LC_ALL=C sort -u` instead.
+
+        :param path: Path to the file to write
+        :type path: str
+        :param values: The values: unicode or binary strings
+        :type values: collections.Iterable
+        :param encoding: Encoding for unicode values
+        :type encoding: str
+        """
+        keys = set()
+        for v in values:
+            key = v.encode(encoding) if isinstance(v, six.text_type) else v
+            if b'\n' in key:
+                raise ValueError('FileSet values can\'t contain newlines: {!r}'.format(v))
+            keys.add(key)
+
+        with open(path, 'wb') as f:
+            for key in sorted(keys):
+                f.write(key + b'\n')
+
+    def keys(self):
+        """ Iterate over the values in the file, as binary strings
+
+        :rtype: collections.Iterable[bytes]
+        """
+        with open(self.path, 'rb') as f:
+            for line in f:
+                yield line.rstrip(b'\n')
+
+    def close(self):
+        """ Unmap the file """
+        if isinstance(self._data, mmap.mmap):
+            self._data.close()
+        self._data = b''
+
+    def __len__(self):
+        if self._len is None:
+            data, size, chunk = self._data, len(self._data), 1 << 20
+            self._len = sum(data[i:i + chunk].count(b'\n') for i in range(0, size, chunk))
+            if size and data[size - 1:size] != b'\n':
+                self._len += 1  # no newline at the end
+        return self._len
+
+    def __contains__(self, v):
+        # Key
+        if isinstance(v, six.text_type):
+            key = v.encode(self.encoding)
+        elif isinstance(v, six.binary_type):
+            key = v
+        else:
+            return False
+
+        # Prefilter
+        if self.bloom is not None and key not in self.bloom:
+            return False
+
+        # Binary search.
+        # `lo` and `hi` always point to the beginning of a line
+        data = self._data
+        lo, hi = 0, len(data)
+        while lo < hi:
+            mid = (lo + hi) // 2
+
+            # The line that contains `mid`
+            start = data.rfind(b'\n', lo, mid) + 1 or lo
+            end = data.find(b'\n', start, hi)
+            if end < 0:
+                end = hi
+
+            line = data[start:end]
+            if line == key:
+                return True
+            elif line < key:
+                lo = end + 1
+            else:
+                hi = start
+        return False
+
+    def __repr__(self):
+        return 'FileSet({})'.format(self.path)
+
+
+class BloomFilter(object):
+    """ A Bloom filter: a compact probabilistic set.
+
+    It never gives false negatives, but may tell that a value is contained when it's actually not,
+    with the probability of `error_rate`.
+    Hence, it's not a replacement for a set, but a prefilter that rejects most of the missing values quickly:
+    see [`FileSet`](#fileset).
+
+    ```python
+    from good import BloomFilter
+
+    bloom = BloomFilter(1000, 0.01, [u'a', u'b'])
+
+    u'a' in bloom  #-> True
+    u'z' in bloom  #-> False (most likely)
+    ```
+
+    Values are hashed with `hash()`, which is randomized per process for strings in Python 3:
+    the filter is only valid within the process that has built it (and its forks).
+
+    :param capacity: The expected number of values
+    :type capacity: int
+    :param error_rate: The desired false positive rate
+    :type error_rate: float
+    :param values: Values to add
+    :type values: collections.Iterable
+    """
+
+    def __init__(self, capacity, error_rate=0.01, values=()):
+        capacity = max(capacity, 1)
+
+        #: The number of bits
+        self.size = int(math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        #: The number of hash functions
+        self.hashes = max(int(round(self.size / capacity * math.log(2))), 1)
+
+        self.bits = bytearray((self.size + 7) // 8)
+        self.update(values)
+
+    @staticmethod
+    def _hashes(v):
+        """ Get two hashes for the value (for double hashing) """
+        h = hash(v)
+        return h, (h >> 32 ^ h * 0x9E3779B1) | 1
+
+    def add(self, v):
+        """ Add a value to the filter """
+        h1, h2 = self._hashes(v)
+        for i in range(self.hashes):
+            p = (h1 + i * h2) % self.size
+            self.bits[p >> 3] |= 1 << (p & 7)
+
+    def update(self, values):
+        """ Add multiple values to the filter """
+        for v in values:
+            self.add(v)
+
+    def __contains__(self, v):
+        try:
+            h1, h2 = self._hashes(v)
+        except TypeError:
+            return False  # unhashable
+
+        bits, size = self.bits, self.size
+        for i in range(self.hashes):
+            p = (h1 + i * h2) % size
+            if not bits[p >> 3] & (1 << (p & 7)):
+                return False
+        return True
+
+    def __repr__(self):
+        return 'BloomFilter({}/{})'.format(self.size, self.hashes)
+
+
+__all__ = ('In', 'Length', 'Default', 'Fallback', 'Map', 'FileSet', 'BloomFilter')
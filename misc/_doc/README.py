@@ -1,4 +1,4 @@
-import good, good.schema.errors, good.voluptuous
+import good, good.i18n, good.schema.errors, good.schema.profiler, good.schema.memory, good.voluptuous
 from exdoc import doc, getmembers
 
 import json
@@ -20,10 +20,18 @@ data = {
     'voluptuous': doc(good.voluptuous),
 
     'Schema': doccls(good.Schema, None, '__call__'),
+    'Ref': doccls(good.Ref),
+    'Limits': doccls(good.Limits),
+    'SchemaRegistry': doccls(good.SchemaRegistry),
+    'Profiler': doccls(good.schema.profiler.Profiler),
+    'MemoryReport': doccls(good.schema.memory.MemoryReport),
+    'Metrics': doccls(good.Metrics),
+    'warmup': doc(good.warmup),
     'errors': doc(good.schema.errors),
     'Invalid': doccls(good.Invalid),
     'MultipleInvalid': doccls(good.MultipleInvalid),
     'markers': docmodule(good.markers),
+    'i18n': docmodule(good.i18n),
 
     'helpers': docmodule(good.helpers),
 
@@ -0,0 +1,83 @@
+#! /usr/bin/env python
+""" Benchmark `In()` lookups against containers of different sizes.
+
+Compares:
+
+* list: O(n) lookups (how `In([...])` used to work)
+* frozenset: what `In([...])` converts lists into
+* FileSet: memory-mapped sorted file with a binary search
+* FileSet+bloom: the same, with a Bloom filter prefilter
+"""
+
+from __future__ import print_function, division
+
+import os
+import shutil
+import tempfile
+from timeit import default_timer
+
+import good
+
+
+class ListContainer(object):
+    """ A container with O(n) lookups, which `In` does not convert """
+
+    def __init__(self, values):
+        self.values = list(values)
+
+    def __contains__(self, v):
+        return v in self.values
+
+
+def measure(container, samples):
+    """ Validate the samples with `In(container)`
+
+    :return: Microseconds per validation
+    :rtype: float
+    """
+    schema = good.Schema(good.In(container))
+
+    start = default_timer()
+    for v in samples:
+        try:
+            schema(v)
+        except good.Invalid:
+            pass
+    return (default_timer() - start) / len(samples) * 1000000
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(prog='Containers')
+    parser.add_argument('samples', type=int, nargs='?', default=2000, help='The number of lookups per test')
+    parser.add_argument('sizes', type=int, nargs='*', default=[100, 10000, 1000000], help='Set sizes to test')
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp()
+    try:
+        print('#{:>9} {:>14} {:>6} {:>10}'.format('size', 'container', 'kind', 'usec/op'))
+        for size in args.sizes:
+            values = [u'SKU-{:09d}'.format(i * 2) for i in range(size)]
+            hits = [values[(i * 7919) % size] for i in range(args.samples)]
+            misses = [u'SKU-{:09d}'.format(((i * 7919) % size) * 2 + 1) for i in range(args.samples)]
+
+            path = os.path.join(tmp, 'values-{}.txt'.format(size))
+            good.FileSet.write(path, values)
+
+            containers = [
+                ('list', ListContainer(values)),
+                ('frozenset', values),  # In() converts it
+                ('FileSet', good.FileSet(path)),
+                ('FileSet+bloom', good.FileSet(path, bloom=0.01)),
+            ]
+
+            for name, container in containers:
+                # O(n) lookups are way too slow on huge sets
+                if name == 'list' and size > 100000:
+                    continue
+
+                for kind, samples in (('hit', hits), ('miss', misses)):
+                    print('{:>10} {:>14} {:>6} {:>10.2f}'.format(size, name, kind, measure(container, samples)))
+    finally:
+        shutil.rmtree(tmp)
@@ -0,0 +1,50 @@
+#! /usr/bin/env python
+""" Benchmark `Schema.validate_iterative()` against the recursive `Schema.__call__()`.
+
+Validates linked lists of increasing length with a recursive schema: every item is one more level of nesting.
+"""
+
+from __future__ import print_function, division
+
+from timeit import default_timer
+
+import good
+
+
+def measure(validate, value, depth, samples):
+    """ Validate the value
+
+    :return: Microseconds per nesting level, or `None` when the recursion limit is exceeded
+    :rtype: float|None
+    """
+    start = default_timer()
+    try:
+        for i in range(samples):
+            validate(value)
+    except RuntimeError:  # RecursionError
+        return None
+    return (default_timer() - start) / samples / depth * 1000000
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(prog='Deep')
+    parser.add_argument('samples', type=int, nargs='?', default=100, help='The number of validations per test')
+    parser.add_argument('depths', type=int, nargs='*', default=[10, 100, 500, 10000], help='Nesting depths to test')
+    args = parser.parse_args()
+
+    schema = good.Schema({
+        'id': int,
+        'name': str,
+        good.Optional('next'): good.Maybe(good.Ref()),
+    })
+
+    print('#{:>7} {:>14} {:>14}'.format('depth', 'recursive', 'iterative'))
+    for depth in args.depths:
+        value = None
+        for i in range(depth):
+            value = {'id': i, 'name': 'item-{}'.format(i), 'next': value}
+
+        results = [measure(schema, value, depth, args.samples), measure(schema.validate_iterative, value, depth, args.samples)]
+        print('{:>8} {:>14} {:>14}'.format(depth, *['RecursionError' if r is None else '{:.2f}'.format(r) for r in results]))
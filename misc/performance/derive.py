@@ -0,0 +1,46 @@
+#! /usr/bin/env python
+""" Benchmark deriving schemas: `Schema.extend()`, `Schema.without()`, `Schema.replace()`,
+against compiling the modified definition from scratch.
+
+The base schema is a wide mapping: every variant changes a single key.
+"""
+
+from __future__ import print_function, division
+
+from timeit import default_timer
+
+import good
+
+
+def measure(derive, samples):
+    """ Derive the schema
+
+    :return: Microseconds per schema
+    :rtype: float
+    """
+    start = default_timer()
+    for i in range(samples):
+        derive()
+    return (default_timer() - start) / samples * 1000000
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(prog='Derive')
+    parser.add_argument('samples', type=int, nargs='?', default=100, help='The number of schemas per test')
+    parser.add_argument('sizes', type=int, nargs='*', default=[10, 100, 300, 1000], help='The numbers of keys to test')
+    args = parser.parse_args()
+
+    print('#{:>6} {:>10} {:>10} {:>10} {:>10}'.format('keys', 'compile', 'extend', 'without', 'replace'))
+    for size in args.sizes:
+        mapping = {'key-{}'.format(i): good.Any(int, {'name': str, 'tags': [str]}) for i in range(size)}
+        base = good.Schema(mapping)
+
+        results = [
+            measure(lambda: good.Schema(dict(mapping, extra=int)), args.samples),
+            measure(lambda: base.extend({'extra': int}), args.samples),
+            measure(lambda: base.without(['key-0']), args.samples),
+            measure(lambda: base.replace(['key-0'], int), args.samples),
+        ]
+        print('{:>7} {:>10.1f} {:>10.1f} {:>10.1f} {:>10.1f}'.format(size, *results))
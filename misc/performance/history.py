@@ -0,0 +1,238 @@
+#! /usr/bin/env python
+""" Benchmark history: store the results of the benchmark suite, and compare two runs.
+
+    $ ./history.py record --runs 5                # run the suite 5 times, store as history/<revision>-<python>.json
+    $ ./history.py compare 02bca15 HEAD           # compare two stored runs; exits with 1 on a regression
+    $ ./history.py compare 02bca15 HEAD --threshold 5 --track list nested/document
+
+A stored run has the results of every benchmark of the suite (see `performance.py`),
+repeated a number of times: the median latency of every repetition is a sample.
+Two runs are compared with Welch's t-test: the difference of the mean latencies, with a 95% confidence interval.
+A benchmark regresses when it's slower by more than the threshold, and the confidence interval excludes zero.
+With a single repetition there's no interval, and the threshold alone decides.
+"""
+
+from __future__ import print_function, division
+
+import os
+import sys
+import json
+import glob
+import math
+import platform
+import subprocess
+import collections
+
+import performance
+
+
+#: Default history directory
+HISTORY = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'history')
+
+#: Two-sided 95% critical values of Student's t, by degrees of freedom
+T95 = [12.706, 4.303, 3.182, 2.776, 2.571, 2.447, 2.365, 2.306, 2.262, 2.228,
+       2.201, 2.179, 2.160, 2.145, 2.131, 2.120, 2.110, 2.101, 2.093, 2.086,
+       2.080, 2.074, 2.069, 2.064, 2.060, 2.056, 2.052, 2.048, 2.045, 2.042]
+
+
+def t95(df):
+    """ Get the two-sided 95% critical value of Student's t
+
+    :param df: Degrees of freedom, can be fractional (Welch)
+    :rtype: float
+    """
+    if df >= len(T95):
+        return 1.96 + (T95[-1] - 1.96) * len(T95) / df  # tends to the normal distribution
+    lo = max(int(df), 1)
+    hi = min(lo + 1, len(T95))
+    return T95[lo - 1] + (T95[hi - 1] - T95[lo - 1]) * (df - lo)
+
+
+def mean_var(samples):
+    """ Get the mean and the sample variance
+
+    :rtype: (float, float|None)
+    """
+    n = len(samples)
+    mean = sum(samples) / n
+    var = sum((x - mean) ** 2 for x in samples) / (n - 1) if n > 1 else None
+    return mean, var
+
+
+def welch(base, head):
+    """ Compare two samples: the difference of the means, with a 95% confidence interval
+
+    :param base: Samples
+    :type base: list[float]
+    :param head: Samples
+    :type head: list[float]
+    :return: (difference, half-width of the interval). The half-width is `None` with less than 2 samples in either.
+    :rtype: (float, float|None)
+    """
+    (m1, v1), (m2, v2) = mean_var(base), mean_var(head)
+    if v1 is None or v2 is None:
+        return m2 - m1, None
+
+    a, b = v1 / len(base), v2 / len(head)
+    se = math.sqrt(a + b)
+    if se == 0:
+        return m2 - m1, 0.0
+    df = (a + b) ** 2 / (a ** 2 / (len(base) - 1) + b ** 2 / (len(head) - 1))
+    return m2 - m1, t95(df) * se
+
+
+#region Store
+
+def git_revision():
+    """ Get the revision of the checkout: `<hash>`, or `<hash>+dirty` with uncommitted changes """
+    cwd = os.path.dirname(os.path.abspath(__file__))
+    try:
+        rev = subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], cwd=cwd).decode().strip()
+        dirty = subprocess.check_output(['git', 'status', '--porcelain', '--untracked-files=no'], cwd=cwd).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+    return rev + ('+dirty' if dirty else '')
+
+
+def python_key():
+    """ The Python a run is keyed by: `cpython-3.9.18` """
+    return '{}-{}'.format(platform.python_implementation().lower(), platform.python_version())
+
+
+def record(args):
+    """ Run the suite several times, and store the results """
+    selected = [b for b in performance.BENCHMARKS
+                if not args.benchmarks or b.name in args.benchmarks or b.group in args.benchmarks]
+
+    # Repetitions are interleaved: a slow moment of the machine hits every benchmark a bit
+    samples = collections.OrderedDict((b.name, collections.defaultdict(list)) for b in selected)
+    for i in range(args.runs):
+        for bench in selected:
+            r = performance.run(bench, args.seed, args.min_time, args.min_ops, args.warmup)
+            for field in ('p50', 'mean', 'ops_per_sec', 'peak_memory'):
+                samples[bench.name][field].append(r[field])
+            print('run {}/{}: {:<20} {:>10.1f} us'.format(i + 1, args.runs, bench.name, r['p50'] * 1000000),
+                  file=sys.stderr)
+
+    revision = git_revision()
+    data = collections.OrderedDict([
+        ('environment', dict(performance.environment(args.seed), revision=revision)),
+        ('runs', args.runs),
+        ('results', samples),
+    ])
+    if not os.path.isdir(args.history):
+        os.makedirs(args.history)
+    path = os.path.join(args.history, '{}-{}.json'.format(revision, python_key()))
+    with open(path, 'w') as f:
+        json.dump(data, f, indent=2)
+        f.write('\n')
+    print(path)
+
+
+def resolve(history, key, python):
+    """ Find a stored run: a file path, a git revision, or a revision prefix
+
+    :rtype: str
+    :raises SystemExit: No such run, or several of them
+    """
+    if os.path.isfile(key):
+        return key
+
+    # Git names: HEAD, branches, tags
+    try:
+        key = subprocess.check_output(['git', 'rev-parse', '--short', key], stderr=subprocess.STDOUT,
+                                      cwd=os.path.dirname(os.path.abspath(__file__))).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        pass
+
+    found = sorted(glob.glob(os.path.join(history, '{}*-{}.json'.format(key, python))))
+    found = [p for p in found if not os.path.basename(p).startswith(key + '+')] or found  # prefer a clean tree
+    if len(found) != 1:
+        sys.exit('{} stored runs for {} on {}: {}'.format(len(found), key, python, ', '.join(found) or '-'))
+    return found[0]
+
+#endregion
+
+
+#region Compare
+
+def compare(args):
+    """ Compare two stored runs
+
+    :return: Exit code: 1 if a tracked benchmark has regressed
+    :rtype: int
+    """
+    paths = [resolve(args.history, key, args.python) for key in (args.base, args.head)]
+    base, head = [json.load(open(path)) for path in paths]
+    tracked = lambda name: not args.track or name in args.track or name.split('/')[0] in args.track
+
+    print('# base: {}\n# head: {}'.format(*paths))
+    print('#{:<19} {:>10} {:>10} {:>9} {:>10} {:>9}  {}'.format(
+        'benchmark', 'base, us', 'head, us', 'change', '95% CI', 'memory', 'verdict'))
+    regressions = []
+    for name, head_samples in head['results'].items():
+        if name not in base['results']:
+            continue
+        base_samples = base['results'][name]
+        diff, ci = welch(base_samples['p50'], head_samples['p50'])
+        base_mean = mean_var(base_samples['p50'])[0]
+        change = diff / base_mean * 100 if base_mean else None  # a zero base has no relative change
+        significant = ci is None or abs(diff) > ci
+
+        # Verdict
+        if change is None:
+            verdict = '~'
+        elif change > args.threshold and significant:
+            verdict = 'REGRESSION' if tracked(name) else 'slower'
+            if tracked(name):
+                regressions.append(name)
+        elif change < -args.threshold and significant:
+            verdict = 'faster'
+        else:
+            verdict = '~'
+
+        memory = [r['peak_memory'][-1] for r in (base_samples, head_samples)]
+        print('{:<20} {:>10.1f} {:>10.1f} {:>9} {:>10} {:>9}  {}'.format(
+            name, base_mean * 1000000, (base_mean + diff) * 1000000,
+            '-' if change is None else '{:+.1f}%'.format(change),
+            '-' if ci is None or not base_mean else '+-{:.1f}%'.format(ci / base_mean * 100),
+            '-' if None in memory or not memory[0] else '{:+.1f}%'.format((memory[1] - memory[0]) / memory[0] * 100),
+            verdict))
+
+    if regressions:
+        print('Regressed by more than {}%: {}'.format(args.threshold, ', '.join(regressions)), file=sys.stderr)
+        return 1
+    return 0
+
+#endregion
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(prog='History', description='Benchmark history: store & compare')
+    parser.add_argument('--history', default=HISTORY, help='History directory')
+    commands = parser.add_subparsers(dest='command')
+
+    p = commands.add_parser('record', help='Run the suite, and store the results')
+    p.add_argument('benchmarks', nargs='*', help='Benchmarks or groups to run. Default: all')
+    p.add_argument('--runs', type=int, default=5, help='The number of repetitions: the samples to compare')
+    p.add_argument('--seed', type=int, default=1, help='Random seed for the inputs')
+    p.add_argument('--min-time', type=float, default=0.5, help='Run every benchmark for at least this long, seconds')
+    p.add_argument('--min-ops', type=int, default=10, help='Run at least this many operations of every benchmark')
+    p.add_argument('--warmup', type=int, default=3, help='The number of operations to run before measuring')
+
+    p = commands.add_parser('compare', help='Compare two stored runs')
+    p.add_argument('base', help='The base run: a git revision, or a file')
+    p.add_argument('head', help='The run to check: a git revision, or a file')
+    p.add_argument('--python', default=python_key(), help='Python the runs were made with: e.g. cpython-3.9.18')
+    p.add_argument('--threshold', type=float, default=5.0, help='Regression threshold: slower by this many percent')
+    p.add_argument('--track', nargs='*', help='Benchmarks or groups that fail the comparison. Default: all')
+
+    args = parser.parse_args()
+    if args.command == 'record':
+        record(args)
+    elif args.command == 'compare':
+        sys.exit(compare(args))
+    else:
+        parser.print_help()
@@ -0,0 +1,59 @@
+#! /usr/bin/env python
+""" Benchmark the input limits: `Schema(limits=Limits(...))`.
+
+The limits are checked with a separate pass over the input, before the validation starts.
+The script measures that pass on a valid input, against the validation itself,
+and the time it takes to reject an oversized input, against validating it in full.
+"""
+
+from __future__ import print_function, division
+
+from timeit import repeat
+
+import good
+
+
+def measure(f, value, samples, rounds):
+    """ Call the function: the best run
+
+    :return: Microseconds per call
+    :rtype: float
+    """
+    return min(repeat(lambda: f(value), number=samples, repeat=rounds)) / samples * 1000000
+
+
+def rejected(schema):
+    """ Make a function that validates with the schema, and ignores the error """
+    def validate(value):
+        try:
+            schema(value)
+        except good.Invalid:
+            pass
+    return validate
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(prog='Limits')
+    parser.add_argument('samples', type=int, nargs='?', default=100, help='The number of calls per run')
+    parser.add_argument('items', type=int, nargs='?', default=20, help='The number of items in the valid input')
+    parser.add_argument('--rounds', type=int, default=30, help='The number of runs')
+    args = parser.parse_args()
+
+    definition = {'id': int, 'name': str, 'tags': [str], 'items': [{'a': int, 'b': str}]}
+    value = {'id': 1, 'name': 'a', 'tags': ['a', 'b', 'c'], 'items': [{'a': i, 'b': 'x'} for i in range(args.items)]}
+    oversized = dict(value, items=value['items'] * 50)
+
+    limits = good.Limits(max_depth=10, max_items=100, max_keys=20, max_str_len=1000)
+    plain = good.Schema(definition)
+    limited = good.Schema(definition, limits=limits)
+
+    print('#{:>31} {:>10}'.format('', 'us/call'))
+    print('{:>32} {:>10.1f}'.format('validation', measure(plain, value, args.samples, args.rounds)))
+    print('{:>32} {:>10.1f}'.format('limits check', measure(limits.check, value, args.samples, args.rounds)))
+    print('{:>32} {:>10.1f}'.format('limits check, no max_str_len',
+                                    measure(good.Limits(max_depth=10, max_items=100, max_keys=20).check,
+                                            value, args.samples, args.rounds)))
+    print('{:>32} {:>10.1f}'.format('oversized: validation', measure(rejected(plain), oversized, 1, args.rounds)))
+    print('{:>32} {:>10.1f}'.format('oversized: rejected by limits', measure(rejected(limited), oversized, args.samples, args.rounds)))
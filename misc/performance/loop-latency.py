@@ -0,0 +1,76 @@
+#! /usr/bin/env python3
+""" Benchmark the event loop latency while validating a huge input (Python 3.5+).
+
+A heartbeat task wakes up every millisecond and measures how late it is:
+this is the latency every other request on the worker would see.
+
+Compares:
+
+* sync: `schema(value)` called from a coroutine
+* chunked: `await schema.validate_async(value, chunk_size=N)`
+"""
+
+from __future__ import print_function, division
+
+import asyncio
+from timeit import default_timer
+
+import good
+
+
+async def measure(validate, value):
+    """ Validate the value while measuring the loop latency
+
+    :return: (validation time, p99 heartbeat latency, max heartbeat latency, heartbeats), ms
+    :rtype: (float, float, float, int)
+    """
+    lags = []
+
+    async def heartbeat():
+        while True:
+            start = default_timer()
+            await asyncio.sleep(0.001)
+            lags.append(default_timer() - start - 0.001)
+
+    task = asyncio.ensure_future(heartbeat())
+    await asyncio.sleep(0.01)  # warm up
+    del lags[:]
+
+    start = default_timer()
+    await validate(value)
+    elapsed = default_timer() - start
+
+    await asyncio.sleep(0.002)  # let the heartbeat report the last lag
+    task.cancel()
+    lags.sort()
+    return elapsed * 1000, lags[int(len(lags) * 0.99)] * 1000, lags[-1] * 1000, len(lags)
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(prog='LoopLatency')
+    parser.add_argument('size', type=int, nargs='?', default=200000, help='The number of items in the input list')
+    parser.add_argument('chunks', type=int, nargs='*', default=[100, 1000, 10000], help='Chunk sizes to test')
+    args = parser.parse_args()
+
+    schema = good.Schema([{
+        'id': int,
+        'name': good.All(good.Coerce(str), good.Length(max=32)),
+        good.Optional('tags'): [str],
+    }])
+    value = [{'id': i, 'name': 'item-{}'.format(i), 'tags': ['a', 'b']} for i in range(args.size)]
+
+    async def sync(v):
+        return schema(v)
+
+    def chunked(n):
+        return lambda v: schema.validate_async(v, chunk_size=n)
+
+    tests = [('sync', sync)] + [('chunked:{}'.format(n), chunked(n)) for n in args.chunks]
+
+    loop = asyncio.get_event_loop()
+    print('#{:>14} {:>12} {:>14} {:>14} {:>11}'.format('mode', 'total, ms', 'p99 lag, ms', 'max lag, ms', 'heartbeats'))
+    for name, validate in tests:
+        elapsed, p99, lag, beats = loop.run_until_complete(measure(validate, value))
+        print('{:>15} {:>12.1f} {:>14.2f} {:>14.2f} {:>11}'.format(name, elapsed, p99, lag, beats))
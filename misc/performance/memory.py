@@ -0,0 +1,66 @@
+#! /usr/bin/env python3
+""" Benchmark the memory retained by validated records (Python 3.4+: uses `tracemalloc`).
+
+Every record is decoded from its own JSON document, like messages from a queue,
+so every record comes with its own copies of the key strings.
+
+Compares:
+
+* dict: a mapping schema
+* lean: a mapping schema with `lean=True`: shared key objects
+* Record: validated into a named tuple with `Record()`
+"""
+
+from __future__ import print_function, division
+
+import gc
+import json
+import tracemalloc
+
+import good
+
+
+def measure(schema, lines):
+    """ Decode & validate the records, and keep them
+
+    :return: Retained bytes per record
+    :rtype: float
+    """
+    gc.collect()
+    tracemalloc.start()
+    records = [schema(json.loads(line)) for line in lines]
+    gc.collect()
+    retained = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del records
+    return retained / len(lines)
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(prog='Memory')
+    parser.add_argument('records', type=int, nargs='?', default=1000000, help='The number of records')
+    args = parser.parse_args()
+
+    mapping = {
+        'id': int,
+        'login': str,
+        'email': str,
+        'active': bool,
+        good.Optional('country'): str,
+    }
+    lines = [json.dumps({'id': i, 'login': 'user-{}'.format(i), 'email': 'user{}@example.com'.format(i),
+                         'active': i % 2 == 0, 'country': 'NL'})
+             for i in range(args.records)]
+
+    schemas = [
+        ('dict', good.Schema(mapping)),
+        ('lean', good.Schema(mapping, lean=True)),
+        ('Record', good.Schema(good.Record(mapping))),
+    ]
+
+    print('#{:>9} {:>14} {:>10}'.format('output', 'bytes/record', 'total, MB'))
+    for name, schema in schemas:
+        per_record = measure(schema, lines)
+        print('{:>10} {:>14.1f} {:>10.1f}'.format(name, per_record, per_record * args.records / 1e6))
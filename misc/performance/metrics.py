@@ -0,0 +1,54 @@
+#! /usr/bin/env python
+""" Benchmark the overhead of the metrics hook: `Schema(metrics=Metrics().hook(name))`.
+
+The hook costs the same for every call, whatever the schema is: the script measures that cost
+as the difference between a schema with the hook and the same schema without it.
+The two are measured in turns, and the best run of each is taken, so that the noise of the machine
+does not go to either of them.
+"""
+
+from __future__ import print_function, division
+
+from timeit import repeat
+
+import good
+
+
+def measure(schemas, value, samples, rounds):
+    """ Call the schemas in turns: the best run of each
+
+    :type schemas: dict
+    :return: Microseconds per call: { key: us }
+    :rtype: dict
+    """
+    best = dict((key, float('inf')) for key in schemas)
+    for i in range(rounds):
+        for key, schema in schemas.items():
+            t = min(repeat(lambda: schema(value), number=samples, repeat=1)) / samples * 1000000
+            best[key] = min(best[key], t)
+    return best
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(prog='Metrics')
+    parser.add_argument('samples', type=int, nargs='?', default=2000, help='The number of calls per run')
+    parser.add_argument('rates', type=float, nargs='*', default=[1.0, 0.1, 0.01], help='Sample rates to test')
+    parser.add_argument('--rounds', type=int, default=50, help='The number of runs of every schema')
+    args = parser.parse_args()
+
+    definition = {'id': int, 'name': str, 'active': bool, 'tags': [str]}
+    value = {'id': 1, 'name': 'a', 'active': True, 'tags': ['a', 'b', 'c']}
+
+    schemas = {None: good.Schema(definition)}
+    for rate in args.rates:
+        schemas[rate] = good.Schema(definition, metrics=good.Metrics(sample_rate=rate).hook('bench'))
+    best = measure(schemas, value, args.samples, args.rounds)
+
+    validation = best[None]
+    print('#{:>11} {:>14} {:>14}'.format('sample rate', 'hook, us/call', 'of validation'))
+    for rate in args.rates:
+        overhead = best[rate] - validation
+        print('{:>12} {:>14.3f} {:>13.1f}%'.format(rate, overhead, overhead / validation * 100))
+    print('(validation: {:.3f} us)'.format(validation))
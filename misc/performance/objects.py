@@ -0,0 +1,73 @@
+#! /usr/bin/env python
+""" Benchmark `Object()` validation: compiled attribute access vs `ObjectProxy`.
+
+Validates objects of several kinds of classes: plain `__dict__`, `__slots__`, and named tuples.
+"""
+
+from __future__ import print_function, division
+
+import collections
+from timeit import default_timer
+
+import good
+
+
+class DictRow(object):
+    def __init__(self, id, name, email, age):
+        self.id = id
+        self.name = name
+        self.email = email
+        self.age = age
+
+
+class SlotsRow(object):
+    __slots__ = ('id', 'name', 'email', 'age')
+
+    def __init__(self, id, name, email, age):
+        self.id = id
+        self.name = name
+        self.email = email
+        self.age = age
+
+
+TupleRow = collections.namedtuple('TupleRow', ('id', 'name', 'email', 'age'))
+
+
+def measure(validator, rows):
+    """ Validate the rows
+
+    :return: Microseconds per validation
+    :rtype: float
+    """
+    schema = good.Schema(validator)
+
+    start = default_timer()
+    for row in rows:
+        schema(row)
+    return (default_timer() - start) / len(rows) * 1000000
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(prog='Objects')
+    parser.add_argument('samples', type=int, nargs='?', default=20000, help='The number of objects per test')
+    args = parser.parse_args()
+
+    schema = {
+        'id': int,
+        'name': str,
+        'email': good.Email(),
+        good.Optional('age'): good.Maybe(good.Range(0, 150)),
+    }
+
+    print('#{:>9} {:>10} {:>10}'.format('class', 'mode', 'usec/op'))
+    for cls in (DictRow, SlotsRow, TupleRow):
+        rows = [cls(i, 'user-{}'.format(i), 'user{}@example.com'.format(i), i % 100) for i in range(args.samples)]
+
+        compiled = good.Object(schema)
+        proxy = good.Object(schema)
+        proxy.fields = None  # disable compiled attribute access
+
+        for mode, validator in (('proxy', proxy), ('compiled', compiled)):
+            print('{:>10} {:>10} {:>10.2f}'.format(cls.__name__, mode, measure(validator, rows)))
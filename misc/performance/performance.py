@@ -1,173 +1,429 @@
 #! /usr/bin/env python
+""" Benchmark suite: validation throughput, latency, and memory over the features of the library.
+
+Every benchmark builds its schema and its inputs from a fixed seed, so runs are comparable.
+Covers flat and nested documents, lists of records, markers, predicates, dates, objects,
+error-heavy inputs, records made by `Schema.sampler()`, and compile time.
+
+For every benchmark, reports operations per second, per-operation latency percentiles,
+and the peak memory of a single operation (Python 3.4+: uses `tracemalloc`).
+The results can be saved as JSON: see `--json`.
+
+Runs offline, with only the standard library and the package.
+"""
 
 from __future__ import print_function, division
 
-import voluptuous
+import os
+import gc
+import sys
+import json
+import random
+import platform
+import subprocess
+import collections
+from datetime import datetime
+from timeit import default_timer
+
+try:
+    import tracemalloc
+except ImportError:  # Python 2
+    tracemalloc = None
+
 import good
 
-import itertools
-from datetime import datetime
-from random import choice, randrange
+
+#: Benchmarks: [Benchmark]
+BENCHMARKS = []
+
+#: A benchmark: `setup(rnd)` returns the operation: a callable with no arguments
+Benchmark = collections.namedtuple('Benchmark', ('name', 'group', 'setup'))
+
+
+def benchmark(group, name):
+    """ Register a benchmark: decorates its setup function """
+    def decorator(setup):
+        BENCHMARKS.append(Benchmark('{}/{}'.format(group, name), group, setup))
+        return setup
+    return decorator
 
 
-def generate_random_type(valid):
-    """ Generate a random type and samples for it.
+def validate_all(schema, values):
+    """ Make an operation that validates every value, and ignores the errors """
+    def op():
+        for value in values:
+            try:
+                schema(value)
+            except good.Invalid:
+                pass
+    return op
 
-    :param valid: Generate valid samples?
-    :type valid: bool
-    :return: type, sample-generator
-    :rtype: type, generator
-    """
-    type = choice(['int', 'str'])
 
-    r = lambda: randrange(-1000000000, 1000000000)
+#region Inputs
+
+def random_string(rnd, length=8):
+    return ''.join(rnd.choice('abcdefghijklmnopqrstuvwxyz') for i in range(length))
+
+
+def flat_schema(rnd, size):
+    """ A flat mapping of literal & type keys and values, as in the voluptuous comparison """
+    schema, sample = {}, {}
+    for i in range(size):
+        key = 'key-{}'.format(i)
+        value_type = rnd.choice([int, str])
+        if rnd.random() < 0.5:
+            schema[key] = sample[key] = rnd.randrange(1000000) if value_type is int else random_string(rnd)
+        else:
+            schema[key] = value_type
+            sample[key] = rnd.randrange(1000000) if value_type is int else random_string(rnd)
+    return schema, sample
+
 
-    if type == 'int':
-        return int,  (r() if valid else str(r()) for i in itertools.count())
-    elif type == 'str':
-        return str, (str(r()) if valid else r() for i in itertools.count())
-    else:
-        raise AssertionError('!')
+def record_schema():
+    return {
+        'id': int,
+        'login': str,
+        'email': good.Email(),
+        'age': good.All(int, good.Range(0, 150)),
+        'roles': [good.In(['admin', 'user', 'guest'])],
+        good.Optional('country'): good.Maybe(str),
+    }
 
 
-def generate_random_schema(valid):
-    """ Generate a random plain schema, and a sample generation function.
+def record(rnd, i):
+    return {
+        'id': i,
+        'login': random_string(rnd),
+        'email': '{}@example.com'.format(random_string(rnd)),
+        'age': rnd.randrange(150),
+        'roles': [rnd.choice(['admin', 'user', 'guest']) for j in range(rnd.randrange(1, 4))],
+        'country': rnd.choice([None, 'NL', 'UA']),
+    }
+
+
+def document_schema():
+    return {
+        'id': int,
+        'title': str,
+        'author': {'name': str, 'email': good.Email()},
+        'sections': [{
+            'title': str,
+            'paragraphs': [{'text': str, good.Optional('tags'): [str]}],
+        }],
+        'meta': {'created': int, 'updated': good.Maybe(int)},
+    }
 
-    :param valid: Generate valid samples?
-    :type valid: bool
-    :returns: schema, sample-generator
-    :rtype: *, generator
-    """
-    schema_type = choice(['literal', 'type'])
-
-    if schema_type == 'literal':
-        type, gen = generate_random_type(valid)
-        value = next(gen)
-        return value, (value if valid else None for i in itertools.count())
-    elif schema_type == 'type':
-        return generate_random_type(valid)
-    else:
-        raise AssertionError('!')
-
-
-def generate_dict_schema(size, valid):
-    """ Generate a schema dict of size `size` using library `lib`.
-
-    In addition, it returns samples generator
-
-    :param size: Schema size
-    :type size: int
-    :param samples: The number of samples to generate
-    :type samples: int
-    :param valid: Generate valid samples?
-    :type valid: bool
-    :returns
-    """
 
-    schema = {}
-    generator_items = []
+def document(rnd, sections=5, paragraphs=5):
+    return {
+        'id': rnd.randrange(1000000),
+        'title': random_string(rnd, 20),
+        'author': {'name': random_string(rnd), 'email': 'a@example.com'},
+        'sections': [{
+            'title': random_string(rnd),
+            'paragraphs': [{'text': random_string(rnd, 40), 'tags': [random_string(rnd, 4)] * rnd.randrange(3)}
+                           for j in range(paragraphs)],
+        } for i in range(sections)],
+        'meta': {'created': 1400000000, 'updated': None},
+    }
+
+
+class Row(object):
+    def __init__(self, id, name, score):
+        self.id = id
+        self.name = name
+        self.score = score
+
+
+class SlotsRow(object):
+    __slots__ = ('id', 'name', 'score')
+
+    def __init__(self, id, name, score):
+        self.id = id
+        self.name = name
+        self.score = score
+
+#endregion
+
+
+#region Benchmarks
+
+@benchmark('flat', 'valid')
+def flat_valid(rnd):
+    schema, sample = flat_schema(rnd, 30)
+    return validate_all(good.Schema(schema), [dict(sample) for i in range(100)])
+
+
+@benchmark('flat', 'invalid')
+def flat_invalid(rnd):
+    schema, sample = flat_schema(rnd, 30)
+    values = []
+    for i in range(100):
+        value = dict(sample)
+        for key in rnd.sample(sorted(value), 3):
+            value[key] = None
+        values.append(value)
+    return validate_all(good.Schema(schema), values)
+
+
+@benchmark('nested', 'document')
+def nested_document(rnd):
+    return validate_all(good.Schema(document_schema()), [document(rnd) for i in range(10)])
+
+
+@benchmark('list', 'records')
+def list_records(rnd):
+    schema = good.Schema([record_schema()])
+    value = [record(rnd, i) for i in range(100)]
+    return lambda: schema(value)
+
+
+@benchmark('markers', 'remove')
+def markers_remove(rnd):
+    schema = good.Schema({'id': int, 'name': str, good.Remove('password'): str, good.Remove('token'): str})
+    values = [{'id': i, 'name': random_string(rnd), 'password': random_string(rnd), 'token': random_string(rnd)}
+              for i in range(100)]
+    return lambda: [schema(dict(v)) for v in values]
+
+
+@benchmark('markers', 'extra')
+def markers_extra(rnd):
+    schema = good.Schema({'id': int, good.Extra: str})
+    values = [dict({'id': i}, **{random_string(rnd, 6): random_string(rnd) for j in range(10)}) for i in range(100)]
+    return validate_all(schema, values)
+
+
+@benchmark('markers', 'entire')
+def markers_entire(rnd):
+    schema = good.Schema({
+        good.Optional('login'): str,
+        good.Optional('email'): str,
+        good.Optional('password'): str,
+        good.Entire: good.Exclusive('login', 'email'),
+    })
+    values = [{rnd.choice(['login', 'email']): random_string(rnd), 'password': random_string(rnd)} for i in range(100)]
+    return validate_all(schema, values)
+
+
+@benchmark('predicates', 'any')
+def predicates_any(rnd):
+    schema = good.Schema([good.Any(int, float, None, good.Match(r'^\d+$'))])
+    value = [rnd.choice([1, 1.5, None, '123']) for i in range(1000)]
+    return lambda: schema(value)
+
+
+@benchmark('predicates', 'all')
+def predicates_all(rnd):
+    schema = good.Schema([good.All(int, good.Range(0, 100), good.Check(lambda v: v % 2 == 0, u'Odd number', u'Even number'))])
+    value = [rnd.randrange(50) * 2 for i in range(1000)]
+    return lambda: schema(value)
+
+
+@benchmark('predicates', 'in')
+def predicates_in(rnd):
+    allowed = [random_string(rnd, 4) for i in range(1000)]
+    schema = good.Schema([good.In(allowed)])
+    value = [rnd.choice(allowed) for i in range(1000)]
+    return lambda: schema(value)
+
 
-    # Generate schema
-    for i in range(0, size):
-        while True:
-            key_schema,   key_generator   = generate_random_schema(valid)
-            if key_schema not in schema:
-                break
-        value_schema, value_generator = generate_random_schema(valid)
+@benchmark('dates', 'datetime')
+def dates_datetime(rnd):
+    schema = good.Schema([good.DateTime('%Y-%m-%d %H:%M:%S')])
+    value = [datetime(2000 + rnd.randrange(20), rnd.randrange(1, 13), rnd.randrange(1, 29),
+                      rnd.randrange(24), rnd.randrange(60), rnd.randrange(60)).strftime('%Y-%m-%d %H:%M:%S')
+             for i in range(100)]
+    return lambda: schema(value)
 
-        schema[key_schema] = value_schema
-        generator_items.append((key_generator, value_generator))
 
-    # Samples
-    generator = ({next(k_gen): next(v_gen) for k_gen, v_gen in generator_items} for i in itertools.count())
+@benchmark('objects', 'dict')
+def objects_dict(rnd):
+    schema = good.Schema([good.Object({'id': int, 'name': str, 'score': float}, Row)])
+    value = [Row(i, random_string(rnd), rnd.random()) for i in range(100)]
+    return lambda: schema(value)
 
-    # Finish
-    return schema, generator
 
+@benchmark('objects', 'slots')
+def objects_slots(rnd):
+    schema = good.Schema([good.Object({'id': int, 'name': str, 'score': float}, SlotsRow)])
+    value = [SlotsRow(i, random_string(rnd), rnd.random()) for i in range(100)]
+    return lambda: schema(value)
+
+
+@benchmark('errors', 'records')
+def errors_records(rnd):
+    """ Every record has several errors: MultipleInvalid """
+    schema = good.Schema([record_schema()])
+    value = [dict(record(rnd, i), email='not-an-email', age=-1, roles=['root']) for i in range(100)]
+    return validate_all(schema, [value])
+
+
+@benchmark('errors', 'document')
+def errors_document(rnd):
+    """ A single deep error in a big document """
+    schema = good.Schema(document_schema())
+    values = []
+    for i in range(10):
+        value = document(rnd)
+        value['sections'][-1]['paragraphs'][-1]['text'] = None
+        values.append(value)
+    return validate_all(schema, values)
+
+
+@benchmark('generated', 'records')
+def generated_records(rnd):
+    """ Records made by the sample generator, 5% of them invalid """
+    schema = good.Schema(record_schema())
+    sampler = schema.sampler(seed=rnd.randrange(1000000))
+    return validate_all(schema, [value for value, path in sampler.samples(100, invalid=0.05)])
+
+
+@benchmark('compile', 'flat')
+def compile_flat(rnd):
+    schema, sample = flat_schema(rnd, 50)
+    return lambda: good.Schema(schema)
+
+
+@benchmark('compile', 'document')
+def compile_document(rnd):
+    schema = document_schema()
+    return lambda: good.Schema(schema)
+
+#endregion
+
+
+#region Measurement
+
+def percentile(sorted_values, q):
+    """ Get a percentile of sorted values, with linear interpolation
+
+    :param q: 0..100
+    :rtype: float
+    """
+    if not sorted_values:
+        return None
+    k = (len(sorted_values) - 1) * q / 100.0
+    lo = int(k)
+    hi = min(lo + 1, len(sorted_values) - 1)
+    return sorted_values[lo] + (sorted_values[hi] - sorted_values[lo]) * (k - lo)
+
+
+def peak_memory(op):
+    """ Measure the peak memory of a single operation
+
+    :return: Bytes, or `None` without `tracemalloc`
+    :rtype: int|None
+    """
+    if tracemalloc is None or tracemalloc.is_tracing():
+        return None
+    gc.collect()
+    tracemalloc.start()
+    try:
+        op()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def run(bench, seed, min_time, min_ops, warmup):
+    """ Run a benchmark: time every operation
+
+    :param seed: Random seed for the inputs
+    :param min_time: Run for at least this long, seconds
+    :param min_ops: Run at least this many operations
+    :param warmup: The number of operations to run before measuring
+    :return: Results
+    :rtype: dict
+    """
+    op = bench.setup(random.Random(seed))
+    for i in range(warmup):
+        op()
+
+    # Time every operation
+    gc.collect()
+    latencies = []
+    deadline = default_timer() + min_time
+    while len(latencies) < min_ops or default_timer() < deadline:
+        start = default_timer()
+        op()
+        latencies.append(default_timer() - start)
+
+    latencies.sort()
+    total = sum(latencies)
+    return collections.OrderedDict([
+        ('name', bench.name),
+        ('group', bench.group),
+        ('ops', len(latencies)),
+        ('ops_per_sec', len(latencies) / total),
+        ('mean', total / len(latencies)),
+        ('min', latencies[0]),
+        ('p50', percentile(latencies, 50)),
+        ('p90', percentile(latencies, 90)),
+        ('p99', percentile(latencies, 99)),
+        ('max', latencies[-1]),
+        ('peak_memory', peak_memory(op)),
+    ])
+
+
+def environment(seed):
+    """ Describe the environment: to compare results """
+    return collections.OrderedDict([
+        ('time', datetime.utcnow().strftime('%Y-%m-%dT%H:%M:%SZ')),
+        ('python', platform.python_version()),
+        ('implementation', platform.python_implementation()),
+        ('platform', platform.platform()),
+        ('machine', platform.machine()),
+        ('revision', revision()),
+        ('seed', seed),
+    ])
+
+
+def revision():
+    """ Get the git revision of the package, if it's a checkout """
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], stderr=subprocess.STDOUT,
+                                       cwd=os.path.dirname(os.path.abspath(good.__file__))).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+#endregion
 
 
 if __name__ == '__main__':
-    import sys
     import argparse
-    from collections import defaultdict
 
-    parser = argparse.ArgumentParser(prog='Performance')
-    parser.add_argument('samples', type=int, help='The number of samples to test with')
-    parser.add_argument('size_min', type=int, help='Min dictionary size')
-    parser.add_argument('size_max', type=int, help='Max dictionary size')
+    parser = argparse.ArgumentParser(prog='Performance', description='Benchmark suite')
+    parser.add_argument('benchmarks', nargs='*', help='Benchmarks or groups to run: e.g. `flat`, `markers/extra`. Default: all')
+    parser.add_argument('--seed', type=int, default=1, help='Random seed for the inputs')
+    parser.add_argument('--min-time', type=float, default=1.0, help='Run every benchmark for at least this long, seconds')
+    parser.add_argument('--min-ops', type=int, default=20, help='Run at least this many operations of every benchmark')
+    parser.add_argument('--warmup', type=int, default=3, help='The number of operations to run before measuring')
+    parser.add_argument('--json', metavar='FILE', help='Save the results as JSON: `-` for stdout')
+    parser.add_argument('--list', action='store_true', help='List the benchmarks and exit')
     args = parser.parse_args()
 
-    # Test on both valid and invalid schemas
-    results = defaultdict(list)
-    best_for_size = defaultdict(float)
-    for valid in (True, False):
-
-        # Generate schemas of different size
-        dictionaries = []
-        for size in range(args.size_min, args.size_max + 1):
-            # Generate samples
-            schema, gen = generate_dict_schema(size, valid)
-            samples = list(sample for i, sample in zip(range(0, args.samples), gen))
-
-            dictionaries.append((
-                size,
-                schema,
-                samples
-            ))
-
-        # Iterate over libraries
-        for lib in (good, voluptuous):
-            lib_name = lib.__name__
-
-            # Generate schemas of different size
-            for size, schema, samples in dictionaries:
-                compiled_schema = lib.Schema(schema.copy())
-
-                # Now do validation
-                start = datetime.utcnow()
-                for sample in samples:
-                    try:
-                        compiled_schema(sample)
-                    except lib.Invalid as e:
-                        # Ignore errors
-                        pass
-                stop = datetime.utcnow()
-
-                # Results
-                spent_time = (stop - start).total_seconds()
-                validations_per_second = len(samples) / spent_time
-
-                # Save
-                results[valid, lib_name].append(dict(
-                    size=size,
-                    sec=spent_time,
-                    vps=validations_per_second
-                ))
-
-                # Best
-                best_for_size[valid, size] = max(
-                    best_for_size[valid, size],
-                    validations_per_second)
-
-    # Print dataset
-    for (valid, lib_name), stats_list in sorted(results.items()):
-        # Dataset header
-        print('"{lib} ({valid})"'.format(
-            lib=lib_name,
-            valid='Valid' if valid else 'Invalid',
-        ))
-
-        # Values
-        print("#size  time  vps")
-        for stat in stats_list:
-            print('{size: 5d} {sec: 4.2f} {vps: 10.2f}'.format(**stat))
-        print('\n')  # split datasets
-
-        # Calculate averages
-    for (valid, lib_name), stats_list in sorted(results.items()):
-        vps = sum(x['vps'] for x in stats_list) / len(stats_list)
-        print('AVG:{lib:<12} {valid:<8} {vps: 10.2f}'.format(
-            lib=lib_name,
-            valid='Valid' if valid else 'Invalid',
-            vps=vps
-        ), file=sys.stderr)
+    selected = [b for b in BENCHMARKS
+                if not args.benchmarks or b.name in args.benchmarks or b.group in args.benchmarks]
+    if args.list or not selected:
+        print('\n'.join(b.name for b in BENCHMARKS))
+        sys.exit(0 if args.list else 1)
+
+    out = sys.stderr if args.json == '-' else sys.stdout
+    print('#{:<19} {:>10} {:>10} {:>10} {:>10} {:>10}'.format('benchmark', 'ops/s', 'p50, us', 'p90, us', 'p99, us', 'peak, KiB'),
+          file=out)
+    results = []
+    for bench in selected:
+        r = run(bench, args.seed, args.min_time, args.min_ops, args.warmup)
+        results.append(r)
+        print('{:<20} {:>10.1f} {:>10.1f} {:>10.1f} {:>10.1f} {:>10}'.format(
+            r['name'], r['ops_per_sec'], r['p50'] * 1000000, r['p90'] * 1000000, r['p99'] * 1000000,
+            '-' if r['peak_memory'] is None else '{:.1f}'.format(r['peak_memory'] / 1024)), file=out)
+
+    if args.json:
+        data = collections.OrderedDict([('environment', environment(args.seed)), ('results', results)])
+        text = json.dumps(data, indent=2)
+        if args.json == '-':
+            print(text)
+        else:
+            with open(args.json, 'w') as f:
+                f.write(text + '\n')
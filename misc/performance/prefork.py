@@ -0,0 +1,144 @@
+#! /usr/bin/env python
+""" Pre-fork benchmark: the memory that forked workers share with the master, with and without `good.warmup()`.
+
+    $ ./prefork.py                                # 4 workers, 200 schemas
+    $ ./prefork.py --workers 8 --schemas 1000 --ops 5000
+
+For every mode, a fresh master compiles the schemas, prepares them, and forks the workers:
+
+* `cold`: nothing is done before the fork
+* `warmup`: `good.warmup(schemas)`
+* `freeze`: `good.warmup(schemas, freeze=True)`: `gc.freeze()` as well (Python 3.7+)
+
+Every worker validates values of all schemas (some of them with missing keys), runs a full garbage collection
+as a long-running worker eventually does, and reports its memory from `/proc/self/smaps_rollup` (Linux):
+*private* is the memory it has copied from the master, or allocated; *shared* is still shared with the master.
+"""
+
+from __future__ import print_function, division
+
+import os
+import gc
+import sys
+import json
+import random
+
+import good
+import performance
+
+
+MODES = ('cold', 'warmup', 'freeze')
+
+
+def build(rnd, count):
+    """ Compile the schemas of the master, with the values to validate
+
+    :return: [(schema, [value])]
+    """
+    schemas = []
+    for i in range(count):
+        definition, sample = performance.flat_schema(rnd, 20)
+        schemas.append((good.Schema(definition), [sample]))
+        schemas.append((good.Schema(performance.record_schema()), [performance.record(rnd, j) for j in range(5)]))
+        schemas.append((good.Schema(performance.document_schema()), [performance.document(rnd, 2, 2)]))
+
+    # Missing keys: the values of `Required` keys are tested for `Undefined`
+    for schema, values in schemas:
+        missing = rnd.choice(sorted(values[0]))
+        values.append(dict((k, v) for k, v in values[0].items() if k != missing))
+    return schemas
+
+
+def memory():
+    """ Memory of this process, KiB: { Rss, Pss, Shared_Clean, Shared_Dirty, Private_Clean, Private_Dirty, ... } """
+    with open('/proc/self/smaps_rollup') as f:
+        return dict((line.split(':')[0], int(line.split()[1])) for line in f if line.endswith('kB\n'))
+
+
+def worker(schemas, ops, out):
+    """ Validate values of all schemas, and report the memory """
+    for i in range(ops):
+        schema, values = schemas[i % len(schemas)]
+        for value in values:
+            try:
+                schema(value)
+            except good.Invalid:
+                pass
+    gc.collect()
+
+    m = memory()
+    os.write(out, (json.dumps({
+        'shared': m['Shared_Clean'] + m['Shared_Dirty'],
+        'private': m['Private_Clean'] + m['Private_Dirty'],
+        'pss': m['Pss'],
+    }) + '\n').encode())
+
+
+def master(mode, args):
+    """ Compile the schemas, prepare them, fork the workers, and collect their reports
+
+    :rtype: dict
+    """
+    before = memory()['Rss']
+    schemas = build(random.Random(args.seed), args.schemas)
+    if mode != 'cold':
+        good.warmup([schema for schema, values in schemas], freeze=(mode == 'freeze'))
+    rss = memory()['Rss']
+
+    read, write = os.pipe()
+    pids = []
+    for i in range(args.workers):
+        pid = os.fork()
+        if pid == 0:
+            os.close(read)
+            try:
+                worker(schemas, args.ops, write)
+            finally:
+                os._exit(0)
+        pids.append(pid)
+    os.close(write)
+    for pid in pids:
+        os.waitpid(pid, 0)
+    with os.fdopen(read) as f:
+        reports = [json.loads(line) for line in f]
+
+    return dict(
+        master=rss - before,
+        **dict((key, sum(r[key] for r in reports) / len(reports)) for key in ('shared', 'private', 'pss'))
+    )
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(prog='Prefork', description='Shared vs private memory of forked workers')
+    parser.add_argument('modes', nargs='*', default=MODES, help='Modes to run: {}'.format(', '.join(MODES)))
+    parser.add_argument('--workers', type=int, default=4, help='The number of workers')
+    parser.add_argument('--schemas', type=int, default=200, help='Schema sets to compile: 3 schemas each')
+    parser.add_argument('--ops', type=int, default=2000, help='Validations per worker')
+    parser.add_argument('--seed', type=int, default=1, help='Random seed for the schemas and the inputs')
+    args = parser.parse_args()
+
+    if not os.path.exists('/proc/self/smaps_rollup'):
+        sys.exit('Needs Linux 4.14+: /proc/self/smaps_rollup')
+    if 'freeze' in args.modes and not hasattr(gc, 'freeze'):
+        sys.exit('The freeze mode needs Python 3.7+: gc.freeze()')
+
+    print('#{:<9} {:>14} {:>14} {:>14} {:>14}'.format(
+        'mode', 'master, MiB', 'private, MiB', 'shared, MiB', 'pss, MiB'))
+    for mode in args.modes:
+        # Every mode gets a fresh master: the schemas are compiled, and frozen, in a child process
+        read, write = os.pipe()
+        pid = os.fork()
+        if pid == 0:
+            os.close(read)
+            try:
+                os.write(write, json.dumps(master(mode, args)).encode())
+            finally:
+                os._exit(0)
+        os.close(write)
+        with os.fdopen(read) as f:
+            r = json.load(f)
+        os.waitpid(pid, 0)
+        print('{:<10} {:>14.1f} {:>14.1f} {:>14.1f} {:>14.1f}'.format(
+            mode, r['master'] / 1024, r['private'] / 1024, r['shared'] / 1024, r['pss'] / 1024))
@@ -0,0 +1,111 @@
+#! /usr/bin/env python
+""" Startup benchmark: the cost of `import good`, measured with `python -X importtime`.
+
+    $ ./startup.py                                # the working tree
+    $ ./startup.py ea9362f HEAD --runs 30         # git revisions: before and after
+    $ ./startup.py --top 15                       # and the heaviest modules
+
+Every run is a fresh interpreter: `python -X importtime -c "<statement>"`.
+Reports the cumulative import time of the package, and the modules it loads that a bare interpreter does not.
+Needs Python 3.7+ for `-X importtime`; `--python` picks the interpreter.
+"""
+
+from __future__ import print_function, division
+
+import os
+import sys
+import shutil
+import tempfile
+import subprocess
+import collections
+
+
+#: Package root: the working tree
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+
+#: A measured import: { top-level module: cumulative time }, { module: self time }; microseconds
+Import = collections.namedtuple('Import', ('toplevel', 'modules'))
+
+
+def importtime(python, path, statement):
+    """ Run a fresh interpreter with `-X importtime`, and parse its report
+
+    :param path: Directory to import the package from
+    :param statement: The import statement
+    :rtype: Import
+    """
+    env = dict(os.environ, PYTHONPATH=path)
+    env.pop('PYTHONDONTWRITEBYTECODE', None)  # the first run writes the bytecode: the others measure a warm start
+    p = subprocess.Popen([python, '-X', 'importtime', '-c', statement],
+                         stdout=subprocess.PIPE, stderr=subprocess.PIPE, env=env, cwd=path)
+    out, err = p.communicate()
+    if p.returncode != 0:
+        sys.exit(err.decode())
+
+    # "import time: self [us] | cumulative | imported package": nested imports are indented
+    toplevel, modules = collections.OrderedDict(), collections.OrderedDict()
+    for line in err.decode().splitlines():
+        if not line.startswith('import time:') or 'imported package' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        modules[name.strip()] = int(self_us)
+        if not name.startswith('  '):
+            toplevel[name.strip()] = int(cumulative_us)
+    return Import(toplevel, modules)
+
+
+def checkout(rev):
+    """ Export the package at a git revision into a temporary directory
+
+    :rtype: str
+    """
+    path = tempfile.mkdtemp(prefix='good-startup-')
+    archive = subprocess.Popen(['git', 'archive', rev, 'good'], stdout=subprocess.PIPE, cwd=ROOT)
+    subprocess.check_call(['tar', '-x', '-C', path], stdin=archive.stdout)
+    if archive.wait() != 0:
+        sys.exit('git archive failed: {}'.format(rev))
+    return path
+
+
+def measure(python, path, statement, runs, bare=()):
+    """ Measure the import a number of times: the first run compiles the bytecode, and is discarded
+
+    :param bare: Modules a bare interpreter loads at startup: not counted
+    :return: Median time, microseconds; the modules loaded by the median run: { module: self time }
+    :rtype: (int, dict)
+    """
+    importtime(python, path, statement)
+    results = []
+    for i in range(runs):
+        r = importtime(python, path, statement)
+        total = sum(us for name, us in r.toplevel.items() if name not in bare)
+        results.append((total, collections.OrderedDict((m, us) for m, us in r.modules.items() if m not in bare)))
+    results.sort(key=lambda r: r[0])
+    return results[len(results) // 2]
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(prog='Startup', description='The cost of `import good`')
+    parser.add_argument('revisions', nargs='*', help='Git revisions to measure. Default: the working tree')
+    parser.add_argument('--runs', type=int, default=20, help='The number of interpreters to start: reports the median')
+    parser.add_argument('--python', default=sys.executable, help='The interpreter: Python 3.7+')
+    parser.add_argument('--statement', default='import good', help='The import statement to measure')
+    parser.add_argument('--top', type=int, default=0, help='List the heaviest modules the import loads')
+    args = parser.parse_args()
+
+    # Baseline: the modules of a bare interpreter
+    bare = measure(args.python, ROOT, 'pass', args.runs)[1]
+
+    print('#{:<19} {:>10} {:>8}'.format('revision', 'import, ms', 'modules'))
+    for rev in args.revisions or [None]:
+        path = checkout(rev) if rev else ROOT
+        try:
+            total, loaded = measure(args.python, path, args.statement, args.runs, bare)
+        finally:
+            if rev:
+                shutil.rmtree(path)
+        print('{:<20} {:>10.1f} {:>8}'.format(rev or 'working tree', total / 1000, len(loaded)))
+        for name, us in sorted(loaded.items(), key=lambda item: -item[1])[:args.top]:
+            print('  {:<30} {:>8.1f}'.format(name, us / 1000))
@@ -0,0 +1,244 @@
+""" Asynchronous validation tests (Python 3.5+) """
+
+import asyncio
+import unittest
+from functools import wraps
+
+from good import *
+from good.schema.aio import AsyncCompiler
+
+
+def coroutine(f):
+    """ Make an async twin of a validator function """
+    @wraps(f)
+    async def wrapper(v):
+        await asyncio.sleep(0)
+        return f(v)
+    return wrapper
+
+
+def intify(v):
+    return int(v)
+
+def positive(v):
+    assert v > 0, 'Must be positive'
+    return v
+
+def unique(v):
+    if v in ('root', 'admin'):
+        raise Invalid(u'Login is taken')
+    return v
+
+def root(v):
+    assert v == 'root'
+    return v
+
+def even(v):
+    return v % 2 == 0
+
+def exclusive(d):
+    if 'code' in d and 'parent' in d:
+        raise Invalid(u'Either code or parent')
+    return d
+
+
+def make_schema(f):
+    """ Create a schema with validators wrapped with `f` """
+    return Schema({
+        'login': All(str, f(unique)),
+        'age': All(f(intify), f(positive)),
+        Optional('code'): Any(int, f(intify), Msg(f(intify), u'Need a code')),
+        Optional('parent'): Maybe(f(intify)),
+        Optional('even'): [Check(f(even), u'Must be even', u'even')],
+        Optional('not_root'): Neither(f(root)),
+        Optional('test'): Test(f(intify)),
+        Optional('items'): [{
+            'id': f(intify),
+            Optional('tags'): [f(unique)],
+        }],
+        Optional('nested'): Schema({'a': f(positive)}),
+        Entire: f(exclusive),
+        Extra: Remove,
+    })
+
+
+class AsyncTest(unittest.TestCase):
+    """ Test Schema.validate_async() """
+
+    def setUp(self):
+        self.loop = asyncio.new_event_loop()
+
+    def tearDown(self):
+        self.loop.close()
+
+    def run_async(self, coro):
+        return self.loop.run_until_complete(coro)
+
+    def validate_both(self, sync_schema, async_schema, value, **kwargs):
+        """ Validate with both schemas and make sure they agree
+
+        :return: (sanitized-value | None, errors | None)
+        """
+        from copy import deepcopy
+
+        def outcome(validate):
+            try:
+                return validate(deepcopy(value)), None
+            except Invalid as ee:
+                return None, [(e.message, e.expected, e.provided, e.path) for e in ee]
+
+        expected = outcome(sync_schema)
+        actual = outcome(lambda v: self.run_async(async_schema.validate_async(v, **kwargs)))
+        self.assertEqual(expected, actual)
+        return actual
+
+    def test_sync(self):
+        """ Test schemas without coroutines: executed synchronously """
+        schema = make_schema(lambda f: f)
+        self.assertIsNone(AsyncCompiler().compile(schema.compiled))
+
+        self.validate_both(schema, schema, {'login': 'kolypto', 'age': '18'})
+        self.validate_both(schema, schema, {'login': 'root', 'age': '-1'})
+
+    def test_coroutines(self):
+        """ Test coroutine validators: same results as synchronous validators """
+        sync_schema = make_schema(lambda f: f)
+        async_schema = make_schema(coroutine)
+
+        # Valid
+        value, errors = self.validate_both(sync_schema, async_schema, {
+            'login': 'kolypto', 'age': '18',
+            'code': '123', 'even': [2, 4], 'not_root': 'user', 'test': '1',
+            'items': [{'id': '1', 'tags': ['a', 'b']}, {'id': 2}],
+            'nested': {'a': 1},
+            'extra': 1,
+        })
+        self.assertEqual(value['age'], 18)
+        self.assertEqual(value['code'], 123)
+        self.assertEqual(value['items'], [{'id': 1, 'tags': ['a', 'b']}, {'id': 2}])
+        self.assertNotIn('extra', value)
+
+        # Invalid
+        value, errors = self.validate_both(sync_schema, async_schema, {
+            'login': 'root', 'age': '-1',
+            'code': 'abc', 'parent': 'a', 'even': [2, 3, 5], 'not_root': 'root', 'test': 'x',
+            'items': [{'id': 'a', 'tags': ['admin']}, {'id': 2, 'tags': ['root']}],
+            'nested': {'a': -1},
+        })
+        self.assertEqual(len(errors), 13)
+
+        # Entire
+        value, errors = self.validate_both(sync_schema, async_schema, {
+            'login': 'kolypto', 'age': '18', 'code': 1, 'parent': 1,
+        })
+        self.assertEqual([(message, path) for message, expected, provided, path in errors],
+                         [(u'Either code or parent', [])])
+
+        # Wrong types
+        self.validate_both(sync_schema, async_schema, None)
+        self.validate_both(sync_schema, async_schema, {'login': 'a', 'age': 1, 'items': 1})
+
+    def test_concurrency(self):
+        """ Test concurrency limit """
+        running = []
+        peak = [0]
+
+        async def slow(v):
+            running.append(v)
+            peak[0] = max(peak[0], len(running))
+            await asyncio.sleep(0.01)
+            running.remove(v)
+            return v
+
+        schema = Schema({'a': [slow], 'b': slow})
+        value = {'a': list(range(10)), 'b': 10}
+
+        # Unlimited: everything at once
+        self.assertEqual(self.run_async(schema.validate_async(value)), value)
+        self.assertEqual(peak[0], 11)
+
+        # Limited
+        peak[0] = 0
+        self.assertEqual(self.run_async(schema.validate_async(value, concurrency=3)), value)
+        self.assertEqual(peak[0], 3)
+
+    def test_chunked(self):
+        """ Test chunked validation """
+        # Same results
+        for f in (lambda f: f, coroutine):
+            schema = make_schema(f)
+            self.validate_both(make_schema(lambda f: f), schema, {
+                'login': 'kolypto', 'age': '18', 'code': '1', 'even': [2, 4, 6, 8],
+                'items': [{'id': str(i), 'tags': ['a', 'b', 'c']} for i in range(10)],
+            }, chunk_size=3)
+            self.validate_both(make_schema(lambda f: f), schema, {
+                'login': 'root', 'age': '-1', 'code': 'a', 'even': [2, 3, 4, 5],
+                'items': [{'id': i, 'tags': ['a', 'root']} for i in range(10)],
+            }, chunk_size=3)
+
+        # Yields to the loop
+        async def count_yields(coro):
+            ticks = [0]
+
+            async def ticker():
+                while True:
+                    ticks[0] += 1
+                    await asyncio.sleep(0)
+
+            task = asyncio.ensure_future(ticker())
+            await asyncio.sleep(0)  # start it
+            ticks[0] = 0
+            try:
+                return await coro, ticks[0]
+            finally:
+                task.cancel()
+
+        schema = Schema([{'id': int}])
+        value = [{'id': i} for i in range(1000)]
+
+        result, ticks = self.run_async(count_yields(schema.validate_async(value)))
+        self.assertEqual(result, value)
+        self.assertEqual(ticks, 0)  # synchronous
+
+        result, ticks = self.run_async(count_yields(schema.validate_async(value, chunk_size=100)))
+        self.assertEqual(result, value)
+        self.assertEqual(ticks, 10)
+
+        # Flat iterables
+        schema = Schema([int])
+        value = list(range(1000))
+        result, ticks = self.run_async(count_yields(schema.validate_async(value, chunk_size=100)))
+        self.assertEqual(result, value)
+        self.assertEqual(ticks, 10)
+
+        result, ticks = self.run_async(count_yields(schema.validate_async(value, chunk_size=10000)))
+        self.assertEqual(result, value)
+        self.assertEqual(ticks, 0)
+
+    def test_unsupported(self):
+        """ Test validators that do not support coroutines """
+        class Wrapper(object):
+            def __init__(self, schema):
+                self.compiled = Schema(schema)
+
+            def __call__(self, v):
+                return self.compiled(v)
+
+        schema = Schema({'a': Wrapper(coroutine(intify))})
+        self.assertRaises(SchemaError, self.run_async, schema.validate_async({'a': 1}))
+
+        # Mapping keys
+        schema = Schema({coroutine(intify): int})
+        self.assertRaises(SchemaError, self.run_async, schema.validate_async({'1': 1}))
+
+    def test_refs(self):
+        """ Test recursive schemas """
+        for f in (lambda f: f, coroutine):
+            schema = Schema({'id': f(intify), Optional('children'): [Ref()]})
+            sync_schema = Schema({'id': intify, Optional('children'): [Ref()]})
+
+            value = {'id': '1', 'children': [{'id': '2', 'children': [{'id': '3'}]}, {'id': '4'}]}
+            self.validate_both(sync_schema, schema, value)
+            self.validate_both(sync_schema, schema, value, chunk_size=2)
+            value, errors = self.validate_both(sync_schema, schema, {'id': 1, 'children': [{'id': 2, 'children': [{'id': 'x'}]}]})
+            self.assertEqual(errors[0][3], ['children', 0, 'children', 0, 'id'])
@@ -1,5 +1,6 @@
 from __future__ import print_function
 import six
+import sys
 import unittest
 import collections
 from datetime import datetime, date, time, timedelta
@@ -680,6 +681,895 @@ class SchemaCoreTest(GoodTestBase):
         schema.pop(Extra)
 
 
+    def test_mapping_lean(self):
+        """ Test Schema(<mapping>, lean=True) """
+        schema_key = u''.join([u'na', u'me'])  # a distinct object, not a constant
+        schema = Schema({
+            schema_key: six.text_type,
+            Optional(u'age'): int,
+            Optional(six.text_type): [{u'tag': six.text_type}],
+        }, lean=True)
+
+        # Values are the same
+        value = json.loads('{"name": "a", "age": 1, "tags": [{"tag": "x"}], "more": []}')
+        self.assertValid(schema, deepcopy(value), value)
+        self.assertValid(schema, {u'name': u'a'}, {u'name': u'a'})
+
+        # Keys are shared
+        records = [schema(json.loads('{"name": "a", "tags": [{"tag": "x"}]}')) for i in range(2)]
+        get_key = lambda d, key: [k for k in d if k == key][0]
+        self.assertIs(get_key(records[0], u'name'), schema_key)
+        if six.PY3:  # Python 2 can't intern unicode
+            self.assertIs(get_key(records[0], u'tags'), get_key(records[1], u'tags'))
+
+        # Consistent order
+        self.assertEqual(list(schema({u'tags': [], u'name': u'a', u'age': 1})),
+                         list(schema({u'age': 1, u'name': u'a', u'tags': []})))
+
+        # Errors are the same
+        self.assertInvalid(schema, {u'name': 1},
+                           Invalid(s.es_type, s.t_unicode, s.t_int, [u'name'], six.text_type))
+
+
+    def test_ref(self):
+        """ Test recursive schemas with Ref() """
+        # Ref(): the whole schema
+        schema = Schema({
+            'text': six.text_type,
+            Optional('replies'): [Ref()],
+        })
+
+        self.assertValid(schema, {'text': u'a'})
+        self.assertValid(schema, {'text': u'a', 'replies': [{'text': u'b', 'replies': [{'text': u'c'}]}, {'text': u'd'}]})
+        self.assertInvalid(schema, {'text': u'a', 'replies': [{'text': u'b', 'replies': [{'text': 1}]}]},
+                           Invalid(s.es_type, s.t_unicode, s.t_int, ['replies', 0, 'replies', 0, 'text'], six.text_type))
+
+        # Compiled once
+        node = [n for n in schema.compiled.walk() if n.compiled_type == const.COMPILED_TYPE.REF][0]
+        self.assertIs(node.target, schema.compiled)
+        self.assertEqual(len([n for n in schema.compiled.walk() if n.compiled_type == const.COMPILED_TYPE.MAPPING]), 1)
+
+        # Within validators
+        schema = Schema({'value': int, Optional('next'): Maybe(Ref())})
+        self.assertValid(schema, {'value': 1, 'next': {'value': 2, 'next': None}})
+        self.assertInvalid(schema, {'value': 1, 'next': {'value': 2, 'next': {'value': None}}}, None)
+
+        # Ref(name): named schemas
+        schema = Schema({
+            'title': six.text_type,
+            'menu': [Ref('item')],
+        }, refs={
+            'item': {
+                'title': six.text_type,
+                Optional('items'): All(Length(max=2), [Ref('item')]),
+            },
+        })
+        self.assertValid(schema, {'title': u'a', 'menu': [{'title': u'b', 'items': [{'title': u'c'}]}]})
+        self.assertInvalid(schema, {'title': u'a', 'menu': [{'title': u'b', 'items': [{'title': u'c', 'items': [{}]}]}]},
+                           Invalid(s.es_required, u'title', s.v_no, ['menu', 0, 'items', 0, 'items', 0, 'title'], Required('title')))
+
+        # Mapping keys
+        self.assertRaises(SchemaError, Schema, {Ref(): int})
+
+        # Unresolved
+        schema = Schema({'a': Maybe(Ref('unknown'))})
+        self.assertRaises(SchemaError, schema, {'a': 1})
+
+        # Embedded: a recursive Schema keeps its own references
+        node = Schema({'x': int, Optional('kids'): [Ref()]})
+        schema = Schema({'root': node, Optional('next'): Maybe(Ref())})
+        self.assertValid(schema, {'root': {'x': 1, 'kids': [{'x': 2}]}, 'next': {'root': {'x': 3}}})
+        self.assertInvalid(schema, {'root': {'x': 1, 'kids': [{'x': u'2'}]}},
+                           Invalid(s.es_type, s.t_int, s.t_unicode, ['root', 'kids', 0, 'x'], int))
+        self.assertValid(node, {'x': 1, 'kids': [{'x': 2}]})
+        self.assertIs([n for n in node.compiled.walk() if n.compiled_type == const.COMPILED_TYPE.REF][0].target,
+                      node.compiled)
+
+
+    def test_validate_iterative(self):
+        """ Test Schema.validate_iterative() """
+        def outcome(validate, value):
+            try:
+                return validate(deepcopy(value)), None
+            except Invalid as ee:
+                return None, [(e.message, e.expected, e.provided, e.path) for e in ee]
+
+        def assertSame(schema, value, **kwargs):
+            expected = outcome(schema, value)
+            self.assertEqual(outcome(lambda v: schema.validate_iterative(v, **kwargs), value), expected)
+            return expected
+
+        def exclusive(d):
+            assert not ('tags' in d and 'items' in d), u'Either tags or items'
+            return d
+
+        # Same results
+        schema = Schema({
+            'id': int,
+            Optional('tags'): [Any(six.text_type, Msg({'name': six.text_type}, u'Need a tag'))],
+            Optional('items'): [{'id': int, Optional('kids'): Maybe([Ref()])}],
+            Optional('children'): All(Length(max=3), [Ref()]),
+            Optional('not'): Neither([int]),
+            Optional('nested'): Schema({'a': [int], Extra: Remove}),
+            Remove('password'): None,
+            Entire: exclusive,
+        }, lean=True)
+        valid = {
+            'id': 1, 'password': u'secret',
+            'tags': [u'a', {'name': u'b'}],
+            'children': [{'id': 2, 'items': [{'id': 3, 'kids': [{'id': 4}]}]}, {'id': 5}],
+            'not': [u'a'], 'nested': {'a': [1], 'b': 2},
+        }
+        value, errors = assertSame(schema, valid)
+        self.assertEqual(value['nested'], {'a': [1]})
+        self.assertNotIn('password', value)
+
+        value, errors = assertSame(schema, {
+            'id': u'1', 'tags': [1, {'name': 1}], 'items': [{'id': 1, 'kids': [{'id': u'a'}]}],
+            'children': [{'id': 2, 'children': [{}, 1]}, {'id': 3}, {'id': 4}, {'id': 5}],
+            'not': [1], 'nested': {'a': [u'a']}, 'extra': 1,
+        })
+        self.assertEqual(len(errors), 9)
+        assertSame(schema, None)
+        assertSame(schema, {'id': 1, 'tags': 1, 'items': {}})
+
+        # Flat schemas are just called
+        assertSame(Schema([{'id': int}]), [{'id': 1}, {'id': u'a'}])
+        assertSame(Schema(int), 1)
+
+        # Deeper than the recursion limit
+        schema = Schema({'value': int, Optional('next'): Maybe(Ref())})
+        value = None
+        for i in range(sys.getrecursionlimit()):
+            value = {'value': i, 'next': value}
+        self.assertEqual(schema.validate_iterative(value)['value'], i)
+
+        node = value
+        for i in range(100):
+            node = node['next']
+        node['value'] = None
+        with self.assertRaises(Invalid) as ecm:
+            schema.validate_iterative(value)
+        self.assertEqual(ecm.exception.path, ['next'] * 100 + ['value'])
+
+        # Depth limit
+        assertSame(schema, {'value': 1, 'next': {'value': 2, 'next': None}}, max_depth=2)
+        self.assertRaises(Invalid, schema.validate_iterative, value, max_depth=1000)
+        with self.assertRaises(Invalid) as ecm:
+            schema.validate_iterative({'value': 1, 'next': {'value': 2, 'next': {'value': 3}}}, max_depth=2)
+        self.assertEqual(ecm.exception.message, u'Too deeply nested')
+        self.assertEqual(ecm.exception.path, ['next', 'next'])
+
+        # Flat containers count as well
+        schema = Schema([[int]])
+        self.assertEqual(schema.validate_iterative([[1]], max_depth=2), [[1]])
+        self.assertRaises(Invalid, schema.validate_iterative, [[1]], max_depth=1)
+
+
+    def test_limits(self):
+        """ Test Schema(limits=Limits()) """
+        limits = Limits(max_depth=3, max_items=3, max_keys=3, max_str_len=5)
+        schema = Schema({
+            'name': six.text_type,
+            Optional('tags'): [six.text_type],
+            Optional('kids'): [Ref()],
+        }, limits=limits)
+
+        # Valid
+        self.assertValid(schema, {'name': u'a', 'tags': [u'a', u'b', u'c'], 'kids': [{'name': u'b'}]})
+        self.assertEqual(schema.validate_iterative({'name': u'a', 'tags': [u'a']}), {'name': u'a', 'tags': [u'a']})
+
+        # Sizes
+        self.assertInvalid(schema, {'name': u'a', 'tags': [u'a'] * 4},
+                           Invalid(u'Too many items', u'3 items at most', u'4 items', ['tags'], limits))
+        self.assertInvalid(schema, {'name': u'a', 'tags': [], 'kids': [], 'more': 1},
+                           Invalid(u'Too many keys', u'3 keys at most', u'4 keys', [], limits))
+        self.assertInvalid(schema, {'name': u'a', 'tags': [u'a', u'abcdef']},
+                           Invalid(u'String is too long', u'5 characters at most', u'6 characters', ['tags', 1], limits))
+        self.assertInvalid(schema, {u'abcdef': 1},
+                           Invalid(u'String is too long', u'5 characters at most', u'6 characters', [], limits))
+        self.assertInvalid(schema, u'abcdef', None)
+
+        # Depth: checked before the validation, with no recursion
+        self.assertInvalid(schema, {'name': u'a', 'kids': [{'name': u'b', 'kids': [{'name': u'c'}]}]},
+                           Invalid(u'Too deeply nested', u'3 levels of nesting', s.t_list, ['kids', 0, 'kids'], limits))
+        value = None
+        for i in range(sys.getrecursionlimit() * 2):
+            value = [value]
+        self.assertInvalid(schema, value,
+                           Invalid(u'Too deeply nested', u'3 levels of nesting', s.t_list, [0, 0, 0], limits))
+        self.assertRaises(Invalid, schema.validate_iterative, value)
+
+    def test_revalidate(self):
+        """ Test Schema.revalidate() """
+        from good.schema import incremental
+
+        def not_too_many(d):
+            if len(d['items']) > 3:
+                raise Invalid(u'Too many', u'<=3 items', u'{} items'.format(len(d['items'])))
+            return d
+
+        schema = Schema({
+            'title': six.text_type,
+            'items': [{'name': six.text_type, Optional('price'): int}],
+            Optional('kids'): [Ref()],
+            Entire: not_too_many,
+        })
+        doc = schema({'title': u'a', 'items': [{'name': u'x', 'price': 1}], 'kids': [{'title': u'b', 'items': []}]})
+
+        def assertRevalidated(doc, changes, expected_error=None):
+            """ Revalidate, and compare to the full validation. A patch does not modify the doc.
+
+            :return: The revalidated doc, or the doc on errors
+            """
+            patch = changes and isinstance(changes[0], dict)
+            original = deepcopy(doc)
+            patched = incremental.apply_patch(deepcopy(doc), changes)[0] if patch else deepcopy(doc)
+            try:
+                revalidated = schema.revalidate(doc, changes)
+            except Invalid as e:
+                self.assertIsNotNone(expected_error, u'False negative: {!r}'.format(e))
+                self.assertInvalidError(e, expected_error)
+                self.assertInvalid(schema, patched, expected_error)
+                revalidated = doc
+            else:
+                self.assertIsNone(expected_error, u'False positive: {!r}'.format(revalidated))
+                self.assertValid(schema, patched, revalidated)
+            if patch:
+                self.assertEqual(doc, original)  # a copy
+            else:
+                self.assertIs(revalidated, doc)  # in place
+            return revalidated
+
+        # Paths
+        doc['items'][0]['price'] = u'1'
+        assertRevalidated(doc, [['items', 0, 'price']],
+                          Invalid(s.es_type, s.t_int, s.t_unicode, ['items', 0, 'price'], int))
+        doc['items'][0]['price'] = 2
+        assertRevalidated(doc, [['items', 0, 'price']])
+        self.assertEqual(doc['items'][0]['price'], 2)
+
+        # Unchanged values are not validated again
+        doc['title'] = 1
+        self.assertIs(schema.revalidate(doc, [['items']]), doc)
+        assertRevalidated(doc, [['title']], Invalid(s.es_type, s.t_unicode, s.t_int, ['title'], six.text_type))
+        doc['title'] = u'a'
+
+        # Patch: nested Ref()
+        assertRevalidated(doc, [{'op': 'replace', 'path': '/kids/0/items', 'value': [{'name': 1}]}],
+                          Invalid(s.es_type, s.t_unicode, s.t_int, ['kids', 0, 'items', 0, 'name'], six.text_type))
+        doc = assertRevalidated(doc, [{'op': 'replace', 'path': '/kids/0/items', 'value': [{'name': u'x'}]}])
+        doc = assertRevalidated(doc, [{'op': 'replace', 'path': '/kids/0/items/0/name', 'value': u'y'}])
+
+        # Patch: list items, Entire
+        doc = assertRevalidated(doc, [{'op': 'add', 'path': '/items/-', 'value': {'name': u'y'}},
+                                      {'op': 'add', 'path': '/items/0', 'value': {'name': u'z'}}])
+        self.assertEqual([item['name'] for item in doc['items']], [u'z', u'x', u'y'])
+        assertRevalidated(doc, [{'op': 'add', 'path': '/items/-', 'value': {'name': u'w'}},
+                                {'op': 'add', 'path': '/items/-', 'value': {'name': u'v'}}],
+                          Invalid(u'Too many', u'<=3 items', u'5 items', [], not_too_many))
+        doc = assertRevalidated(doc, [{'op': 'remove', 'path': '/items/1'}])
+        self.assertEqual([item['name'] for item in doc['items']], [u'z', u'y'])
+
+        # Patch: the value is left as it is when an operation fails
+        with self.assertRaises(Invalid) as ctx:
+            schema.revalidate(doc, [{'op': 'replace', 'path': '/title', 'value': u'b'},
+                                    {'op': 'remove', 'path': '/items/5'}])
+        self.assertInvalidError(ctx.exception, Invalid(u'Path not found', u'existing key', u'5', ['items']))
+        self.assertEqual(doc['title'], u'a')
+
+        # Patch: Required key removed
+        assertRevalidated(doc, [{'op': 'remove', 'path': '/title'}],
+                          Invalid(s.es_required, u'title', s.v_no, ['title'], Required('title')))
+
+        # Wrong patch
+        self.assertRaises(Invalid, schema.revalidate, doc, [{'op': 'remove', 'path': '/none'}])
+        self.assertRaises(Invalid, schema.revalidate, doc, [{'op': 'move', 'path': '/items'}])
+
+        # Removed keys matched by a non-literal schema: the whole mapping
+        schema = Schema({Required(six.text_type): int})
+        doc = schema({u'a': 1})
+        del doc[u'a']
+        self.assertRaises(Invalid, schema.revalidate, doc, [[u'a']])
+
+    def test_project(self):
+        """ Test Schema.project() """
+        def no_x(d):
+            if 'x' in d:
+                raise Invalid(u'No x', u'no x', u'x')
+            return d
+
+        schema = Schema({
+            'id': int,
+            'title': six.text_type,
+            'author': {'name': six.text_type, 'age': int},
+            'tags': [{'name': six.text_type, 'color': six.text_type}],
+            Remove('secret'): None,
+            Entire: no_x,
+        })
+
+        # Fields & paths
+        light = schema.project(['id', ('author', 'name'), ('tags', 'name')])
+        self.assertValid(light, {'id': 1, 'author': {'name': u'a', 'age': u'?'}, 'tags': [{'name': u'b', 'color': 1}], 'x': 1})
+        self.assertInvalid(light, {'id': u'1', 'author': {'name': u'a'}, 'tags': [{'name': 1}]}, MultipleInvalid([
+            Invalid(s.es_type, s.t_int, s.t_unicode, ['id'], int),
+            Invalid(s.es_type, s.t_unicode, s.t_int, ['tags', 0, 'name'], six.text_type),
+        ]))
+        self.assertInvalid(light, {'id': 1, 'author': {}, 'tags': []},
+                           Invalid(s.es_required, u'name', s.v_no, ['author', 'name'], Required('name')))
+
+        # Compiled sub-schemas are reused
+        self.assertIs(dict((k.name, v) for k, v, l, i in light.compiled.mapping_schemas)['id'],
+                      dict((k.name, v) for k, v, l, i in schema.compiled.mapping_schemas)['id'])
+
+        # Other keys: Remove() is kept, the rest passes through or is dropped
+        self.assertValid(schema.project(['id']), {'id': 1, 'title': 1, 'secret': 1}, {'id': 1, 'title': 1})
+        self.assertValid(schema.project(['id'], drop=True), {'id': 1, 'title': 1}, {'id': 1})
+
+        # Required, Entire
+        self.assertInvalid(schema.project(['id'], required=True), {'id': 1, 'title': 1, 'author': 1},
+                           Invalid(s.es_required, u'tags', s.v_no, ['tags'], Required('tags')))
+        self.assertValid(schema.project(['id']), {'id': 1, 'x': 1})
+        self.assertInvalid(schema.project(['id'], entire=True), {'id': 1, 'x': 1},
+                           Invalid(u'No x', u'no x', u'x', [], no_x))
+
+        # The original schema is intact
+        self.assertInvalid(schema, {'id': 1}, None)
+
+        # Errors
+        self.assertRaises(SchemaError, schema.project, ['nope'])
+        self.assertRaises(SchemaError, schema.project, [('id', 'nope')])
+
+    def test_derive(self):
+        """ Test Schema.extend(), Schema.without(), Schema.replace() """
+        base = Schema({
+            'id': int,
+            'name': six.text_type,
+            'author': {'name': six.text_type, 'age': int},
+            'tags': [{'name': six.text_type}],
+            Optional('kids'): [Ref()],
+        })
+        value = {'id': 1, 'name': u'a', 'author': {'name': u'b', 'age': 1}, 'tags': [{'name': u'c'}]}
+        def short(v):
+            if len(v) > 1:
+                raise Invalid(u'Too long')
+            return v
+        base_values = lambda schema: dict((k.name, v) for k, v, l, i in schema.compiled.mapping_schemas)
+
+        # extend()
+        tenant = base.extend({
+            'name': short,
+            Optional('color'): six.text_type,
+            Optional('next'): Maybe(Ref()),
+        })
+        self.assertValid(tenant, dict(value, color=u'red', next=dict(value, color=u'blue')))
+        self.assertInvalid(tenant, dict(value, name=u'ab'),
+                           Invalid(u'Too long', u'short()', u'ab', ['name'], short))
+        self.assertInvalid(tenant, dict(value, next=dict(value, color=1)),
+                           Invalid(s.es_type, s.t_unicode + u'?', s.t_int, ['next', 'color'], six.text_type))
+        self.assertIs(base_values(tenant)['author'], base_values(base)['author'])  # reused
+        self.assertInvalid(base, dict(value, color=u'red'),
+                           Invalid(s.es_extra, s.v_no, u'color', ['color'], Extra))  # intact
+        self.assertValid(base.extend({Extra: Remove}), dict(value, color=u'red'), value)
+
+        # extend() with a recursive Schema: it keeps its own references
+        node = Schema({'x': int, Optional('kids'): [Ref()]})
+        tree = Schema({'id': int}).extend({Optional('tree'): node})
+        self.assertValid(tree, {'id': 1, 'tree': {'x': 1, 'kids': [{'x': 2}]}})
+        self.assertInvalid(tree, {'id': 1, 'tree': {'x': 1, 'kids': [{}]}},
+                           Invalid(s.es_required, u'x', s.v_no, ['tree', 'kids', 0, 'x'], Required('x')))
+        self.assertValid(node, {'x': 1, 'kids': [{'x': 2}]})  # intact
+        self.assertValid(base.replace(['author'], node), dict(value, author={'x': 1, 'kids': [{'x': 2}]}))
+        self.assertValid(node, {'x': 1, 'kids': [{'x': 2}]})  # intact
+
+        # without()
+        public = base.without(['id', 'kids'])
+        self.assertValid(public, {'name': u'a', 'author': {'name': u'b', 'age': 1}, 'tags': []})
+        self.assertInvalid(public, dict(value),
+                           Invalid(s.es_extra, s.v_no, u'id', ['id'], Extra))
+        self.assertValid(base.extend({Extra: Remove}).without([Extra]).extend({}), value)
+        self.assertRaises(SchemaError, base.without, ['nope'])
+
+        # replace()
+        lax = base.replace(['author', 'age'], Maybe(int)).replace(['tags', 0, 'name'], Any(six.text_type, int))
+        self.assertValid(lax, {'id': 1, 'name': u'a', 'author': {'name': u'b', 'age': None}, 'tags': [{'name': 1}]})
+        self.assertInvalid(lax, dict(value, id=u'1'),
+                           Invalid(s.es_type, s.t_int, s.t_unicode, ['id'], int))
+        self.assertInvalid(base, {'id': 1, 'name': u'a', 'author': {'name': u'b', 'age': None}, 'tags': []},
+                           Invalid(s.es_type, s.t_int, s.t_none, ['author', 'age'], int))  # intact
+        self.assertRaises(SchemaError, base.replace, [], int)
+        self.assertRaises(SchemaError, base.replace, ['nope'], int)
+        self.assertRaises(SchemaError, base.replace, ['tags', 1], int)
+        self.assertRaises(SchemaError, base.replace, ['id', 'nope'], int)
+
+    def test_registry(self):
+        """ Test SchemaRegistry """
+        registry = SchemaRegistry(max_schemas=2, loader=lambda name, version: {'loaded': int} if name == 'disk' else None)
+
+        @registry.register('user', 1)
+        def user_v1():
+            return Schema({'name': six.text_type})
+        registry.register('user', 2, lambda: {'name': six.text_type, 'age': int})
+        registry.register('item', 1, lambda: [int])
+
+        # Get
+        self.assertIsInstance(registry.get('user', 1), Schema)
+        self.assertIs(registry.get('user', 1), registry['user', 1])  # cached
+        self.assertValid(registry.get('user'), {'name': u'a', 'age': 1})  # the latest
+        self.assertEqual(registry.versions('user'), [1, 2])
+        self.assertIn(('user', 2), registry)
+        self.assertNotIn(('user', 3), registry)
+        self.assertRaises(KeyError, registry.get, 'user', 3)
+        self.assertRaises(KeyError, registry.get, 'nope')
+
+        # Loader
+        self.assertValid(registry.get('disk', 5), {'loaded': 1})
+
+        # LRU
+        stats = registry.stats
+        self.assertEqual(stats['schemas'], 2)
+        self.assertEqual(stats['hits'], 2)
+        self.assertEqual(stats['misses'], 5)
+        self.assertEqual(stats['compiles'], 3)
+        self.assertEqual(stats['evictions'], 1)  # user-1
+        registry.get('user', 2)  # hit
+        registry.get('item', 1)  # evicts disk-5, the least recently used
+        self.assertEqual(registry.stats['hits'], 3)
+        registry.get('user', 2)  # hit
+        registry.get('disk', 5)  # miss
+        self.assertEqual(registry.stats['compiles'], 5)
+
+        # Re-register
+        v2 = registry.get('user', 2)
+        registry.register('user', 2, lambda: {'name': int})
+        self.assertIsNot(registry.get('user', 2), v2)
+        self.assertValid(registry.get('user', 2), {'name': 1})
+
+        # Memory budget
+        registry = SchemaRegistry(max_memory=1)
+        registry.register('a', 1, lambda: {'a': int})
+        registry.register('b', 1, lambda: {'b': [{'c': int}]})
+        registry.get('a', 1)
+        self.assertGreater(registry.stats['memory'], 1)
+        registry.get('b', 1)
+        self.assertEqual(registry.stats['schemas'], 1)  # the most recently used one is kept
+        self.assertEqual(registry.stats['evictions'], 1)
+        registry.evict()
+        self.assertEqual(registry.stats['schemas'], 0)
+        self.assertEqual(registry.stats['memory'], 0)
+
+        # Compiled outside of the lock: a slow schema does not block the others
+        import threading
+        registry = SchemaRegistry()
+        started, release = threading.Event(), threading.Event()
+
+        def slow():
+            started.set()
+            release.wait(5)
+            return {'slow': int}
+        registry.register('slow', 1, slow)
+        registry.register('fast', 1, lambda: {'fast': int})
+
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(registry.get('slow', 1))) for i in range(2)]
+        threads[0].start()
+        started.wait(5)
+        threads[1].start()
+        self.assertValid(registry.get('fast', 1), {'fast': 1})  # served while 'slow' compiles
+        self.assertFalse(release.is_set())
+        release.set()
+        for thread in threads:
+            thread.join()
+        self.assertIs(results[0], results[1])  # compiled once
+        self.assertEqual(registry.stats['compiles'], 2)
+
+    def test_profile(self):
+        """ Test Schema.profile() """
+        schema = Schema({
+            'id': int,
+            'items': [{'name': six.text_type, 'price': Any(int, float)}],
+            Optional('kids'): [Ref()],
+        })
+        value = lambda: {'id': 1, 'items': [{'name': u'a', 'price': 1.5}] * 3, 'kids': [{'id': 2, 'items': []}]}
+        originals = [node.compiled for node in schema.compiled.walk()]
+
+        with schema.profile() as profiler:
+            for i in range(10):
+                schema(value())
+            self.assertInvalid(schema, {'id': 1, 'items': [{'name': 1, 'price': 1}]}, None)
+
+        # Restored
+        self.assertEqual([node.compiled for node in schema.compiled.walk()], originals)
+
+        # Stats
+        stats = dict(((s.path, s.name), s) for s in profiler.stats.values())
+        root = stats['/', schema.name]
+        self.assertEqual(root.calls, 21)  # 10 + 10 kids + 1
+        self.assertEqual(root.failures, 1)
+        self.assertGreaterEqual(root.total, root.own)
+        self.assertEqual(stats['/items/[]/price', s.t_int].calls, 31)
+        self.assertEqual(stats['/items/[]/price', s.t_int].failures, 30)
+        self.assertEqual(stats['/items/[]/name', s.t_unicode].failures, 1)
+
+        # Report
+        report = profiler.report(limit=3).splitlines()
+        self.assertEqual(len(report), 4)
+        self.assertIn(u'self, ms', report[0])
+        self.assertTrue(any(u'/items/[]/price: ' in line for line in profiler.report().splitlines()))
+
+        # Collapsed stacks
+        stacks = [line.rsplit(u' ', 1)[0] for line in profiler.collapsed().splitlines()]
+        self.assertIn(u';'.join([u'/: ' + schema.name, u'kids: List[self]', u'/: ' + schema.name]), stacks)  # recursion
+
+        # Nested Schemas are not instrumented: they may be used elsewhere
+        nested = Schema({'a': int})
+        validator = nested.compiled.compiled
+        schema = Schema({'n': nested})
+        with schema.profile() as profiler:
+            self.assertIs(nested.compiled.compiled, validator)
+            schema({'n': {'a': 1}})
+            nested({'a': 1})
+        self.assertNotIn('/n/a', [stat.path for stat in profiler.stats.values()])
+        self.assertEqual([stat.calls for stat in profiler.stats.values() if stat.path == '/n'], [1])
+
+    def test_metrics(self):
+        """ Test Schema(metrics=Metrics().hook()) """
+        metrics = Metrics(buckets=[0.001, 1.0], sample_rate=0.5)
+        user = Schema({'name': six.text_type, 'age': int}, metrics=metrics.hook('user'))
+        item = Schema([int], metrics=metrics.hook('item "1"'))
+
+        for i in range(4):
+            user({'name': u'a', 'age': 1})
+        self.assertInvalid(user, {'name': 1, 'age': u'1'}, None)
+        self.assertInvalid(user, {'name': 1, 'age': 1}, None)
+        item([1])
+
+        hook = metrics.hook('user')
+        self.assertIs(hook, user.metrics)
+        self.assertEqual(hook.validations, 6)
+        self.assertEqual(hook.failed, 2)
+        self.assertEqual(hook.failures, {s.es_type: 3})
+        self.assertEqual(hook.samples, 3)  # every 2nd
+        self.assertEqual(sum(hook.counts), 3)
+        self.assertLessEqual(hook.quantile(0.5), 1.0)
+        self.assertIsNone(Metrics().hook('none').quantile(0.5))
+
+        # Scrape the metrics over HTTP, like Prometheus does
+        from wsgiref.simple_server import make_server, WSGIRequestHandler
+        from six.moves.urllib.request import urlopen
+        import threading
+
+        class QuietHandler(WSGIRequestHandler):
+            def log_message(self, *args):
+                pass
+
+        def app(environ, start_response):
+            start_response('200 OK', [('Content-Type', metrics.content_type)])
+            return [metrics.export().encode('utf-8')]
+
+        server = make_server('127.0.0.1', 0, app, handler_class=QuietHandler)
+        thread = threading.Thread(target=server.handle_request)
+        thread.start()
+        try:
+            response = urlopen('http://127.0.0.1:{}/metrics'.format(server.server_port))
+            self.assertIn('version=0.0.4', response.info()['Content-Type'])
+            text = response.read().decode('utf-8')
+        finally:
+            thread.join()
+            server.server_close()
+
+        # Parse the samples
+        samples = dict(line.rsplit(u' ', 1) for line in text.splitlines() if not line.startswith(u'#'))
+        self.assertEqual(samples[u'good_validations_total{schema="user"}'], u'6')
+        self.assertEqual(samples[u'good_validations_total{schema="item \\"1\\""}'], u'1')
+        self.assertEqual(samples[u'good_failures_total{schema="user"}'], u'2')
+        self.assertEqual(samples[u'good_errors_total{schema="user",message="Wrong type"}'], u'3')
+        self.assertEqual(samples[u'good_validation_seconds_bucket{schema="user",le="+Inf"}'], u'3')
+        self.assertEqual(samples[u'good_validation_seconds_count{schema="user"}'], u'3')
+        self.assertIn(u'good_validation_seconds_bucket{schema="user",le="0.001"}', samples)
+        self.assertIn(u'# TYPE good_validation_seconds histogram', text)
+
+    def test_memory(self):
+        """ Test Schema.memory_report(), Schema.profile_allocations() """
+        schema = Schema({
+            'id': int,
+            'items': [{'name': six.text_type, 'price': Any(int, float)}],
+            Optional('kids'): [Ref()],
+        })
+
+        # Retained memory
+        report = schema.memory_report()
+        nodes = dict(((n.path, n.name), n.size) for n in report.nodes)
+        self.assertIn(('/items/[]/price', s.t_int), nodes)
+        self.assertTrue(all(size > 0 for size in nodes.values()))
+        self.assertEqual(report.total, sum(n.size for n in report.nodes))
+        self.assertGreater(nodes['/', schema.name], nodes['/id', s.t_int])  # keys are counted within the mapping
+
+        text = report.report(limit=3).splitlines()
+        self.assertEqual(len(text), 5)
+        self.assertEqual(text[-1].split(), [str(report.total), u'total'])
+
+        # A bigger schema retains more
+        self.assertGreater(Schema({'id': int, 'name': six.text_type}).memory_report().total,
+                           Schema({'id': int}).memory_report().total)
+
+        # Allocations
+        try:
+            import tracemalloc
+        except ImportError:  # Python 2
+            self.assertRaises(RuntimeError, schema.profile_allocations)
+            return
+
+        originals = [node.compiled for node in schema.compiled.walk()]
+        values = []
+        with schema.profile_allocations() as profiler:
+            self.assertTrue(tracemalloc.is_tracing())
+            for i in range(10):
+                values.append(schema({'id': 1, 'items': [{'name': u'a', 'price': 1}] * 3}))
+        self.assertFalse(tracemalloc.is_tracing())
+        self.assertEqual([node.compiled for node in schema.compiled.walk()], originals)
+
+        stats = dict(((s.path, s.name), s) for s in profiler.stats.values())
+        root = stats['/', schema.name]
+        self.assertEqual(root.calls, 10)
+        self.assertGreater(root.total, 0)  # the sanitized values are kept
+        self.assertGreater(stats['/items/[]', schema.compiled.mapping_schemas[1][1].iterable_schemas[0].name].own, 0)
+        self.assertIn(u'self/call', profiler.report(limit=1).splitlines()[0])
+
+    def test_explain(self):
+        """ Test Schema.explain() """
+        class Point(object):
+            __slots__ = ('x', 'y')
+
+        schema = Schema({
+            'id': int,
+            'items': [{'name': six.text_type, 'price': Any(int, float)}],
+            Optional('kids'): [Ref()],
+            'tags': In([[1], [2]]),
+            'color': In(['red', 'green']),
+            'deep': Any(int, Maybe(Any(six.text_type, float, bool, complex))),
+            'point': Object({'x': int}, Point),
+            six.text_type: int,
+            lambda k: k: int,
+            Coerce(int): int,
+        })
+        explanation = schema.explain()
+
+        # Plan
+        nodes = dict((n.path, n) for n in explanation.nodes if n.key is not None)
+        self.assertEqual(explanation.nodes[0].path, '/')
+        self.assertEqual(explanation.nodes[0].kind, const.COMPILED_TYPE.MAPPING)
+        self.assertEqual(nodes['/id'].match, u'literal')
+        self.assertEqual(nodes['/id'].key, u'Required(id)')
+        self.assertEqual(nodes['/kids'].key, u'Optional(kids)')
+        self.assertEqual(nodes['/' + s.t_unicode].match, u'scan')
+        self.assertIn(u'recursive', [note for n in explanation.nodes for note in n.notes])
+        self.assertGreater(explanation.cost, nodes['/items'].cost)
+        self.assertGreater(nodes['/items'].cost, nodes['/id'].cost)
+
+        # Key order: literals first, the catch-all last
+        keys = [n.key for n in explanation.nodes if n.depth == 1]
+        self.assertLess(keys.index(u'Required(id)'), keys.index(u'Required({})'.format(s.t_unicode)))
+        self.assertEqual(keys[-1], u'Extra(*)')
+
+        # Warnings
+        warnings = sorted((w.path, w.code) for w in explanation.warnings)
+        self.assertEqual(warnings, [
+            ('/', u'callable-key'),
+            ('/', u'callable-key'),
+            ('/', u'scan-keys'),
+            ('/deep', u'any-branches'),
+            ('/deep', u'deep-any'),
+            ('/point', u'object-slots'),
+            ('/tags', u'in-list'),
+        ])
+
+        # Report
+        report = explanation.report()
+        self.assertIn(u'Required(id) [literal] -> ' + s.t_int, report)
+        self.assertIn(u'Warnings:', report)
+
+        # Fast schemas have no warnings
+        self.assertEqual(Schema({'id': int, 'color': In(['red', 'green']), 'point': Object({'x': int, 'y': int}, Point)})
+                         .explain().warnings, [])
+
+    def test_sampler(self):
+        """ Test Schema.sampler() """
+        is_x = Check(lambda v: v == u'x', u'Not x', u'x')
+        schema = Schema({
+            'id': int,
+            'age': Range(18, 99),
+            'role': In(['admin', 'user']),
+            'created': DateTime('%Y-%m-%d'),
+            Optional('referrer'): Maybe(six.text_type),
+            'code': Match(r'^[A-Z]{2}-\d{3,5}$'),
+            'email': Email(),
+            'name': All(six.text_type, Length(3, 8)),
+            'tags': [six.text_type],
+            'mix': [int, six.text_type],
+            'any': Any(int, Match(r'^\w+$')),
+            'x': is_x,
+            Optional('kids'): [Ref()],
+        })
+        sampler = schema.sampler(seed=1, providers={is_x: lambda random: u'x'})
+
+        # Valid values
+        for i in range(20):
+            value = sampler.valid()
+            schema(deepcopy(value))
+
+        # Invalid values: the error is reported at the path
+        for i in range(20):
+            value, path = sampler.invalid()
+            with self.assertRaises(Invalid) as ecm:
+                schema(value)
+            self.assertIn(path, [e.path for e in ecm.exception])
+
+        # Mixed
+        samples = list(sampler.samples(50, invalid=0.5))
+        self.assertEqual(len(samples), 50)
+        self.assertTrue(0 < sum(1 for v, p in samples if p is not None) < 50)
+
+        # Same seed, same values
+        self.assertEqual([schema.sampler(seed=2, providers={is_x: lambda random: u'x'}).valid() for i in range(2)],
+                         [schema.sampler(seed=2, providers={is_x: lambda random: u'x'}).valid() for i in range(2)])
+
+        # Custom validators need a provider
+        self.assertRaises(SchemaError, schema.sampler(seed=1).valid)
+
+    def test_lazy_import(self):
+        """ Test lazy validator modules, and deferred translations """
+        import os, subprocess
+        from importlib import import_module
+        import good, good.validators
+
+        # Every validator is listed with its module
+        for module, names in good.validators.MODULES:
+            self.assertEqual(set(import_module('good.validators.' + module).__all__), set(names))
+        self.assertIs(good.Range, import_module('good.validators.numbers').Range)
+        self.assertIn('Range', good.__all__)
+        self.assertRaises(AttributeError, getattr, good, 'NoSuchValidator')
+
+        # `import good` does not import the validators, nor the translations
+        if sys.version_info >= (3, 7):
+            heavy = ('gettext', 'datetime', 'good.validators.strings', 'good.validators.dates')
+            env = dict(os.environ, PYTHONPATH=os.path.dirname(os.path.dirname(good.__file__)))
+            script = 'import sys, good; print([m for m in {!r} if m in sys.modules])'.format(heavy)
+            loaded = subprocess.check_output([sys.executable, '-c', script], env=env)
+            self.assertEqual(loaded.decode().strip(), '[]')
+
+    def test_translations(self):
+        """ Test lazy messages: one compiled schema, errors in every locale """
+        import os, struct, pickle, tempfile, shutil
+        from good import i18n
+
+        def write_catalog(path, messages):
+            """ Write a gettext .mo catalog """
+            ids = sorted(messages)
+            keys, values = [m.encode('utf8') for m in ids], [messages[m].encode('utf8') for m in ids]
+            offset = 7 * 4 + 16 * len(ids)
+            table = []
+            for strings in (keys, values):
+                for string in strings:
+                    table.append((len(string), offset))
+                    offset += len(string) + 1
+            with open(path, 'wb') as f:
+                f.write(struct.pack('Iiiiiii', 0x950412de, 0, len(ids), 7 * 4, 7 * 4 + 8 * len(ids), 0, 0))
+                f.write(b''.join(struct.pack('ii', *t) for t in table))
+                f.write(b''.join(string + b'\0' for string in keys + values))
+
+        tmp = tempfile.mkdtemp()
+        try:
+            for locale, prefix in (('de', u'DE'), ('fr', u'FR')):
+                os.makedirs(os.path.join(tmp, locale, 'LC_MESSAGES'))
+                write_catalog(os.path.join(tmp, locale, 'LC_MESSAGES', 'good.mo'), {
+                    u'Wrong type': prefix + u': wrong type',
+                    u'Value must be at most {max}': prefix + u': at most {max}',
+                    u'Integer number': prefix + u': integer',
+                    u'Range({min}..{max})': u'Range({min}~{max})',
+                })
+            i18n.set_localedir(tmp)
+
+            schema = Schema({'a': int, 'b': Range(1, 5), 'c': Maybe(int)})
+            try:
+                schema({'a': u'1', 'b': 9, 'c': u'x'})
+                self.fail('No error')
+            except MultipleInvalid as ee:
+                a, b, c = sorted(ee, key=lambda e: e.path)
+
+            # Messages are the untranslated text
+            self.assertEqual(a.message, u'Wrong type')
+            self.assertIsInstance(a.message, i18n.Message)
+            self.assertEqual(six.text_type(a), u'Wrong type @ [\'a\']: expected Integer number, got String')
+
+            # Rendered in the current locale
+            with i18n.locale('de'):
+                self.assertEqual(six.text_type(a), u'DE: wrong type @ [\'a\']: expected DE: integer, got String')
+                self.assertEqual(six.text_type(b.message), u'DE: at most 5')
+                self.assertEqual(u'{}'.format(Schema(Range(1, 5)).name), u'Range(1~5)')
+                self.assertEqual(six.text_type(c.expected), u'DE: integer?')
+                self.assertEqual(six.text_type(Schema(Any(int, Maybe(int))).name), u'Any(DE: integer|DE: integer?)')
+                self.assertEqual(six.text_type(Schema(All(int, Range(1, 5))).name), u'All(DE: integer & Range(1~5))')
+                self.assertEqual(six.text_type(Schema(Neither(int)).name), u'Not(DE: integer)')
+                with i18n.locale('fr'):
+                    self.assertEqual(six.text_type(a.message), u'FR: wrong type')
+                self.assertEqual(i18n.get_locale(), 'de')
+            self.assertEqual(i18n.translate(a.message, 'fr'), u'FR: wrong type')
+            self.assertEqual(i18n.translate(a.message, 'xx'), u'Wrong type')  # no catalog
+            self.assertEqual(i18n.translate(1, 'fr'), 1)
+
+            # Lazy across pickling
+            message = pickle.loads(pickle.dumps(b.message))
+            self.assertEqual(message, u'Value must be at most 5')
+            self.assertEqual(message.translate('fr'), u'FR: at most 5')
+
+            # Joined names are not new messages
+            self.assertNotIn(u'Integer number|Integer number?', i18n._messages)
+
+            # The same text gives the same message
+            self.assertIs(_(u'Wrong type'), _(u'Wrong type'))
+        finally:
+            i18n.set_localedir(None)
+            shutil.rmtree(tmp)
+
+
+    def test_warmup(self):
+        """ Test warmup(): lazy state is filled before fork """
+        import gc
+        Point = collections.namedtuple('Point', ('x', 'y'))
+        registry = SchemaRegistry()
+        registry.register('user', 1, lambda: {'id': int})
+        registry.register('user', 2, lambda: {'id': int, 'name': Default(u'')})
+
+        schema = Schema({'a': Default(0), 'b': int, 'p': Object({'x': int, 'y': int}, Point), Optional('kids'): [Ref()]})
+        value_schemas = dict((k.schema, v) for k, v, is_literal, is_identity in schema.compiled.mapping_schemas)
+        self.assertNotIn('supports_undefined', value_schemas['a'].__dict__)
+
+        n = warmup([schema, registry])
+        self.assertGreater(n, 10)
+
+        # supports_undefined is computed once
+        self.assertIs(value_schemas['a'].__dict__['supports_undefined'], True)
+        self.assertIs(value_schemas['b'].__dict__['supports_undefined'], False)
+        self.assertNotIn('supports_undefined', value_schemas[Optional('kids')].__dict__)  # never tested
+        self.assertEqual(schema({'b': 1, 'p': Point(1, 2)}), {'a': 0, 'b': 1, 'p': Point(1, 2)})
+
+        # Object() plans, registry: the latest versions
+        self.assertIn(Point, value_schemas['p'].schema.plans)
+        self.assertEqual(registry.stats['compiles'], 1)
+        self.assertEqual(registry.names(), ['user'])
+
+        # Registry: requested versions, within the budget
+        registry = SchemaRegistry(max_schemas=2)
+        for version in (1, 2, 3):
+            registry.register('user', version, lambda: {'id': int})
+        registry.register('group', 1, lambda: {'id': int})
+        warmup([registry], versions={'user': [1, 2, 3], 'group': [1]})
+        self.assertEqual(registry.stats['compiles'], 3)  # stops at the first eviction
+        self.assertEqual(registry.stats['schemas'], 2)
+
+        # Engines
+        self.assertNotIn('iterative_compilers', schema.__dict__)
+        warmup([schema], engines=['iterative'])
+        self.assertEqual(sorted(schema.iterative_compilers), [False, True])
+        compiler = schema.iterative_compilers[False]
+        kid = {'b': 2, 'p': Point(1, 2)}
+        self.assertEqual(schema.validate_iterative({'b': 1, 'p': Point(1, 2), 'kids': [kid]}),
+                         {'a': 0, 'b': 1, 'p': Point(1, 2), 'kids': [dict(kid, a=0)]})
+        self.assertIs(schema.iterative_compilers[False], compiler)
+        if sys.version_info >= (3, 5):
+            warmup([schema], engines=['async'])
+            self.assertEqual(sorted(schema.async_compilers), [False, True])
+
+        # Freeze
+        if hasattr(gc, 'freeze'):
+            try:
+                warmup([schema], freeze=True)
+                self.assertGreater(gc.get_freeze_count(), 0)
+            finally:
+                gc.unfreeze()
+
+
 class InvalidJsonTest(unittest.TestCase):
 
     def test_json(self):
@@ -773,6 +1663,102 @@ class HelpersTest(GoodTestBase):
             self.assertInvalid(schema, type('A', (object,), {})(),
                                Invalid(s.es_value_type, u'Object({})'.format(Person.__name__), u'Object(A)', [], object_validator))
 
+        # Compiled attribute access
+        class DPerson(OPerson):
+            age = 0  # class attribute: read with getattr()
+
+        classes = [OPerson, TPerson, SPerson, DPerson]
+        try:
+            import dataclasses
+        except ImportError:
+            pass
+        else:
+            classes.append(dataclasses.make_dataclass('CPerson', [('name', six.text_type), ('age', int)]))
+
+        object_validator = Object({
+            u'name': six.text_type,
+            Optional(u'age'): intify,
+        })
+        schema = Schema(object_validator)
+
+        for Person in classes:
+            self.assertValid(schema, Person(u'Alex', 18), Person(u'Alex', 18))
+            self.assertIsNotNone(object_validator.plans[Person])
+            self.assertInvalid(schema, Person(u'Alex', u'abc'),
+                               Invalid(s.es_value, u'Number', u'abc', [u'age'], intify))
+            if Person is not TPerson:
+                self.assertValid(schema, Person(u'Alex', u'18'), Person(u'Alex', 18))
+
+        # Optional attributes
+        person = OPerson(u'Alex', 18)
+        del person.age
+        self.assertIs(schema(person), person)
+
+        # Extra attributes: reported by the proxy
+        person = OPerson(u'Alex', 18)
+        person.extra = 1
+        self.assertInvalid(schema, person,
+                           Invalid(s.es_extra, u'-none-', u'extra', [u'extra'], Extra))
+
+        # Schemas with other markers only use the proxy
+        self.assertIsNone(Object({u'name': six.text_type, Remove(u'age'): int}).fields)
+
+    def test_Record(self):
+        """ Test Record() """
+        mapping = {
+            u'x': int,
+            u'y': Coerce(int),
+            Optional(u'label'): six.text_type,
+        }
+        plain = Schema(mapping)
+
+        # Named tuple
+        Point = collections.namedtuple('Point', (u'label', u'x', u'y'))
+        schema = Schema(Record(mapping, Point))
+
+        self.assertEqual(schema({u'x': 1, u'y': u'2'}), Point(None, 1, 2))
+        self.assertIs(type(schema({u'x': 1, u'y': 2, u'label': u'a'})), Point)
+
+        # Errors are the same as with a mapping
+        for value in ({u'x': 1}, {u'x': u'1', u'y': u'a'}, {u'x': 1, u'y': 2, u'z': 3}, None):
+            try:
+                plain(deepcopy(value))
+            except Invalid as e:
+                expected = MultipleInvalid.if_multiple(list(e))
+            self.assertInvalid(schema, value, expected)
+
+        # Dict subclasses are not modified: a defaultdict does not get the missing keys
+        value = collections.defaultdict(int, {u'x': 1, u'y': 2})
+        self.assertEqual(schema(value), Point(None, 1, 2))
+        self.assertEqual(dict(value), {u'x': 1, u'y': 2})
+
+        # Extra keys
+        schema = Schema(Record({u'x': int, Extra: Remove}, Point))
+        self.assertEqual(schema({u'x': 1, u'z': 2}), Point(None, 1, None))
+
+        # Generated named tuple
+        schema = Schema(Record({u'x': int, u'not-identifier': int}))
+        record = schema({u'x': 1, u'not-identifier': 2})
+        self.assertEqual(record.x, 1)
+        self.assertEqual(tuple(record), (2, 1))  # sorted keys
+        self.assertEqual(type(record)._fields, ('_0', 'x'))
+
+        # Keyword arguments
+        class SPoint(object):
+            __slots__ = (u'x', u'y', u'label')
+
+            def __init__(self, x, y, label=u'none'):
+                self.x, self.y, self.label = x, y, label
+
+        schema = Schema(Record(mapping, SPoint))
+        point = schema({u'x': 1, u'y': u'2'})
+        self.assertEqual((point.x, point.y, point.label), (1, 2, u'none'))
+
+        # Unsupported schemas
+        self.assertRaises(SchemaError, Record, {int: int})
+        self.assertRaises(SchemaError, Record, {u'x': int, Remove(u'y'): int})
+        self.assertRaises(SchemaError, Record, {u'z': int}, Point)
+
     def test_Msg(self):
         """ Test Msg() """
 
@@ -883,6 +1869,18 @@ class PredicatesTest(GoodTestBase):
         ))
         self.assertEqual(schema.name, u'Any(1|2|3|4|5|6|7|8)')
 
+        # Match() validators are combined
+        any = Any(Match(r'^a', expected=u'A'), Match(r'^b', expected=u'B'))
+        schema = Schema(any)
+
+        self.assertIsNotNone(any.match_any)
+        self.assertValid(schema, u'abc')
+        self.assertValid(schema, u'bcd')
+        self.assertInvalid(schema, u'cde',
+                           Invalid(s.es_value, u'Any(A|B)', u'cde', [], any))
+        self.assertInvalid(schema, None,
+                           Invalid(s.es_value, u'Any(A|B)', s.t_none, [], any))
+
     def test_All(self):
         """ Test All() """
 
@@ -1048,6 +2046,81 @@ class ValuesTest(GoodTestBase):
         self.assertInvalid(schema, 99,
                            Invalid(u'Unsupported value', u'In(1,2,3)', u'99', [], allowed))
 
+        # Lists are converted to sets
+        allowed = In([3, 2, 1])
+        schema = Schema(allowed)
+
+        self.assertIsInstance(allowed.container, frozenset)
+        self.assertValid(schema, 1)
+        self.assertInvalid(schema, 99,
+                           Invalid(u'Unsupported value', u'In(3,2,1)', u'99', [], allowed))
+        self.assertInvalid(schema, [1],
+                           Invalid(u'Unsupported value', u'In(3,2,1)', u'[1]', [], allowed))
+
+        # Unhashable values are kept as is
+        allowed = In([[1], [2]])
+        schema = Schema(allowed)
+
+        self.assertIsInstance(allowed.container, list)
+        self.assertValid(schema, [1])
+        self.assertInvalid(schema, [3], None)
+
+    def test_FileSet(self):
+        """ Test FileSet() """
+        import tempfile, shutil, os.path
+        tmp = tempfile.mkdtemp()
+        try:
+            # Write
+            path = os.path.join(tmp, 'values.txt')
+            values = [u'v{}'.format(i) for i in range(1000)] + [u'\u0436', u'a', u'zzz']
+            FileSet.write(path, values + [u'a', b'b'])
+            self.assertRaises(ValueError, FileSet.write, os.path.join(tmp, 'x.txt'), [u'a\nb'])
+
+            # Lookup
+            for bloom in (None, 0.01):
+                fs = FileSet(path, bloom=bloom)
+                self.assertEqual(len(fs), 1004)
+                for v in values + [u'b', b'b', b'v10']:
+                    self.assertIn(v, fs)
+                for v in (u'', u'v', u'v1000', u'zzzz', u'0', u'\u0437', 1, None, [1]):
+                    self.assertNotIn(v, fs)
+
+                # Schema
+                allowed = In(fs)
+                schema = Schema(allowed)
+                self.assertValid(schema, u'v999')
+                self.assertInvalid(schema, u'v1000',
+                                   Invalid(u'Unsupported value', u'In(FileSet({}))'.format(path), u'v1000', [], allowed))
+                fs.close()
+
+            # No newline at the end
+            with open(path, 'wb') as f:
+                f.write(b'a\nb\nc')
+            fs = FileSet(path)
+            self.assertEqual(len(fs), 3)
+            self.assertEqual([v for v in (b'a', b'b', b'c', b'd') if v in fs], [b'a', b'b', b'c'])
+
+            # Empty file
+            FileSet.write(path, [])
+            fs = FileSet(path, bloom=0.01)
+            self.assertEqual(len(fs), 0)
+            self.assertNotIn(u'a', fs)
+        finally:
+            shutil.rmtree(tmp)
+
+    def test_BloomFilter(self):
+        """ Test BloomFilter() """
+        values = [u'v{}'.format(i) for i in range(10000)]
+        bloom = BloomFilter(len(values), 0.01, values)
+
+        # No false negatives
+        self.assertTrue(all(v in bloom for v in values))
+        # A few false positives
+        false_positives = sum(1 for i in range(10000) if u'x{}'.format(i) in bloom)
+        self.assertLess(false_positives, 300)
+        # Unhashable
+        self.assertNotIn([1], bloom)
+
     def test_Length(self):
         """ Test Length() """
 
@@ -1229,6 +2302,76 @@ class BooleansTest(GoodTestBase):
         self.assertInvalid(schema, 15,
                            Invalid(u'Must be <15', u'<15', u'15', [], check))
 
+    def test_BatchCheck(self):
+        """ Test BatchCheck() """
+        import sqlite3
+
+        db = sqlite3.connect(':memory:')
+        db.execute('CREATE TABLE users (id INTEGER PRIMARY KEY)')
+        db.executemany('INSERT INTO users VALUES (?)', [(1,), (2,), (3,)])
+
+        queries = []
+        def existing_users(ids):
+            queries.append(set(ids))
+            return set(row[0] for row in db.execute(
+                'SELECT id FROM users WHERE id IN ({})'.format(','.join('?' * len(ids))),
+                tuple(ids)))
+
+        user = BatchCheck(existing_users, u'Unknown user')
+        schema = Schema({
+            'author': user,
+            'reviewers': [user],
+            Optional('editor'): Schema(user),  # nested Schema shares the batch
+        })
+
+        # Valid: a single query with distinct values
+        self.assertValid(schema, {'author': 1, 'reviewers': [2, 3, 2], 'editor': 1})
+        self.assertEqual(queries, [{1, 2, 3}])
+
+        # Invalid: a single batch query, errors with correct paths
+        del queries[:]
+        self.assertInvalid(schema, {'author': 4, 'reviewers': [1, 5]}, MultipleInvalid([
+            Invalid(u'Unknown user', user.name, u'4', ['author'], user),
+            Invalid(u'Unknown user', user.name, u'5', ['reviewers', 1], user),
+        ]))
+        self.assertEqual(queries, [{1, 4, 5}])
+
+        # Other errors are reported along
+        self.assertInvalid(schema, {'author': 1, 'reviewers': ['a']}, None)
+        self.assertInvalid(schema, {'author': 1, 'reviewers': [2], 'editor': 9},
+                           Invalid(u'Unknown user', user.name, u'9', ['editor'], user))
+
+        # The 2nd pass gets the original containers. Other values are shared: no deep copies
+        import threading
+        lock = threading.Lock()
+        schema = Schema({'reviewers': [{'id': user, 'count': All(lambda v: v + 1, Range(max=2))}], 'lock': Check(lambda v: v is lock, u'Not the lock', None)})
+        self.assertValid(schema, {'reviewers': [{'id': 1, 'count': 1}], 'lock': lock},
+                         {'reviewers': [{'id': 1, 'count': 2}], 'lock': lock})
+        self.assertInvalid(schema, {'reviewers': [{'id': 1, 'count': 1}, {'id': 9, 'count': 1}], 'lock': lock},
+                           Invalid(u'Unknown user', user.name, u'9', ['reviewers', 1, 'id'], user))
+
+        # Objects are modified in-place: the 2nd pass validates them as they were
+        class Review(object):
+            def __init__(self, id, count):
+                self.id = id
+                self.count = count
+        schema = Schema([Object({'id': user, 'count': All(lambda v: v + 1, Range(max=2))})])
+        reviews = [Review(1, 1), Review(9, 1)]
+        self.assertInvalid(schema, reviews,
+                           Invalid(u'Unknown user', user.name, u'9', [1, 'id'], user))
+        self.assertEqual((reviews[0].count, reviews[1].count), (2, 2))  # the 1st pass modifies them
+
+        # Unhashable values are invalid
+        schema = Schema({'author': user, 'reviewers': [user]})
+        self.assertInvalid(schema, {'author': 1, 'reviewers': [[2]]},
+                           Invalid(u'Unhashable value', u'hashable value', u'List', ['reviewers', 0], user))
+        self.assertInvalid(schema, {'author': 9, 'reviewers': [[2]]}, None)
+        self.assertRaises(Invalid, user, [1])
+
+        # Outside of a scope
+        self.assertEqual(user(1), 1)
+        self.assertRaises(Invalid, user, 9)
+
     def test_Truthy(self):
         """ Test Truthy() """
 
@@ -1365,6 +2508,54 @@ class StringsTest(GoodTestBase):
         self.assertInvalid(schema, 123,
                            Invalid(s.es_value_type, u'String', s.t_int, [], match))
 
+    def test_MatchAny(self):
+        """ Test MatchAny() """
+
+        match = MatchAny([r'^/api/v1/users/\d+$', r'^/api/v1/orders/\d+$', r'^/static/'], expected=u'Allowed path')
+        schema = Schema(match)
+
+        self.assertValid(schema, u'/api/v1/users/10')
+        self.assertValid(schema, u'/static/app.js')
+
+        self.assertInvalid(schema, u'/admin',
+                           Invalid(u'Wrong format', u'Allowed path', u'/admin', [], match))
+        self.assertInvalid(schema, 123,
+                           Invalid(s.es_value_type, u'String', s.t_int, [], match))
+
+        # which()
+        self.assertEqual(match.which(u'/api/v1/orders/1'), r'^/api/v1/orders/\d+$')
+        self.assertEqual(match.which(u'/static/'), r'^/static/')
+        self.assertEqual(match.which(u'/admin'), None)
+        self.assertEqual(match.which(123), None)
+
+        # Many patterns: the first one wins
+        patterns = [r'^/p{}(/|$)'.format(i) for i in range(300)]
+        match = MatchAny(patterns)
+        self.assertEqual(match.which(u'/p0'), patterns[0])
+        self.assertEqual(match.which(u'/p299/a'), patterns[299])
+        self.assertEqual(match.which(u'/p300'), None)
+        self.assertEqual(MatchAny([r'a', r'ab']).which(u'ab'), r'a')
+
+        # Patterns that can't be combined: groups, backreferences, flags
+        import re
+        match = MatchAny([r'^(a)\1$', r'^b', re.compile(r'^c', re.I), r'(?i)^d', r'^e'])
+        for v, i in ((u'aa', 0), (u'b', 1), (u'C', 2), (u'D', 3), (u'e', 4), (u'a', None), (u'E', None)):
+            self.assertEqual(match.which(v), None if i is None else match.patterns[i], v)
+
+        # Match() validators & same errors as Any(Match(), ...)
+        m1, m2 = Match(r'^a', expected=u'A'), Match(r'^b', expected=u'B')
+        match = MatchAny([m1, m2], any_errors=True)
+        schema = Schema(match)
+
+        self.assertValid(schema, u'a')
+        self.assertInvalid(schema, u'c',
+                           Invalid(s.es_value, u'Any(A|B)', u'c', [], match))
+        self.assertInvalid(schema, 1,
+                           Invalid(s.es_value, u'Any(A|B)', u'1', [], match))
+
+        # Empty
+        self.assertInvalid(Schema(MatchAny([])), u'a', None)
+
     def test_Replace(self):
         """ Test Replace() """
 